@@ -1,36 +1,1943 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, Response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, Response, stream_with_context, g, has_request_context, template_rendered, before_render_template
 from werkzeug.security import generate_password_hash, check_password_hash
-import json, uuid, io, os, random, barcode
+import json, uuid, io, os, random, barcode, click, threading, time, fcntl, tempfile, hashlib, base64, bisect, csv, zlib, itertools, heapq, hmac, array, struct, sys
+import atexit, multiprocessing
 from datetime import datetime, timedelta
-from barcode.writer import ImageWriter
+from barcode.writer import ImageWriter, SVGWriter
+from barcode.errors import BarcodeError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from reportlab.pdfbase.pdfmetrics import stringWidth
+import PIL
+import pickle
+import cProfile, pstats, tracemalloc
+try:
+    import orjson
+except ImportError:  # optional, the json module is used instead
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # optional, only needed for DATA_FORMAT=msgpack
+    msgpack = None
+try:
+    import numpy
+except ImportError:  # optional, the sales analytics fall back to plain Python
+    numpy = None
 from flask import jsonify,send_file
+from flask_sqlalchemy import SQLAlchemy
 from functools import wraps
+from contextlib import contextmanager, ExitStack
 
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("Zeuus")
 
 
-DATA_PATH = './data'
+DATA_PATH = os.environ.get('DATA_PATH', './data')
 USERS_FILE = os.path.join(DATA_PATH, 'users.json')
 ITEMS_FILE = os.path.join(DATA_PATH, 'items.json')
 SALES_FILE = os.path.join(DATA_PATH, 'sales.json')
 ORDERS_FILE = os.path.join(DATA_PATH, 'orders.json')
 PAYMENTS_FILE = os.path.join(DATA_PATH, 'salary_payments.json')
 ALERTS_DISMISS_FILE = os.path.join(DATA_PATH, 'dismissed_alerts.json')
+KASSE_FILE = os.path.join(DATA_PATH, 'kasse.json')
+WALLET_LOG_FILE = os.path.join(DATA_PATH, 'wallet_log.json')
+HISTORY_FILE = os.path.join(DATA_PATH, 'dashboard_history.json')
+AGGREGATES_FILE = os.path.join(DATA_PATH, 'aggregates.json')
+KASSE_CHECKPOINTS_FILE = os.path.join(DATA_PATH, 'kasse_checkpoints.json')
+SALE_IDS_FILE = os.path.join(DATA_PATH, 'sales_order_ids.json')
+COLUMNS_DIR = os.path.join(DATA_PATH, 'columns')
+
+# Storage backend: 'json' keeps the files above, 'sqlite' uses the tables below
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.abspath(os.path.join(DATA_PATH, 'store.db')))
+db = SQLAlchemy(app)
+
+
+# SQLite tables: the whole record is kept in `data`, the other columns are
+# copies of the fields we filter on so those lookups can use an index
+class UserRecord(db.Model):
+    __tablename__ = 'users'
+    record_fields = ('username',)
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(120), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class ItemRecord(db.Model):
+    __tablename__ = 'items'
+    record_fields = ('barcode', 'seller')
+    id = db.Column(db.Integer, primary_key=True)
+    barcode = db.Column(db.String(64), index=True)
+    seller = db.Column(db.String(120), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class SaleRecord(db.Model):
+    __tablename__ = 'sales'
+    record_fields = ('order_id', 'user', 'date')
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(64), index=True)
+    user = db.Column(db.String(120), index=True)
+    date = db.Column(db.String(32), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class OrderRecord(db.Model):
+    __tablename__ = 'orders'
+    record_fields = ('order_number', 'user', 'date')
+    id = db.Column(db.Integer, primary_key=True)
+    order_number = db.Column(db.String(64), index=True)
+    user = db.Column(db.String(120), index=True)
+    date = db.Column(db.String(32), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class KasseRecord(db.Model):
+    __tablename__ = 'kasse'
+    record_fields = ('date', 'user')
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.String(32), index=True)
+    user = db.Column(db.String(120), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class SalaryPaymentRecord(db.Model):
+    __tablename__ = 'salary_payments'
+    record_fields = ('employee', 'date')
+    id = db.Column(db.Integer, primary_key=True)
+    employee = db.Column(db.String(120), index=True)
+    date = db.Column(db.String(32), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+class DismissedAlertRecord(db.Model):
+    __tablename__ = 'dismissed_alerts'
+    record_fields = ('barcode',)
+    id = db.Column(db.Integer, primary_key=True)
+    barcode = db.Column(db.String(64), index=True)
+    data = db.Column(db.JSON, nullable=False)
+
+# Which table stores which data file
+TABLES = {
+    USERS_FILE: UserRecord,
+    ITEMS_FILE: ItemRecord,
+    SALES_FILE: SaleRecord,
+    ORDERS_FILE: OrderRecord,
+    KASSE_FILE: KasseRecord,
+    PAYMENTS_FILE: SalaryPaymentRecord,
+    ALERTS_DISMISS_FILE: DismissedAlertRecord,
+}
+
+if STORAGE_BACKEND == 'sqlite':
+    with app.app_context():
+        db.create_all()
+
+def use_db(file_path):
+    return STORAGE_BACKEND == 'sqlite' and file_path in TABLES
+
+def _db_row(model, record):
+    columns = {}
+    for field in model.record_fields:
+        value = record.get(field)
+        columns[field] = str(value) if value is not None else None
+    return model(data=record, **columns)
+
+def _db_load(file_path):
+    model = TABLES[file_path]
+    return [row.data for row in model.query.order_by(model.id)]
+
+def _db_save(file_path, data):
+    model = TABLES[file_path]
+    model.query.delete()
+    db.session.add_all(_db_row(model, record) for record in data)
+    db.session.commit()
+
+# Copy-on-write views over cached data. The cache keeps the parsed objects
+# and callers get containers that copy a nested dict/list the first time it
+# is read through them, so mutating a view never changes the cached data.
+# Views remember whether they were modified, which lets save_json hand the
+# untouched records of a view back to the cache as they are
+class CowDict(dict):
+    __slots__ = ('_src', '_dirty')
+
+    def __init__(self, src):
+        dict.__init__(self, src)
+        self._src = src
+        self._dirty = False
+
+    def _own(self, key, value):
+        if (type(value) is dict or type(value) is list) and self._src.get(key) is value:
+            value = _cow(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def __setitem__(self, key, value):
+        if not self._dirty:
+            # normalize_items re-assigns most fields with the value they already have
+            old = dict.get(self, key, _MISSING)
+            if old is not value and (type(old) is not type(value) or old != value or type(value) in (dict, list)):
+                self._dirty = True
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._dirty = True
+        dict.__delitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            self[key]
+            self._dirty = True
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._dirty = True
+        key, value = dict.popitem(self)
+        return key, _cow(value) if self._src.get(key) is value else value
+
+    def update(self, *args, **kwargs):
+        self._dirty = True
+        dict.update(self, *args, **kwargs)
+
+    def clear(self):
+        self._dirty = True
+        dict.clear(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def copy(self):
+        return {key: self[key] for key in self}
+
+class CowList(list):
+    __slots__ = ('_origin', '_shared', '_dirty')
+
+    def __init__(self, src):
+        list.__init__(self, src)
+        self._origin = src
+        self._shared = {id(v) for v in src if type(v) is dict or type(v) is list}
+        self._dirty = False
+
+    def _own(self, index, value):
+        if (type(value) is dict or type(value) is list) and id(value) in self._shared:
+            value = _cow(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._own(index, list.__getitem__(self, index))
+
+    def __iter__(self):
+        i = 0
+        while i < len(self):
+            yield self[i]
+            i += 1
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def pop(self, index=-1):
+        self[index]
+        self._dirty = True
+        return list.pop(self, index)
+
+    def copy(self):
+        return list(self)
+
+def _dirty_list_method(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._dirty = True
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(CowList, _name, _dirty_list_method(_name))
+
+_MISSING = object()
+
+def _cow(value):
+    if type(value) is dict:
+        return CowDict(value)
+    if type(value) is list:
+        return CowList(value)
+    return value
+
+# Plain copy of a view for the cache. Containers that are still shared, or
+# were only read through the view, are reused instead of copied
+def _freeze(value):
+    kind = type(value)
+    if kind is CowDict:
+        src = value._src
+        frozen = {k: v if (type(v) is dict or type(v) is list) and src.get(k) is v else _freeze(v)
+                  for k, v in dict.items(value)}
+        if not value._dirty and all(frozen[k] is v for k, v in src.items() if type(v) is dict or type(v) is list):
+            return src
+        return frozen
+    if kind is CowList:
+        shared = value._shared
+        frozen = [v if (type(v) is dict or type(v) is list) and id(v) in shared else _freeze(v)
+                  for v in list.__iter__(value)]
+        origin = value._origin
+        if not value._dirty and all(a is b for a, b in zip(frozen, origin) if type(b) is dict or type(b) is list):
+            return origin
+        return frozen
+    if isinstance(value, dict):
+        return {k: _freeze(v) for k, v in dict.items(value)}
+    if isinstance(value, (list, tuple)):
+        return [_freeze(v) for v in value]
+    return value
+
+# On-disk format of the data files. DATA_FORMAT picks what is written:
+# 'json' (compact), 'json-pretty' (indented like the files used to be),
+# 'msgpack' or 'pickle' (protocol 5, only for a data directory nobody else
+# writes to). Readers recognize the format of every file, so a data directory
+# can be switched file by file, `flask convert-data` rewrites all of it. File
+# names keep their .json whatever the format; journals stay JSON lines.
+# JSON goes through orjson when it is installed
+DATA_FORMATS = ('json', 'json-pretty', 'msgpack', 'pickle')
+DATA_FORMAT = os.environ.get('DATA_FORMAT', 'json').lower()
+if DATA_FORMAT not in DATA_FORMATS:
+    raise RuntimeError(f'DATA_FORMAT must be one of {", ".join(DATA_FORMATS)}')
+if DATA_FORMAT == 'msgpack' and msgpack is None:
+    raise RuntimeError('DATA_FORMAT=msgpack needs the msgpack package')
+
+def json_dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_loads(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def dump_data(data, fmt=None):
+    fmt = fmt or DATA_FORMAT
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == 'pickle':
+        return pickle.dumps(data, protocol=5)
+    if fmt == 'json-pretty':
+        return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+    return json_dumps(data)
+
+def data_format(raw):
+    if raw[:1] == b'\x80' and raw[1:2] in (b'\x02', b'\x03', b'\x04', b'\x05'):
+        return 'pickle'
+    if raw.lstrip()[:1] in (b'[', b'{'):
+        return 'json'
+    return 'msgpack'
+
+# Parsed content of a data file in any of the formats; ValueError if it
+# can't be read
+def load_data(raw):
+    if not raw.strip():
+        raise ValueError('empty data file')
+    fmt = data_format(raw)
+    if fmt == 'json':
+        return json_loads(raw)
+    try:
+        if fmt == 'pickle':
+            return pickle.loads(raw)
+        if msgpack is None:
+            raise ValueError('data file is not JSON, msgpack is not installed')
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    except (pickle.UnpicklingError, EOFError) as e:
+        raise ValueError(str(e))
+
+# Metrics for /admin/metrics, per worker process. An observation is a dict
+# update under one lock, cheap enough to leave on in production; METRICS=0
+# turns it off. Data files are labelled by name, month files by their
+# directory, so the number of series stays small
+METRICS_ENABLED = os.environ.get('METRICS', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS = {
+    'ria_request_duration_seconds': ('histogram', 'Time until the response is returned, per endpoint.'),
+    'ria_request_errors_total': ('counter', 'Responses with status 500 or above and unhandled exceptions.'),
+    'ria_data_read_bytes_total': ('counter', 'Bytes read from data files.'),
+    'ria_data_written_bytes_total': ('counter', 'Bytes written to data files.'),
+    'ria_data_parse_seconds': ('summary', 'Time spent parsing data files.'),
+    'ria_data_dump_seconds': ('summary', 'Time spent serializing data files.'),
+    'ria_barcode_render_seconds': ('summary', 'Barcode images rendered because no cache had them.'),
+    'ria_template_render_seconds': ('summary', 'Jinja template rendering.'),
+}
+METRICS_STARTED = time.time()
+_metrics_lock = threading.Lock()
+_metric_values = {}
+
+def _metric_endpoint():
+    if not has_request_context():
+        return 'none'
+    return request.endpoint or 'unmatched'
+
+def _metric_file(file_path):
+    return os.path.relpath(file_path, DATA_PATH).split(os.sep)[0]
+
+def count_metric(name, amount=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metric_values[key] = _metric_values.get(key, 0) + amount
+
+# [sum, count] for summaries; histograms also count per bucket, the last
+# slot is +Inf
+def observe_metric(name, seconds, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    histogram = METRICS[name][0] == 'histogram'
+    with _metrics_lock:
+        value = _metric_values.get(key)
+        if value is None:
+            value = _metric_values[key] = [0.0, 0, [0] * (len(LATENCY_BUCKETS) + 1)] if histogram else [0.0, 0]
+        value[0] += seconds
+        value[1] += 1
+        if histogram:
+            value[2][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+def observe_data(direction, file_path, size, seconds):
+    if not METRICS_ENABLED:
+        return
+    labels = {'endpoint': _metric_endpoint(), 'file': _metric_file(file_path)}
+    if direction == 'read':
+        count_metric('ria_data_read_bytes_total', size, **labels)
+        observe_metric('ria_data_parse_seconds', seconds, **labels)
+    else:
+        count_metric('ria_data_written_bytes_total', size, **labels)
+        observe_metric('ria_data_dump_seconds', seconds, **labels)
 
-# Helper to load JSON file
-def load_json(file_path):
+# Parsed data files per worker, valid while (inode, mtime_ns, size) is unchanged
+_json_cache = {}
+CACHE_STATS = {'hits': 0, 'misses': 0}
+
+def _file_signature(file_path):
+    st = os.stat(file_path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _cached_json(file_path):
     if not os.path.exists(file_path):
-        with open(file_path, 'w') as f:
-            json.dump([], f)
-    with open(file_path, 'r') as f:
-        return json.load(f)
+        with open(file_path, 'wb') as f:
+            f.write(dump_data([]))
+    signature = _file_signature(file_path)
+    cached = _json_cache.get(file_path)
+    if cached and cached[0] == signature:
+        CACHE_STATS['hits'] += 1
+        return cached[1]
+
+    CACHE_STATS['misses'] += 1
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+        began = time.perf_counter()
+        try:
+            data = load_data(raw)
+        except ValueError:
+            data = []
+        observe_data('read', file_path, len(raw), time.perf_counter() - began)
+        st = os.fstat(f.fileno())
+    _json_cache[file_path] = ((st.st_ino, st.st_mtime_ns, st.st_size), data)
+    return data
+
+# Lock for one data file, shared by the threads of this worker and, through
+# flock on <file>.lock, by the other gunicorn workers. Reentrant, so helpers
+# can lock again inside a data_transaction
+LOCK_TIMEOUT = float(os.environ.get('LOCK_TIMEOUT', 10))
+LOCK_STATS = {'acquired': 0, 'contended': 0}
+_file_locks = {}
+
+class DataLockTimeout(RuntimeError):
+    pass
+
+class FileLock:
+    def __init__(self, file_path):
+        self.path = file_path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = self._flock()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    # Retry with backoff while another worker holds the file. The backoff stays
+    # short: critical sections take a few ms and a waiter that oversleeps
+    # leaves the file idle
+    def _flock(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        delay = 0.0002
+        LOCK_STATS['acquired'] += 1
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                LOCK_STATS['contended'] += 1
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise DataLockTimeout(f'{os.path.basename(self.path)} is locked')
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, 0.002)
+
+def _file_lock(file_path):
+    lock = _file_locks.get(file_path)
+    if lock is None:
+        lock = _file_locks.setdefault(file_path, FileLock(file_path))
+    return lock
+
+# Read-modify-write across workers: holds the locks of all given files (always
+# taken in the same order) so loads inside the block see the latest data and
+# nobody else writes those files until the block ends
+@contextmanager
+def data_transaction(*file_paths):
+    with ExitStack() as stack:
+        for file_path in sorted(set(file_paths)):
+            stack.enter_context(_file_lock(file_path))
+        yield
+
+@app.errorhandler(DataLockTimeout)
+def data_lock_timeout(e):
+    return Response('Die Daten werden gerade bearbeitet, bitte erneut versuchen.', 503, {'Retry-After': '1'})
+
+# Ledgers that only grow: new records are appended to a line-delimited journal
+# next to the snapshot (sales.json -> sales.jsonl) instead of rewriting it.
+# The first journal line names the snapshot it applies to, so a journal that
+# was already folded into a newer snapshot is never replayed twice. The
+# aggregate store journals the changes of its totals the same way
+JOURNALED = {SALES_FILE, ORDERS_FILE, KASSE_FILE, PAYMENTS_FILE, WALLET_LOG_FILE, AGGREGATES_FILE, SALE_IDS_FILE}
+JOURNAL_COMPACT_BYTES = int(os.environ.get('JOURNAL_COMPACT_BYTES', 1024 * 1024))
+_journal_cache = {}
+_compacting = set()
+
+def _journal_path(file_path):
+    return os.path.splitext(file_path)[0] + '.jsonl'
+
+def _snapshot_tag(file_path):
+    if not os.path.exists(file_path):
+        with open(file_path, 'wb') as f:
+            f.write(dump_data([]))
+    st = os.stat(file_path)
+    return [st.st_mtime_ns, st.st_size]
+
+def _apply_journal(records, entries):
+    for entry in entries:
+        op = entry.get('op')
+        if op == 'add':
+            records.append(entry['record'])
+        elif op == 'put':
+            key, record = entry['key'], entry['record']
+            for i, existing in enumerate(records):
+                if existing.get(key) == record.get(key):
+                    records[i] = record
+                    break
+        elif op == 'del':
+            key, value = entry['key'], entry['value']
+            records[:] = [r for r in records if r.get(key) != value]
+        elif op == 'fold':
+            _fold_deltas(records, entry['deltas'], entry.get('history_from'))
+
+# Working copy of a journaled file's data; dicts (the aggregate store) are
+# copied on write and frozen again once the journal is applied
+def _journal_copy(data):
+    return _cow(data) if type(data) is dict else list(data)
+
+# Snapshot plus journal. Only the part of the journal this worker has not
+# seen yet is parsed; a half-written last line is left for the next read
+def _load_journaled(file_path):
+    snapshot = _cached_json(file_path)
+    journal_path = _journal_path(file_path)
+    try:
+        st = os.stat(journal_path)
+    except FileNotFoundError:
+        return snapshot
+
+    tag = _snapshot_tag(file_path)
+    cached = _journal_cache.get(file_path)
+    if cached and cached['tag'] == tag and cached['ino'] == st.st_ino and cached['offset'] <= st.st_size:
+        if cached['offset'] == st.st_size:
+            return cached['data']
+        base, offset, records = cached['data'], cached['offset'], _journal_copy(cached['data'])
+    else:
+        base, offset, records = snapshot, 0, _journal_copy(snapshot)
+
+    entries = []
+    began, start = time.perf_counter(), offset
+    with open(journal_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            entry = json_loads(line)
+            if entry.get('op') == 'base':
+                if entry.get('snapshot') != tag:
+                    # left over from before the last compaction
+                    return snapshot
+                continue
+            entries.append(entry)
+    observe_data('read', journal_path, offset - start, time.perf_counter() - began)
+    _apply_journal(records, entries)
+    if type(records) is CowDict:
+        records = _freeze(records)
+    # records that only grew by appends, which _page_order extends in place
+    extends = base if type(records) is list and all(entry.get('op') == 'add' for entry in entries) else None
+    _journal_cache[file_path] = {'tag': tag, 'ino': st.st_ino, 'offset': offset, 'data': records, 'extends': extends}
+    return records
+
+def _journal_write(file_path, entries):
+    journal_path = _journal_path(file_path)
+    began = time.perf_counter()
+    lines = [json_dumps(entry) for entry in entries]
+    dumped = time.perf_counter() - began
+    with _file_lock(file_path):
+        tag = _snapshot_tag(file_path)
+        header = None
+        if os.path.exists(journal_path):
+            with open(journal_path, 'rb') as f:
+                first = f.readline()
+            if not first.endswith(b'\n') or json_loads(first).get('snapshot') != tag:
+                header = first
+        if header is not None or not os.path.exists(journal_path):
+            lines.insert(0, json_dumps({'op': 'base', 'snapshot': tag}))
+            mode = 'wb'
+        else:
+            mode = 'ab'
+        with open(journal_path, mode) as f:
+            written = f.write(b''.join(line + b'\n' for line in lines))
+            size = f.tell()
+    observe_data('write', journal_path, written, dumped)
+    if size > JOURNAL_COMPACT_BYTES:
+        _schedule_compaction(file_path)
+
+# Fold the journal into the snapshot
+def compact_journal(file_path):
+    if file_path in PARTITIONED:
+        with _file_lock(file_path):
+            entries = _seal_closed(file_path).values()
+            return any([compact_journal(_partition_file(file_path, entry['file']))
+                        for entry in entries if not entry['sealed']])
+    with _file_lock(file_path):
+        if not os.path.exists(_journal_path(file_path)):
+            return False
+        records = _load_journaled(file_path)
+        _write_snapshot(file_path, records, records)
+    return True
+
+def _schedule_compaction(file_path):
+    if file_path in _compacting:
+        return
+    _compacting.add(file_path)
+
+    def run():
+        try:
+            compact_journal(file_path)
+        finally:
+            _compacting.discard(file_path)
+    threading.Thread(target=run, daemon=True).start()
+
+@app.cli.command('compact')
+def compact_command():
+    for file_path in sorted(JOURNALED):
+        if use_db(file_path):
+            continue
+        if compact_journal(file_path):
+            click.echo(f'{os.path.basename(file_path)}: compacted')
+
+# Sales and orders are kept per month: data/sales/2025-07.json and so on,
+# listed with their date range in data/sales/manifest.json. The current
+# month is an ordinary journaled file. Once its month is over a partition is
+# sealed into an immutable file named after its content
+# (2025-06.<digest>.json), which workers cache without looking at the disk
+# again; changing a sealed month writes a new file and repoints the manifest
+PARTITIONED = {SALES_FILE, ORDERS_FILE}
+_sealed_cache = {}
+
+def _partition_dir(file_path):
+    return os.path.splitext(file_path)[0]
+
+_PARTITION_DIRS = {_partition_dir(file_path) for file_path in PARTITIONED}
+
+def _partition_file(file_path, name):
+    return os.path.join(_partition_dir(file_path), name)
+
+def _manifest_path(file_path):
+    return _partition_file(file_path, 'manifest.json')
+
+def _journaled(file_path):
+    return file_path in JOURNALED or os.path.dirname(file_path) in _PARTITION_DIRS
+
+def _partition_key(record):
+    month = str(record.get('date') or '')[:7]
+    try:
+        datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return 'undated'
+    return month
+
+def _month_after(month):
+    year, month = int(month[:4]), int(month[5:7])
+    return f'{year + month // 12:04d}-{month % 12 + 1:02d}'
+
+def _load_manifest(file_path):
+    if not os.path.exists(_manifest_path(file_path)):
+        _partition_legacy(file_path)
+    return _cached_json(_manifest_path(file_path))
+
+# First start after the switch: split the single-file history into months,
+# the old file is kept as <name>.json.bak
+def _partition_legacy(file_path):
+    with _file_lock(file_path):
+        if os.path.exists(_manifest_path(file_path)):
+            return
+        os.makedirs(_partition_dir(file_path), exist_ok=True)
+        records = _load_journaled(file_path) if os.path.exists(file_path) else []
+        _save_partitions(file_path, {}, _group_by_month(records))
+        for path in (file_path, _journal_path(file_path)):
+            if os.path.exists(path):
+                os.replace(path, path + '.bak')
+
+def _group_by_month(records):
+    groups = {}
+    for record in records:
+        groups.setdefault(_partition_key(record), []).append(record)
+    return groups
+
+# Write the given months (key -> records), list them in the manifest next to
+# the untouched ones and remove the files the manifest no longer refers to.
+# Called with the lock of file_path held
+def _save_partitions(file_path, manifest, groups):
+    current = datetime.now().strftime('%Y-%m')
+    partitions = dict(manifest.get('partitions', {}))
+    for key, records in groups.items():
+        records = _freeze(records)
+        sealed = key < current
+        if sealed:
+            content = json.dumps(records, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            name = f'{key}.{hashlib.sha1(content).hexdigest()[:12]}.json'
+            path = _partition_file(file_path, name)
+            if not os.path.exists(path):
+                _atomic_write(path, records)
+            _sealed_cache[path] = records
+        else:
+            name = f'{key}.json'
+            _write_snapshot(_partition_file(file_path, name), records, records)
+        dated = key != 'undated'
+        partitions[key] = {'file': name, 'sealed': sealed,
+                           'from': f'{key}-01' if dated else None,
+                           'until': f'{_month_after(key)}-01' if dated else None}
+    manifest = {'partitions': dict(sorted(partitions.items()))}
+    _write_snapshot(_manifest_path(file_path), manifest, manifest)
+
+    listed = {entry['file'] for entry in manifest['partitions'].values()}
+    listed |= {name + 'l' for name in listed} | {name + '.lock' for name in listed}
+    listed |= {'manifest.json', 'manifest.json.lock'}
+    directory = _partition_dir(file_path)
+    for name in os.listdir(directory):
+        if name not in listed and not name.startswith('.'):
+            path = os.path.join(directory, name)
+            os.remove(path)
+            _sealed_cache.pop(path, None)
+            _page_order_cache.pop(path, None)
+            _json_cache.pop(path, None)
+            _journal_cache.pop(path, None)
+
+# cache=False reads a sealed month without keeping it, for one-off scans
+def _read_partition(file_path, entry, cache=True):
+    path = _partition_file(file_path, entry['file'])
+    if entry['sealed']:
+        records = _sealed_cache.get(path)
+        if records is None:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            began = time.perf_counter()
+            records = load_data(raw)
+            observe_data('read', path, len(raw), time.perf_counter() - began)
+            if cache:
+                _sealed_cache[path] = records
+        return records
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return _load_journaled(path)
+
+# Manifest entries of the months that can hold records in the given range
+def _partitions(file_path, since=None, until=None, date_prefix=None):
+    return [(key, entry) for key, entry in _load_manifest(file_path)['partitions'].items()
+            if entry['from'] is None or ((not since or entry['until'] > since)
+                                         and (not until or entry['from'] < until)
+                                         and (not date_prefix or key.startswith(date_prefix[:7])))]
+
+# Records of the months the range touches, oldest month first
+def _load_partitioned(file_path, since=None, until=None, date_prefix=None):
+    for attempt in range(3):
+        try:
+            records = []
+            for key, entry in _partitions(file_path, since, until, date_prefix):
+                records.extend(_read_partition(file_path, entry))
+            return records
+        except FileNotFoundError:
+            # sealed by another worker after we read the manifest
+            if attempt == 2:
+                raise
+
+# Seal the months that are over, returns the up to date manifest entries
+def _seal_closed(file_path):
+    manifest = _load_manifest(file_path)
+    current = datetime.now().strftime('%Y-%m')
+    closed = {key: _read_partition(file_path, entry) for key, entry in manifest['partitions'].items()
+              if not entry['sealed'] and key < current}
+    if closed:
+        _save_partitions(file_path, manifest, closed)
+        manifest = _load_manifest(file_path)
+    return manifest['partitions']
+
+# One journal write per open month, one rewrite for sealed or new months
+def _partition_append(file_path, records):
+    partitions = _seal_closed(file_path)
+    rewritten = {}
+    for key, added in _group_by_month(records).items():
+        entry = partitions.get(key)
+        if entry is not None and not entry['sealed']:
+            _journal_write(_partition_file(file_path, entry['file']), [{'op': 'add', 'record': r} for r in added])
+        else:
+            rewritten[key] = (list(_read_partition(file_path, entry)) if entry else []) + added
+    if rewritten:
+        _save_partitions(file_path, _load_manifest(file_path), rewritten)
+
+# A record whose new date falls in another month moves to that month
+def _partition_update(file_path, key, records):
+    by_key = {record.get(key): record for record in records}
+    rewritten = {}
+    moved = []
+    for part, entry in _seal_closed(file_path).items():
+        stored = _read_partition(file_path, entry)
+        puts = [(i, by_key.pop(r.get(key))) for i, r in enumerate(stored) if r.get(key) in by_key]
+        if not puts:
+            continue
+        stays = [(i, record) for i, record in puts if _partition_key(record) == part]
+        moves = [(i, record) for i, record in puts if _partition_key(record) != part]
+        moved.extend(record for _, record in moves)
+        if entry['sealed']:
+            rewritten[part] = list(stored)
+            for i, record in stays:
+                rewritten[part][i] = record
+            gone = {i for i, _ in moves}
+            rewritten[part] = [r for i, r in enumerate(rewritten[part]) if i not in gone]
+        else:
+            _journal_write(_partition_file(file_path, entry['file']),
+                           [{'op': 'put', 'key': key, 'record': record} for _, record in stays] +
+                           [{'op': 'del', 'key': key, 'value': record.get(key)} for _, record in moves])
+    if rewritten:
+        _save_partitions(file_path, _load_manifest(file_path), rewritten)
+    if moved:
+        _partition_append(file_path, moved)
+
+def _partition_delete(file_path, key, value):
+    removed = 0
+    rewritten = {}
+    for part, entry in _seal_closed(file_path).items():
+        stored = _read_partition(file_path, entry)
+        count = sum(1 for r in stored if r.get(key) == value)
+        if not count:
+            continue
+        removed += count
+        if entry['sealed']:
+            rewritten[part] = [r for r in stored if r.get(key) != value]
+        else:
+            _journal_write(_partition_file(file_path, entry['file']), [{'op': 'del', 'key': key, 'value': value}])
+    if rewritten:
+        _save_partitions(file_path, _load_manifest(file_path), rewritten)
+    return removed
+
+# Helper to load JSON file. copy=False returns the cached object itself,
+# only for callers that never modify it
+def load_json(file_path, copy=True):
+    if use_db(file_path):
+        return _db_load(file_path)
+    if file_path in PARTITIONED:
+        data = _load_partitioned(file_path)
+    elif file_path in JOURNALED:
+        data = _load_journaled(file_path)
+    else:
+        data = _cached_json(file_path)
+    return _cow(data) if copy else data
+
+# Written to a temp file and renamed over the old one, so readers in other
+# workers see either the old or the new content, never half a file
+def _write_snapshot(file_path, data, cached):
+    with _file_lock(file_path):
+        previous = _json_cache.pop(file_path, None)
+        st = _atomic_write(file_path, cached)
+        _json_cache[file_path] = ((st.st_ino, st.st_mtime_ns, st.st_size), cached)
+        if file_path == ITEMS_FILE and previous:
+            _carry_catalog_index(previous[1], cached)
+            _carry_alert_index(previous[1], cached)
+            _carry_search_index(previous[1], cached)
+        if _journaled(file_path):
+            _journal_cache.pop(file_path, None)
+            if os.path.exists(_journal_path(file_path)):
+                os.remove(_journal_path(file_path))
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _atomic_write(file_path, data, fmt=None):
+    directory, name = os.path.split(file_path)
+    try:
+        mode = os.stat(file_path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f'.{name}.', suffix='.tmp')
+    try:
+        # mkstemp creates 0600, keep the permissions a plain open() would give
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'wb') as f:
+            began = time.perf_counter()
+            raw = dump_data(data, fmt)
+            observe_data('write', file_path, len(raw), time.perf_counter() - began)
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return st
 
 # Helper to save JSON file
 def save_json(file_path, data):
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    if use_db(file_path):
+        _db_save(file_path, data)
+    elif file_path in PARTITIONED:
+        with _file_lock(file_path):
+            _load_manifest(file_path)
+            _save_partitions(file_path, {}, _group_by_month(data))
+    else:
+        _write_snapshot(file_path, data, _freeze(data))
+    if file_path in AGGREGATED:
+        # wholesale rewrite, the totals are rebuilt on the next read
+        with _file_lock(AGGREGATES_FILE):
+            for path in (AGGREGATES_FILE, _journal_path(AGGREGATES_FILE)):
+                if os.path.exists(path):
+                    os.remove(path)
+    if file_path == KASSE_FILE and os.path.exists(KASSE_CHECKPOINTS_FILE):
+        os.remove(KASSE_CHECKPOINTS_FILE)
+    if file_path == SALES_FILE:
+        drop_sale_columns()
+        with _file_lock(SALE_IDS_FILE):
+            for path in (SALE_IDS_FILE, _journal_path(SALE_IDS_FILE)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+def _matches(record, since=None, until=None, date_prefix=None, **equals):
+    date = str(record.get('date') or '')
+    if date_prefix and not date.startswith(date_prefix):
+        return False
+    if since and date < since:
+        return False
+    if until and date >= until:
+        return False
+    return all(record.get(field) == value for field, value in equals.items())
+
+# Records matching the filters, in file order. `since`/`until` compare the ISO
+# date string (until is exclusive), other keywords must equal the record field
+def query_records(file_path, since=None, until=None, date_prefix=None, **equals):
+    if not use_db(file_path):
+        if file_path in PARTITIONED:
+            records = _load_partitioned(file_path, since, until, date_prefix)
+        else:
+            records = load_json(file_path, copy=False)
+        return [_cow(r) for r in records if _matches(r, since, until, date_prefix, **equals)]
+
+    model = TABLES[file_path]
+    records = [row.data for row in _db_query(model, since, until, date_prefix, equals).order_by(model.id)]
+    # fields without a column are checked on the decoded record
+    return [r for r in records if _matches(r, **equals)]
+
+# Matching records one at a time, oldest first, without holding the whole
+# history: months are read one after the other and rows fetched in batches
+def iter_records(file_path, since=None, until=None, date_prefix=None, **equals):
+    if use_db(file_path):
+        model = TABLES[file_path]
+        for row in _db_query(model, since, until, date_prefix, equals).order_by(model.id).yield_per(500):
+            if _matches(row.data, **equals):
+                yield row.data
+        return
+    if file_path in PARTITIONED:
+        sources = (_read_partition(file_path, entry, cache=False)
+                   for key, entry in _partitions(file_path, since, until, date_prefix))
+    else:
+        sources = [load_json(file_path, copy=False)]
+    for records in sources:
+        for record in records:
+            if _matches(record, since, until, date_prefix, **equals):
+                yield record
+
+def _db_query(model, since, until, date_prefix, equals):
+    query = model.query
+    if since:
+        query = query.filter(model.date >= since)
+    if until:
+        query = query.filter(model.date < until)
+    if date_prefix:
+        query = query.filter(model.date.startswith(date_prefix, autoescape=True))
+    for field, value in equals.items():
+        if field in model.record_fields:
+            query = query.filter(getattr(model, field) == str(value))
+    return query
+
+# Keyset pagination, newest first. Ledger pages are ordered by (date, id,
+# position) and the cursor is the key of the last record shown, so following
+# pages stay the same while new records come in. The position (index in the
+# file or month, the row id in SQLite) keeps the key unique when date and id
+# are shared. Item pages walk back through the catalog from the barcode of
+# the last item shown
+PAGE_SIZE = 50
+PAGE_KEYS = {SALES_FILE: 'order_id', ORDERS_FILE: 'order_number', PAYMENTS_FILE: 'employee', KASSE_FILE: 'user'}
+_page_order_cache = {}
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    return key if isinstance(key, list) and all(type(k) in (str, int) for k in key) else None
+
+# cursor and page size from the query string (?cursor=...&per_page=...)
+def page_args():
+    try:
+        per_page = min(max(int(request.args.get('per_page', PAGE_SIZE)), 1), 500)
+    except ValueError:
+        per_page = PAGE_SIZE
+    return decode_cursor(request.args.get('cursor')), per_page
+
+def _page_key(file_path, record, position):
+    return [str(record.get('date') or ''), str(record.get(PAGE_KEYS[file_path]) or ''), position]
+
+def _valid_page_cursor(cursor):
+    return len(cursor) == 3 and type(cursor[0]) is str and type(cursor[1]) is str and type(cursor[2]) is int
+
+# Fields with a position index next to the page order, so a page filtered by
+# seller only visits that seller's records
+PAGE_INDEXES = {SALES_FILE: ('user',), ORDERS_FILE: ('user',)}
+
+# Page keys of records in ascending order, kept while the parsed records are,
+# with the field indexes built for them so far. When the journal only
+# appended records since, they are merged into the kept order instead of
+# sorting everything again
+def _page_order(file_path, cache_key, records):
+    cached = _page_order_cache.get(cache_key)
+    if cached and cached[0] is records:
+        return cached[1:]
+    journal = _journal_cache.get(cache_key)
+    if cached and journal and journal['data'] is records and journal['extends'] is cached[0]:
+        return _extend_page_order(file_path, cache_key, cached, records)
+    keys = [_page_key(file_path, r, i) for i, r in enumerate(records)]
+    order = sorted(range(len(records)), key=keys.__getitem__)
+    keys, ordered = [keys[i] for i in order], [records[i] for i in order]
+    _page_order_cache[cache_key] = (records, keys, ordered, {})
+    return keys, ordered, {}
+
+def _extend_page_order(file_path, cache_key, cached, records):
+    previous, keys, ordered, indexes = cached
+    added = sorted((_page_key(file_path, records[i], i), records[i]) for i in range(len(previous), len(records)))
+    if added and keys and added[0][0] < keys[-1]:
+        # an entry dated before the newest one: copy, so pages being read
+        # from the kept order don't see it shift
+        keys, ordered, indexes = list(keys), list(ordered), {}
+        for key, record in added:
+            i = bisect.bisect(keys, key)
+            keys.insert(i, key)
+            ordered.insert(i, record)
+    else:
+        for key, record in added:
+            for field, positions in indexes.items():
+                value = record.get(field)
+                if isinstance(value, str):
+                    positions.setdefault(value, []).append(len(ordered))
+            keys.append(key)
+            ordered.append(record)
+    _page_order_cache[cache_key] = (records, keys, ordered, indexes)
+    return keys, ordered, indexes
+
+# Ascending positions in `ordered` of the records whose field equals value
+def _field_positions(indexes, ordered, field, value):
+    positions = indexes.get(field)
+    if positions is None:
+        positions = {}
+        for i, record in enumerate(ordered):
+            key = record.get(field)
+            if isinstance(key, str):
+                positions.setdefault(key, []).append(i)
+        indexes[field] = positions
+    return positions.get(value, ())
+
+# (keys, records) of the file, newest month first for partitioned files;
+# months that only hold records after the cursor are skipped
+def _page_sources(file_path, since, until, date_prefix, cursor):
+    if file_path not in PARTITIONED:
+        yield _page_order(file_path, file_path, load_json(file_path, copy=False))
+        return
+    parts = _partitions(file_path, since, until, date_prefix)
+    for key, entry in sorted(parts, key=lambda part: part[1]['from'] or '', reverse=True):
+        if cursor and entry['from'] and entry['from'] > cursor[0]:
+            continue
+        records = _read_partition(file_path, entry)
+        yield _page_order(file_path, _partition_file(file_path, entry['file']), records)
+
+# One page of the records matching the filters (see query_records) that come
+# after the cursor, and the cursor of the next page (None on the last one)
+def paginate_records(file_path, cursor=None, per_page=PAGE_SIZE, since=None, until=None, date_prefix=None, **equals):
+    entries, more = page_entries(file_path, cursor, per_page, since, until, date_prefix, **equals)
+    return [record for key, record in entries], encode_cursor(entries[-1][0]) if more else None
+
+# The same page as [key, record] pairs, and whether more records follow
+def page_entries(file_path, cursor=None, per_page=PAGE_SIZE, since=None, until=None, date_prefix=None, **equals):
+    if cursor is not None and not _valid_page_cursor(cursor):
+        cursor = None
+    if use_db(file_path):
+        return _db_page_entries(file_path, cursor, per_page, since, until, date_prefix, equals)
+    indexed = next((f for f in PAGE_INDEXES.get(file_path, ()) if isinstance(equals.get(f), str)), None)
+    page = []
+    for keys, ordered, indexes in _page_sources(file_path, since, until, date_prefix, cursor):
+        end = bisect.bisect_left(keys, cursor) if cursor else len(keys)
+        if indexed:
+            positions = _field_positions(indexes, ordered, indexed, equals[indexed])
+            candidates = (positions[j] for j in range(bisect.bisect_left(positions, end) - 1, -1, -1))
+        else:
+            candidates = range(end - 1, -1, -1)
+        for i in candidates:
+            if _matches(ordered[i], since, until, date_prefix, **equals):
+                if len(page) == per_page:
+                    return page, True
+                page.append([keys[i], _cow(ordered[i])])
+    return page, False
+
+def _db_page_entries(file_path, cursor, per_page, since, until, date_prefix, equals):
+    model = TABLES[file_path]
+    date = db.func.coalesce(model.date, '')
+    key = db.func.coalesce(getattr(model, PAGE_KEYS[file_path]), '')
+    query = _db_query(model, since, until, date_prefix, equals)
+    if cursor:
+        query = query.filter(db.or_(date < cursor[0], db.and_(date == cursor[0], db.or_(
+            key < cursor[1], db.and_(key == cursor[1], model.id < cursor[2])))))
+    page = []
+    for row in query.order_by(date.desc(), key.desc(), model.id.desc()).yield_per(per_page + 1):
+        if _matches(row.data, **equals):
+            if len(page) == per_page:
+                return page, True
+            page.append([_page_key(file_path, row.data, row.id), row.data])
+    return page, False
+
+# One page of items, newest first, limited to items of the given sellers
+# (items without a seller belong to admin)
+def paginate_items(cursor=None, per_page=PAGE_SIZE, sellers=None):
+    keep = lambda item: sellers is None or item.get('seller', 'admin') in sellers
+    if use_db(ITEMS_FILE):
+        query = ItemRecord.query
+        if sellers is not None:
+            owned = ItemRecord.seller.in_(sellers)
+            query = query.filter(db.or_(owned, ItemRecord.seller.is_(None)) if 'admin' in sellers else owned)
+        if cursor:
+            row = ItemRecord.query.filter(ItemRecord.barcode == cursor[0]).order_by(ItemRecord.id).first()
+            if row is not None:
+                query = query.filter(ItemRecord.id < row.id)
+        rows = (row.data for row in query.order_by(ItemRecord.id.desc()).yield_per(per_page + 1))
+    else:
+        items = load_json(ITEMS_FILE)
+        index = catalog_index(items)
+        start = len(items)
+        if cursor:
+            pos = index['barcode'].get(cursor[0])
+            start = pos if pos is not None else start
+        if sellers is None:
+            positions = range(start - 1, -1, -1)
+        else:
+            owned = [index['seller'].get(seller, []) for seller in dict.fromkeys(sellers)]
+            positions = heapq.merge(*(reversed(p[:bisect.bisect_left(p, start)]) for p in owned), reverse=True)
+        rows = (items[i] for i in positions)
+    page = []
+    for item in rows:
+        if keep(item):
+            if len(page) == per_page:
+                return page, encode_cursor([page[-1].get('barcode') or ''])
+            page.append(item)
+    return page, None
+
+# Append one record
+def append_record(file_path, record):
+    append_records(file_path, [record])
+
+# Append several records with a single write
+def append_records(file_path, records):
+    if not records:
+        return
+    with _file_lock(file_path):
+        _append_records(file_path, records)
+        if file_path in AGGREGATED:
+            update_aggregates(file_path, added=records)
+        if file_path == KASSE_FILE:
+            update_kasse_checkpoints(added=records)
+        if file_path == SALES_FILE:
+            update_sale_columns(records)
+            update_sale_ids(records)
+
+def _append_records(file_path, records):
+    if use_db(file_path):
+        db.session.add_all([_db_row(TABLES[file_path], record) for record in records])
+        db.session.commit()
+        return
+    if file_path in PARTITIONED:
+        return _partition_append(file_path, records)
+    if file_path in JOURNALED:
+        return _journal_write(file_path, [{'op': 'add', 'record': record} for record in records])
+    stored = load_json(file_path)
+    stored.extend(records)
+    save_json(file_path, stored)
+
+# Replace the stored records that have the same `key` value as the given ones
+def update_records(file_path, key, records):
+    with _file_lock(file_path):
+        if file_path in AGGREGATED:
+            old = _stored_records(file_path, key, [r.get(key) for r in records], first_only=True)
+        _update_records(file_path, key, records)
+        if file_path in AGGREGATED:
+            replaced = {r.get(key) for r in old}
+            update_aggregates(file_path, removed=old, added=[r for r in records if r.get(key) in replaced])
+        if file_path == KASSE_FILE and old:
+            update_kasse_checkpoints(removed=old, added=[r for r in records if r.get(key) in replaced])
+        if file_path == SALES_FILE and old:
+            drop_sale_columns()
+
+def _update_records(file_path, key, records):
+    if use_db(file_path):
+        model = TABLES[file_path]
+        for record in records:
+            row = model.query.filter(getattr(model, key) == str(record.get(key))).order_by(model.id).first()
+            if row is not None:
+                row.data = record
+                for field in model.record_fields:
+                    value = record.get(field)
+                    setattr(row, field, str(value) if value is not None else None)
+        db.session.commit()
+        return
+    if file_path in PARTITIONED:
+        return _partition_update(file_path, key, records)
+    if file_path in JOURNALED:
+        return _journal_write(file_path, [{'op': 'put', 'key': key, 'record': r} for r in records])
+    by_key = {record.get(key): record for record in records}
+    stored = load_json(file_path)
+    for i, existing in enumerate(load_json(file_path, copy=False)):
+        if existing.get(key) in by_key:
+            stored[i] = by_key.pop(existing.get(key))
+    save_json(file_path, stored)
+
+# Delete every record whose `key` equals value, returns how many were removed
+def delete_records(file_path, key, value):
+    with _file_lock(file_path):
+        if file_path in AGGREGATED:
+            old = _stored_records(file_path, key, [value])
+        removed = _delete_records(file_path, key, value)
+        if file_path in AGGREGATED and removed:
+            update_aggregates(file_path, removed=old)
+        if file_path == KASSE_FILE and removed:
+            update_kasse_checkpoints(removed=old)
+        if file_path == SALES_FILE and removed:
+            drop_sale_columns()
+        return removed
+
+def _delete_records(file_path, key, value):
+    if use_db(file_path):
+        model = TABLES[file_path]
+        removed = model.query.filter(getattr(model, key) == str(value)).delete()
+        db.session.commit()
+        return removed
+    if file_path in PARTITIONED:
+        return _partition_delete(file_path, key, value)
+    stored = load_json(file_path, copy=False)
+    if file_path in JOURNALED:
+        removed = sum(1 for r in stored if r.get(key) == value)
+        if removed:
+            _journal_write(file_path, [{'op': 'del', 'key': key, 'value': value}])
+        return removed
+    kept = CowList([r for r in stored if r.get(key) != value])
+    if len(kept) != len(stored):
+        save_json(file_path, kept)
+    return len(stored) - len(kept)
+
+# Stored records whose `key` is one of values, as update_records and
+# delete_records would match them (first match per value for updates)
+def _stored_records(file_path, key, values, first_only=False):
+    if use_db(file_path):
+        model = TABLES[file_path]
+        found = []
+        for value in values:
+            query = model.query.filter(getattr(model, key) == str(value)).order_by(model.id)
+            found.extend(row.data for row in (query.limit(1) if first_only else query))
+        return found
+    wanted = set(values)
+    found = []
+    for record in load_json(file_path, copy=False):
+        if record.get(key) in wanted:
+            found.append(record)
+            if first_only:
+                wanted.discard(record.get(key))
+    return found
+
+# Running totals of sales, orders and kasse entries per day, month and seller,
+# kept up to date by the record helpers above so the dashboards don't have to
+# walk the whole history. `flask rebuild-aggregates` recomputes them
+AGGREGATED = {SALES_FILE, ORDERS_FILE, KASSE_FILE}
+AGGREGATE_FIELDS = ('revenue', 'profit', 'order_total', 'sales', 'purchases', 'purchase_cost', 'orders', 'cash')
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _record_day(record):
+    try:
+        return datetime.fromisoformat(record.get('date')).date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+# What one record adds to the buckets it falls into
+def _contribution(file_path, record):
+    if file_path == SALES_FILE:
+        lines = record.get('items')
+        if not isinstance(lines, list):
+            revenue, profit = _number(record.get('total_price')), 0.0
+        else:
+            revenue = sum(_number(line.get('total_price')) for line in lines)
+            profit = sum((_number(line.get('sale_price')) - _number(line.get('purchase_price')))
+                         * _number(line.get('quantity')) for line in lines)
+        return {'revenue': revenue, 'profit': profit,
+                'order_total': _number(record.get('total_order_price')), 'sales': 1}
+    if file_path == ORDERS_FILE:
+        return {'purchases': _number(record.get('total_price')),
+                'purchase_cost': _number(record.get('price')) * _number(record.get('quantity')),
+                'orders': 1}
+    return {'cash': _number(record.get('amount'))}
+
+def _empty_aggregates():
+    return {'total': {'all': {}, 'day': {}, 'month': {}}, 'sellers': {}}
+
+# Adds a contribution to the buckets of its day (None: only the all-time
+# totals) and seller (None: only the shop totals)
+def _fold_delta(aggregates, day, seller, contribution):
+    scopes = [aggregates['total']]
+    if seller:
+        scopes.append(aggregates['sellers'].setdefault(seller, {'all': {}, 'day': {}, 'month': {}}))
+    for scope in scopes:
+        buckets = [scope['all']]
+        if day:
+            buckets.append(scope['day'].setdefault(day, {}))
+            buckets.append(scope['month'].setdefault(day[:7], {}))
+        for bucket in buckets:
+            for field, value in contribution.items():
+                bucket[field] = round(bucket.get(field, 0) + value, 6)
+
+def _fold(aggregates, file_path, record, sign):
+    contribution = {field: sign * value for field, value in _contribution(file_path, record).items()}
+    _fold_delta(aggregates, _record_day(record), str(record['user']) if record.get('user') else None, contribution)
+
+# A journal entry of the aggregate store: [day, seller, contribution] per
+# bucket that changed, and the earliest rolled-up day that changed
+def _fold_deltas(aggregates, deltas, history_from=None):
+    for day, seller, contribution in deltas:
+        _fold_delta(aggregates, day, seller, contribution)
+    if history_from is not None:
+        current = aggregates.get('history_from')
+        aggregates['history_from'] = history_from if current is None else min(current, history_from)
+
+# Called with the ledger lock held. The aggregates lock is always taken after
+# the ledger locks. Only the change is appended to the store's journal, the
+# journal is folded into aggregates.json when it grows past
+# JOURNAL_COMPACT_BYTES. Without a store there is nothing to update, the next
+# read rebuilds it from the ledgers, which already contain this write
+def update_aggregates(file_path, removed=(), added=()):
+    with _file_lock(AGGREGATES_FILE):
+        if _stored_aggregates() is None:
+            return
+        deltas = {}
+        for sign, records in ((-1, removed), (1, added)):
+            for record in records:
+                key = (_record_day(record), str(record['user']) if record.get('user') else None)
+                bucket = deltas.setdefault(key, {})
+                for field, value in _contribution(file_path, record).items():
+                    bucket[field] = bucket.get(field, 0) + sign * value
+        entry = {'op': 'fold', 'deltas': [[day, seller, bucket] for (day, seller), bucket in deltas.items()]}
+        # a day that is already rolled up changed, see roll_up_history
+        today = datetime.now().date().isoformat()
+        past = [day for day, seller in deltas if day and day < today]
+        if past:
+            entry['history_from'] = min(past)
+        _journal_write(AGGREGATES_FILE, [entry])
+
+def compute_aggregates():
+    aggregates = _empty_aggregates()
+    for file_path in sorted(AGGREGATED):
+        for record in load_json(file_path, copy=False):
+            _fold(aggregates, file_path, record, 1)
+    return aggregates
+
+# Nobody knows what changed since the last store, so the whole daily
+# history is rolled up again
+def rebuild_aggregates():
+    with data_transaction(*AGGREGATED), _file_lock(AGGREGATES_FILE):
+        save_json(AGGREGATES_FILE, dict(compute_aggregates(), history_from=''))
+        return _json_cache[AGGREGATES_FILE][1]
+
+def _stored_aggregates():
+    if not os.path.exists(AGGREGATES_FILE):
+        return None
+    aggregates = _load_journaled(AGGREGATES_FILE)
+    return aggregates if isinstance(aggregates, dict) and 'total' in aggregates else None
+
+# The aggregate store, built from the ledgers the first time it is needed
+def load_aggregates():
+    aggregates = _stored_aggregates()
+    return aggregates if aggregates is not None else rebuild_aggregates()
+
+# Totals of one bucket: scope is 'all', 'day' or 'month', key the ISO day or
+# month for the latter two. Missing buckets are all zero
+def aggregate_totals(scope='all', key=None, seller=None):
+    aggregates = load_aggregates()
+    tree = aggregates['sellers'].get(seller, {}) if seller is not None else aggregates['total']
+    bucket = tree.get('all', {}) if scope == 'all' else tree.get(scope, {}).get(key, {})
+    return {field: bucket.get(field, 0) for field in AGGREGATE_FIELDS}
+
+@app.cli.command('rebuild-aggregates')
+def rebuild_aggregates_command():
+    stored = _stored_aggregates() or _empty_aggregates()
+    drift = _aggregate_drift(stored, rebuild_aggregates())
+    for path, old, new in drift:
+        click.echo(f'{path}: {old} -> {new}')
+    click.echo(f'aggregates rebuilt, {len(drift)} values corrected')
+
+# (path, stored, rebuilt) for every total that was off by more than a cent
+def _aggregate_drift(stored, rebuilt, path=''):
+    drift = []
+    for key in sorted(set(stored) | set(rebuilt), key=str):
+        old, new = stored.get(key, {}), rebuilt.get(key, {})
+        if isinstance(old, dict) or isinstance(new, dict):
+            drift.extend(_aggregate_drift(old if isinstance(old, dict) else {},
+                                          new if isinstance(new, dict) else {}, f'{path}/{key}'))
+        elif abs(_number(old) - _number(new)) >= 0.005:
+            drift.append((f'{path}/{key}', old, new))
+    return drift
+
+# Closing balance of the kasse after every day with entries, next to the
+# ledger as [[day, balance, entries], ...] in day order (undated entries
+# count as day ''). A change is applied to the checkpoints from its day on,
+# without reading the ledger
+def _kasse_day(record):
+    return str(record.get('date') or '')[:10]
+
+# That day's kasse entries with their page keys, undated ones for day ''
+def _kasse_entries(day):
+    until = day + '\uffff' if day else '\x00'
+    if use_db(KASSE_FILE):
+        rows = _db_query(KasseRecord, day or None, until, None, {})
+        return [(_page_key(KASSE_FILE, row.data, row.id), row.data) for row in rows]
+    keys, ordered, _ = _page_order(KASSE_FILE, KASSE_FILE, load_json(KASSE_FILE, copy=False))
+    start, end = bisect.bisect_left(keys, [day]), bisect.bisect_left(keys, [until])
+    return zip(keys[start:end], ordered[start:end])
+
+# [[day, amount, entries], ...] in day order, applied on top of opening
+def _kasse_closings(changes, opening):
+    days, balance = [], opening
+    for day, amount, entries in changes:
+        if entries > 0:
+            balance = round(balance + amount, 2)
+            days.append([day, balance, entries])
+    return days
+
+def _kasse_checkpoint_days():
+    totals = {}
+    for record in iter_records(KASSE_FILE):
+        total = totals.setdefault(_kasse_day(record), [0.0, 0])
+        total[0] += _number(record.get('amount'))
+        total[1] += 1
+    return _kasse_closings([[day] + totals[day] for day in sorted(totals)], 0)
+
+def _stored_kasse_checkpoints():
+    if not os.path.exists(KASSE_CHECKPOINTS_FILE):
+        return None
+    stored = _cached_json(KASSE_CHECKPOINTS_FILE)
+    if not isinstance(stored, dict) or not isinstance(stored.get('days'), list):
+        return None
+    return stored['days'] if all(len(entry) == 3 for entry in stored['days'][-1:]) else None
+
+# Called with the kasse lock held, after the ledger changed. The checkpoints
+# before the earliest changed day stay, the later ones are shifted by the
+# change. Without checkpoints the next read builds them from the ledger
+def update_kasse_checkpoints(removed=(), added=()):
+    days = _stored_kasse_checkpoints()
+    if days is None or not (removed or added):
+        return
+    changes = {}
+    for sign, records in ((-1, removed), (1, added)):
+        for record in records:
+            change = changes.setdefault(_kasse_day(record), [0.0, 0])
+            change[0] += sign * _number(record.get('amount'))
+            change[1] += sign
+    keep = bisect.bisect_left(days, [min(changes)])
+    opening = days[keep - 1][1] if keep else 0
+    # each later day's own total, from the difference of the closings
+    totals, previous = {}, opening
+    for day, closing, entries in days[keep:]:
+        totals[day] = [closing - previous, entries]
+        previous = closing
+    for day, (amount, entries) in changes.items():
+        total = totals.setdefault(day, [0.0, 0])
+        total[0] += amount
+        total[1] += entries
+    tail = _kasse_closings([[day] + totals[day] for day in sorted(totals)], opening)
+    save_json(KASSE_CHECKPOINTS_FILE, {'days': list(days[:keep]) + tail})
+
+def kasse_checkpoints():
+    days = _stored_kasse_checkpoints()
+    if days is None:
+        with _file_lock(KASSE_FILE):
+            days = _stored_kasse_checkpoints()
+            if days is None:
+                save_json(KASSE_CHECKPOINTS_FILE, {'days': _kasse_checkpoint_days()})
+                days = _stored_kasse_checkpoints()
+    return days
+
+# Balance right after the newest entry older than the page cursor, i.e. at
+# the top of that page; without a cursor the current balance
+def kasse_balance_at(cursor=None):
+    days = kasse_checkpoints()
+    if not cursor or not _valid_page_cursor(cursor):
+        return days[-1][1] if days else 0
+    day = cursor[0][:10]
+    i = bisect.bisect_right(days, [day, float('inf')])
+    closing = days[i - 1][1] if i else 0
+    later = sum(_number(r.get('amount')) for key, r in _kasse_entries(day) if key >= cursor)
+    return round(closing - later, 2)
+
+# Sales lines as columns for the analytics, one row per line in the order the
+# sales were appended: an .npy file per field in data/columns, barcodes and
+# sellers as ids into barcodes.jsonl and sellers.jsonl, times as seconds
+# since 1970 in shop time. meta.json holds how many rows and dictionary
+# entries are complete, appends write past that and move it last. New sales
+# wait in pending-<batch>.jsonl, unsynced like the sales journal, until the
+# next query (or JOURNAL_COMPACT_BYTES of them) writes them into the columns;
+# edits and deletes drop the columns and the next query rebuilds them (also
+# `flask rebuild-sale-columns`). Queries run on memory maps with NumPy when
+# it is installed, else on arrays in Python
+COLUMNS_META_FILE = os.path.join(COLUMNS_DIR, 'meta.json')
+SALE_COLUMNS = (('time', 'q', '<i8'), ('barcode', 'i', '<i4'), ('seller', 'i', '<i4'),
+                ('quantity', 'd', '<f8'), ('sale_price', 'd', '<f8'), ('purchase_price', 'd', '<f8'),
+                ('total_price', 'd', '<f8'))
+COLUMN_DICTIONARIES = ('barcodes', 'sellers')
+NO_TIME = -2 ** 63
+NPY_HEADER_SIZE = 128
+EPOCH = datetime(1970, 1, 1)
+_columns_cache = {}
+_columns_lock = threading.RLock()
+
+def _column_path(name):
+    return os.path.join(COLUMNS_DIR, f'{name}.npy')
+
+def _dictionary_path(name):
+    return os.path.join(COLUMNS_DIR, f'{name}.jsonl')
+
+def _pending_path(meta):
+    return os.path.join(COLUMNS_DIR, f"pending-{meta['batch']}.jsonl")
+
+# .npy version 1.0 header of a fixed size, so the row count can grow in place
+def _npy_header(descr, rows):
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, rows)
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', NPY_HEADER_SIZE - 10) + header.ljust(NPY_HEADER_SIZE - 11).encode('latin1') + b'\n'
+
+def _sale_seconds(date):
+    try:
+        moment = datetime.fromisoformat(str(date)).replace(tzinfo=None)
+    except ValueError:
+        return NO_TIME
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+def _stored_column_meta():
+    if not os.path.exists(COLUMNS_META_FILE):
+        return None
+    meta = _cached_json(COLUMNS_META_FILE)
+    # columns written with another layout are rebuilt
+    if not isinstance(meta, dict) or meta.get('columns') != [name for name, code, descr in SALE_COLUMNS]:
+        return None
+    return meta
+
+# Barcodes with their product name and sellers of the stored columns, with
+# the id lookups. Entries other workers appended are read on top
+def _column_dictionaries(meta):
+    with _columns_lock:
+        return _read_column_dictionaries(meta)
+
+def _read_column_dictionaries(meta):
+    cached = _columns_cache.get('dictionaries')
+    if cached is None or cached['generation'] != meta['generation']:
+        cached = {'generation': meta['generation'], 'sizes': {name: [0, 0] for name in COLUMN_DICTIONARIES},
+                  'barcodes': [], 'names': [], 'sellers': [], 'barcode_ids': {}, 'seller_ids': {}}
+    for name in COLUMN_DICTIONARIES:
+        count, size = cached['sizes'][name]
+        if count < meta[name][0]:
+            with open(_dictionary_path(name), 'rb') as f:
+                f.seek(size)
+                raw = f.read(meta[name][1] - size)
+            for line in raw.decode('utf-8').splitlines():
+                entry = json.loads(line)
+                if name == 'barcodes':
+                    cached['barcode_ids'][entry[0]] = len(cached['barcodes'])
+                    cached['barcodes'].append(entry[0])
+                    cached['names'].append(entry[1])
+                else:
+                    cached['seller_ids'][entry] = len(cached['sellers'])
+                    cached['sellers'].append(entry)
+            cached['sizes'][name] = list(meta[name])
+    _columns_cache['dictionaries'] = cached
+    return cached
+
+# Appends the lines of records after the rows meta counts as complete and
+# returns the meta that includes them. Called with the sales lock held
+def _append_sale_columns(meta, records):
+    with _columns_lock:
+        try:
+            return _write_sale_columns(meta, records)
+        except BaseException:
+            # the cached dictionaries may hold entries that were never stored
+            _columns_cache.pop('dictionaries', None)
+            raise
+
+def _write_sale_columns(meta, records):
+    dictionaries = _column_dictionaries(meta)
+    barcode_ids, seller_ids = dictionaries['barcode_ids'], dictionaries['seller_ids']
+    columns = {name: array.array(code) for name, code, descr in SALE_COLUMNS}
+    added = {name: [] for name in COLUMN_DICTIONARIES}
+    for record in records:
+        seconds = _sale_seconds(record.get('date'))
+        seller = str(record.get('user') or '')
+        if seller not in seller_ids:
+            seller_ids[seller] = len(dictionaries['sellers'])
+            dictionaries['sellers'].append(seller)
+            added['sellers'].append(seller)
+        for line in sale_items(record):
+            code = str(line.get('barcode') or '')
+            if code not in barcode_ids:
+                barcode_ids[code] = len(dictionaries['barcodes'])
+                dictionaries['barcodes'].append(code)
+                dictionaries['names'].append(str(line.get('product_name') or ''))
+                added['barcodes'].append([code, dictionaries['names'][-1]])
+            columns['time'].append(seconds)
+            columns['barcode'].append(barcode_ids[code])
+            columns['seller'].append(seller_ids[seller])
+            for name in ('quantity', 'sale_price', 'purchase_price', 'total_price'):
+                columns[name].append(_number(line.get(name)))
+
+    meta = dict(meta)
+    for name in COLUMN_DICTIONARIES:
+        if not added[name]:
+            continue
+        raw = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in added[name]).encode('utf-8')
+        with open(_dictionary_path(name), 'r+b') as f:
+            f.truncate(meta[name][1])
+            f.seek(0, os.SEEK_END)
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        meta[name] = [meta[name][0] + len(added[name]), meta[name][1] + len(raw)]
+        dictionaries['sizes'][name] = list(meta[name])
+    rows = meta['rows'] + len(columns['time'])
+    for name, code, descr in SALE_COLUMNS:
+        values = columns[name]
+        if sys.byteorder != 'little':
+            values.byteswap()
+        with open(_column_path(name), 'r+b') as f:
+            f.truncate(NPY_HEADER_SIZE + meta['rows'] * values.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(values.tobytes())
+            f.seek(0)
+            f.write(_npy_header(descr, rows))
+            f.flush()
+            os.fsync(f.fileno())
+    meta['rows'] = rows
+    return meta
+
+# Called with the sales lock held. Without columns the next query builds them
+def update_sale_columns(records):
+    meta = _stored_column_meta()
+    if meta is None:
+        return
+    with open(_pending_path(meta), 'ab') as f:
+        f.write(b''.join(json_dumps(record) + b'\n' for record in records))
+        size = f.tell()
+    if size > JOURNAL_COMPACT_BYTES:
+        _flush_pending_sales(meta)
+
+# Writes the pending sales into the columns and starts the next batch.
+# Called with the sales lock held
+def _flush_pending_sales(meta):
+    path = _pending_path(meta)
+    records = []
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                records.append(json_loads(line))
+    meta = _append_sale_columns(meta, records)
+    meta['batch'] += 1
+    save_json(COLUMNS_META_FILE, meta)
+    if os.path.exists(path):
+        os.remove(path)
+    return _stored_column_meta()
+
+def drop_sale_columns():
+    if os.path.exists(COLUMNS_META_FILE):
+        os.remove(COLUMNS_META_FILE)
+
+def rebuild_sale_columns():
+    with _file_lock(SALES_FILE):
+        drop_sale_columns()
+        os.makedirs(COLUMNS_DIR, exist_ok=True)
+        for name, code, descr in SALE_COLUMNS:
+            with open(_column_path(name), 'wb') as f:
+                f.write(_npy_header(descr, 0))
+        for name in COLUMN_DICTIONARIES:
+            open(_dictionary_path(name), 'wb').close()
+        for name in os.listdir(COLUMNS_DIR):
+            if name.startswith('pending-'):
+                os.remove(os.path.join(COLUMNS_DIR, name))
+        meta = {'generation': uuid.uuid4().hex, 'columns': [name for name, code, descr in SALE_COLUMNS],
+                'rows': 0, 'batch': 0, 'barcodes': [0, 0], 'sellers': [0, 0]}
+        batch = []
+        for record in iter_records(SALES_FILE):
+            batch.append(record)
+            if len(batch) == 5000:
+                meta, batch = _append_sale_columns(meta, batch), []
+        save_json(COLUMNS_META_FILE, _append_sale_columns(meta, batch))
+        return _stored_column_meta()
+
+# Columns of all complete rows as NumPy memory maps, or as arrays without
+# NumPy (rows appended since the last call are read on top)
+def sale_columns():
+    meta = _stored_column_meta()
+    if meta is None or os.path.exists(_pending_path(meta)):
+        with _file_lock(SALES_FILE):
+            meta = _stored_column_meta() or rebuild_sale_columns()
+            if os.path.exists(_pending_path(meta)):
+                meta = _flush_pending_sales(meta)
+    cached = _columns_cache.get('columns')
+    if cached and cached[0] is meta:
+        return cached[1], _column_dictionaries(meta)
+    rows = meta['rows']
+    previous = cached[1] if cached and cached[0]['generation'] == meta['generation'] else {}
+    columns = {}
+    for name, code, descr in SALE_COLUMNS:
+        if numpy is not None:
+            columns[name] = (numpy.memmap(_column_path(name), dtype=descr, mode='r', offset=NPY_HEADER_SIZE, shape=(rows,))
+                             if rows else numpy.zeros(0, dtype=descr))
+            continue
+        values = previous.get(name, array.array(code))[:rows]
+        tail = array.array(code)
+        with open(_column_path(name), 'rb') as f:
+            f.seek(NPY_HEADER_SIZE + len(values) * tail.itemsize)
+            tail.frombytes(f.read((rows - len(values)) * tail.itemsize))
+        if sys.byteorder != 'little':
+            tail.byteswap()
+        columns[name] = values + tail
+    _columns_cache['columns'] = (meta, columns)
+    return columns, _column_dictionaries(meta)
+
+ANALYTICS_GROUPS = ('product', 'seller', 'weekday', 'hour')
+WEEKDAYS = ('Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag')
+
+# Revenue, profit, quantity and number of lines of the sales lines grouped by
+# product, seller, weekday or hour. since/until are ISO dates (until
+# exclusive), lines with a date that can't be read only count without them
+# and never for weekday or hour. Products and sellers come biggest profit
+# first, weekdays and hours in order
+def sales_analytics(group, since=None, until=None, seller=None):
+    columns, dictionaries = sale_columns()
+    size = {'product': len(dictionaries['barcodes']), 'seller': len(dictionaries['sellers']),
+            'weekday': 7, 'hour': 24}[group]
+    seller_id = dictionaries['seller_ids'].get(seller, -1) if seller is not None else None
+    low = _sale_seconds(since) if since else None
+    high = _sale_seconds(until) if until else None
+    dated = bool(since or until or group in ('weekday', 'hour'))
+    if numpy is not None:
+        sums = _group_sums_numpy(columns, group, size, low, high, dated, seller_id)
+    else:
+        sums = _group_sums_python(columns, group, size, low, high, dated, seller_id)
+
+    results = []
+    for key, (revenue, profit, quantity, lines) in enumerate(zip(*sums)):
+        if not lines and group in ('product', 'seller'):
+            continue
+        if group == 'product':
+            key, label = dictionaries['barcodes'][key], dictionaries['names'][key]
+        elif group == 'seller':
+            key = label = dictionaries['sellers'][key]
+        else:
+            label = WEEKDAYS[key] if group == 'weekday' else f'{key:02d} Uhr'
+        results.append({'key': key, 'label': label, 'revenue': round(float(revenue), 2),
+                        'profit': round(float(profit), 2), 'quantity': float(quantity), 'lines': int(lines)})
+    if group in ('product', 'seller'):
+        results.sort(key=lambda entry: entry['profit'], reverse=True)
+    return results
+
+def _group_keys(group, times, columns, mask=None):
+    if group == 'weekday':
+        # 1970-01-01 was a Thursday
+        return (times // 86400 + 3) % 7
+    if group == 'hour':
+        return times // 3600 % 24
+    values = columns['barcode' if group == 'product' else 'seller']
+    return values if mask is None else values[mask]
+
+def _group_sums_numpy(columns, group, size, low, high, dated, seller_id):
+    times = columns['time']
+    mask = numpy.ones(len(times), dtype=bool)
+    if dated:
+        mask &= times != NO_TIME
+    if low is not None:
+        mask &= times >= low
+    if high is not None:
+        mask &= times < high
+    if seller_id is not None:
+        mask &= columns['seller'] == seller_id
+    quantity = columns['quantity'][mask]
+    sale_price, purchase_price = columns['sale_price'][mask], columns['purchase_price'][mask]
+    keys = _group_keys(group, times[mask], columns, mask)
+    return (numpy.bincount(keys, weights=columns['total_price'][mask], minlength=size),
+            numpy.bincount(keys, weights=(sale_price - purchase_price) * quantity, minlength=size),
+            numpy.bincount(keys, weights=quantity, minlength=size),
+            numpy.bincount(keys, minlength=size))
+
+def _group_sums_python(columns, group, size, low, high, dated, seller_id):
+    revenue, profit, quantities, lines = [0.0] * size, [0.0] * size, [0.0] * size, [0] * size
+    by_id = group in ('product', 'seller')
+    ids = columns['barcode' if group == 'product' else 'seller']
+    for seconds, key, seller, quantity, sale_price, purchase_price, total_price in zip(
+            columns['time'], ids, columns['seller'], columns['quantity'],
+            columns['sale_price'], columns['purchase_price'], columns['total_price']):
+        if dated and seconds == NO_TIME:
+            continue
+        if (low is not None and seconds < low) or (high is not None and seconds >= high):
+            continue
+        if seller_id is not None and seller != seller_id:
+            continue
+        if not by_id:
+            key = _group_keys(group, seconds, columns)
+        revenue[key] += total_price
+        profit[key] += (sale_price - purchase_price) * quantity
+        quantities[key] += quantity
+        lines[key] += 1
+    return revenue, profit, quantities, lines
+
+@app.cli.command('rebuild-sale-columns')
+def rebuild_sale_columns_command():
+    meta = rebuild_sale_columns()
+    click.echo(f"sale columns rebuilt, {meta['rows']} lines")
+
+# One-shot copy of the JSON files into the SQLite tables
+@app.cli.command('migrate-json')
+@click.option('--force', is_flag=True, help='Replace tables that already contain rows.')
+def migrate_json_command(force):
+    db.create_all()
+    for file_path, model in TABLES.items():
+        if not os.path.exists(file_path) and not (file_path in PARTITIONED and os.path.exists(_manifest_path(file_path))):
+            continue
+        if model.query.count() and not force:
+            click.echo(f'{model.__tablename__}: already migrated, skipped (use --force)')
+            continue
+        if file_path in PARTITIONED:
+            records = _load_partitioned(file_path)
+        elif file_path in JOURNALED:
+            records = _load_journaled(file_path)
+        else:
+            with open(file_path, 'rb') as f:
+                records = load_data(f.read())
+        _db_save(file_path, records)
+        click.echo(f'{model.__tablename__}: {len(records)} records')
+
+# Rewrite the data files in another format (see DATA_FORMAT). Journals are
+# folded into their snapshots first, everything under the data file locks
+@app.cli.command('convert-data')
+@click.option('--format', 'fmt', type=click.Choice(DATA_FORMATS), default=DATA_FORMAT, show_default=True)
+def convert_data_command(fmt):
+    if fmt == 'msgpack' and msgpack is None:
+        raise click.ClickException('msgpack is not installed')
+    ledgers = sorted((set(TABLES) | JOURNALED | {HISTORY_FILE}) - {AGGREGATES_FILE})
+    with data_transaction(*ledgers), _file_lock(AGGREGATES_FILE):
+        for file_path in ledgers + [AGGREGATES_FILE]:
+            if use_db(file_path):
+                continue
+            if file_path in PARTITIONED:
+                compact_journal(file_path)
+                directory = _partition_dir(file_path)
+                paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                         if name.endswith('.json')]
+            else:
+                if file_path in JOURNALED:
+                    compact_journal(file_path)
+                paths = [file_path] if os.path.exists(file_path) else []
+            for path in paths:
+                with _file_lock(path):
+                    before = os.path.getsize(path)
+                    with open(path, 'rb') as f:
+                        try:
+                            data = load_data(f.read())
+                        except ValueError as e:
+                            click.echo(f'{os.path.relpath(path, DATA_PATH)}: skipped ({e})')
+                            continue
+                    after = _atomic_write(path, data, fmt).st_size
+                click.echo(f'{os.path.relpath(path, DATA_PATH)}: {before} -> {after} bytes')
 
 # Load all users
 def load_users():
@@ -40,14 +1947,83 @@ def load_users():
 def save_users(users):
     save_json(USERS_FILE, users)
 
-# Load items
-def load_items():
-    return load_json(ITEMS_FILE)
-
 # Save items
 def save_items(items):
     save_json(ITEMS_FILE, items)
 
+# Catalog index: barcode and casefolded product name -> position in items.json,
+# seller -> ascending positions of the seller's items. It belongs to the cached
+# item list and is carried over to the next version when this worker writes
+# the file, only touching the positions that changed
+_catalog = {'data': None, 'barcode': {}, 'name': {}, 'seller': {}}
+
+def _item_name_key(item):
+    name = item.get('product_name') or item.get('name')
+    return str(name).casefold() if name else None
+
+def _index_item(index, pos, item):
+    index['barcode'].setdefault(item.get('barcode'), pos)
+    name = _item_name_key(item)
+    if name is not None:
+        index['name'].setdefault(name, pos)
+    seller = item.get('seller', 'admin')
+    if isinstance(seller, str):
+        index['seller'].setdefault(seller, []).append(pos)
+
+def _build_catalog_index(items):
+    index = {'data': items, 'barcode': {}, 'name': {}, 'seller': {}}
+    for pos, item in enumerate(list.__iter__(items) if type(items) is CowList else items):
+        _index_item(index, pos, item)
+    return index
+
+def _carry_catalog_index(old, new):
+    if _catalog['data'] is not old:
+        return
+    if len(new) < len(old):
+        _catalog['data'] = None
+        return
+    for pos in range(len(old)):
+        if new[pos] is not old[pos]:
+            if (new[pos].get('barcode') != old[pos].get('barcode')
+                    or _item_name_key(new[pos]) != _item_name_key(old[pos])
+                    or new[pos].get('seller', 'admin') != old[pos].get('seller', 'admin')):
+                # renamed, re-barcoded or moved to another seller: positions
+                # of duplicates may move
+                _catalog['data'] = None
+                return
+    for pos in range(len(old), len(new)):
+        _index_item(_catalog, pos, new[pos])
+    _catalog['data'] = new
+
+# Index for `items`: the maintained one when `items` is a view of the cached
+# catalog, otherwise one built for this list
+def catalog_index(items):
+    origin = items._origin if type(items) is CowList else None
+    cached = _json_cache.get(ITEMS_FILE)
+    if origin is None or not cached or cached[1] is not origin:
+        return _build_catalog_index(items)
+    if _catalog['data'] is not origin:
+        _catalog.update(_build_catalog_index(origin))
+    return _catalog
+
+# Item with this barcode, or with this product name (case-insensitive)
+def find_item(items, barcode=None, name=None, index=None):
+    if index is None:
+        index = catalog_index(items)
+    if barcode is not None:
+        pos = index['barcode'].get(barcode)
+        matches = lambda i: i.get('barcode') == barcode
+    else:
+        pos = index['name'].get(str(name).casefold())
+        matches = lambda i: str(i.get('product_name') or i.get('name') or '').lower() == str(name).lower()
+    if pos is not None:
+        if pos < len(items) and matches(items[pos]):
+            return items[pos]
+    elif index['data'] is getattr(items, '_origin', items) and len(items) == len(index['data']):
+        return None
+    # the list changed since it was indexed, or names that only casefold alike
+    return next((i for i in items if matches(i)), None)
+
 # Load sales
 def load_sales():
     return load_json(SALES_FILE)
@@ -58,11 +2034,8 @@ def save_sales(sales):
 
 # Find user by username
 def find_user(username):
-    users = load_users()
-    for user in users:
-        if user['username'] == username:
-            return user
-    return None
+    users = query_records(USERS_FILE, username=username)
+    return users[0] if users else None
 
 # Login_required
 def login_required(roles=None):
@@ -82,6 +2055,41 @@ def login_required(roles=None):
         return decorated_function
     return decorator
 
+# Request and template timing for the metrics
+@app.before_request
+def _start_request_timer():
+    if METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = _metric_endpoint()
+        observe_metric('ria_request_duration_seconds', time.perf_counter() - started,
+                       endpoint=endpoint, method=request.method)
+        if response.status_code >= 500:
+            count_metric('ria_request_errors_total', endpoint=endpoint)
+    return response
+
+# An exception that propagates (debug, testing) never reaches after_request
+@app.teardown_request
+def _record_failed_request(exc):
+    if exc is not None and g.pop('request_started', None) is not None:
+        count_metric('ria_request_errors_total', endpoint=_metric_endpoint())
+
+def _start_template_timer(sender, template, context, **extra):
+    if METRICS_ENABLED:
+        g.template_started = time.perf_counter()
+
+def _record_template(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        observe_metric('ria_template_render_seconds', time.perf_counter() - started, template=template.name or 'string')
+
+before_render_template.connect(_start_template_timer, app)
+template_rendered.connect(_record_template, app)
+
 # ROUTES
 @app.route('/')
 def index():
@@ -120,16 +2128,9 @@ def logout():
     flash('Logged out', 'success')
     return redirect(url_for('login'))
 
-# load_sales   
-def load_sales():
-    with open(SALES_FILE, 'r') as f:
-        return json.load(f)
-    
-
 # load_purchases 
 def load_purchases():
-    with open(ORDERS_FILE, 'r') as f:
-        return json.load(f)
+    return load_json(ORDERS_FILE)
 
 # Date Time Format 
 @app.template_filter('datetimeformat')
@@ -158,16 +2159,418 @@ def calculate_all_time_profit(sales, items):
 
 
 
+# Stock alerts: positions of items at or below LOW_STOCK_LIMIT, and dated
+# items as (in stock since, position) in age order. Like the catalog index it
+# belongs to the cached item list and is carried over when this worker writes
+# it, so reading the alerts costs O(alerts) instead of a pass over the catalog
+LOW_STOCK_LIMIT = 5
+STOCK_AGE_DAYS = 21
+_alert_index = {'data': None, 'low': {}, 'aged': []}
+
+def _in_stock_since(item):
+    value = item.get('added_date') or item.get('date_added') or item.get('date')
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def _index_alerts(low, aged, pos, item):
+    if _number(item.get('quantity')) <= LOW_STOCK_LIMIT:
+        low[pos] = item
+    since = _in_stock_since(item)
+    if since is not None:
+        bisect.insort(aged, (since, pos))
+
+def _build_alert_index(items):
+    low, aged = {}, []
+    for pos, item in enumerate(list.__iter__(items) if type(items) is CowList else items):
+        _index_alerts(low, aged, pos, item)
+    return {'data': items, 'low': low, 'aged': aged}
+
+# Only the changed and appended positions are re-indexed, into copies that
+# replace the old index in one step
+def _carry_alert_index(old, new):
+    global _alert_index
+    index = _alert_index
+    if index['data'] is not old:
+        return
+    if len(new) < len(old):
+        _alert_index = {'data': None, 'low': {}, 'aged': []}
+        return
+    low, aged = dict(index['low']), list(index['aged'])
+    for pos in range(len(new)):
+        if pos < len(old):
+            if new[pos] is old[pos]:
+                continue
+            low.pop(pos, None)
+            since = _in_stock_since(old[pos])
+            if since is not None:
+                del aged[bisect.bisect_left(aged, (since, pos))]
+        _index_alerts(low, aged, pos, new[pos])
+    _alert_index = {'data': new, 'low': low, 'aged': aged}
+
+# Mailbox notifications for the admin: low stock first, then items in stock
+# for more than STOCK_AGE_DAYS, oldest first. Barcodes dismissed with
+# /dismiss_alert stay hidden until their remind_date
+def stock_alerts(now=None):
+    global _alert_index
+    now = now or datetime.now()
+    items = load_json(ITEMS_FILE, copy=False)
+    index = _alert_index
+    if index['data'] is not items:
+        index = _alert_index = _build_alert_index(items)
+    snoozed = {d.get('barcode') for d in load_json(ALERTS_DISMISS_FILE, copy=False)
+               if str(d.get('remind_date') or '') > now.isoformat()}
+
+    alerts = []
+    for pos, item in sorted(index['low'].items()):
+        if item.get('barcode') not in snoozed:
+            alerts.append({
+                'date': now.isoformat(),
+                'message': f"⚠️ Niedriger Lagerbestand für '{item.get('product_name') or item.get('name', 'Unbekannt')}' – nur noch {item.get('quantity', 0)} Stück!",
+                'barcode': item.get('barcode', '')
+            })
+    aged = index['aged']
+    for since, pos in aged[:bisect.bisect_left(aged, (now - timedelta(days=STOCK_AGE_DAYS),))]:
+        item = index['data'][pos]
+        if item.get('barcode') not in snoozed:
+            alerts.append({
+                'date': since.isoformat(),
+                'message': f"📦 Produkt '{item.get('product_name') or item.get('name', 'Unbekannt')}' ist seit {(now - since).days} Tagen im Lager.",
+                'barcode': item.get('barcode', '')
+            })
+    return alerts
+
 # Notifications
 @app.route('/admin/notifications')
 @login_required('admin')
 def admin_notifications():
-    # This should prepare mailbox_notifications same as your dashboard
-    # Example (adjust according to your data source):
-    mailbox_notifications = get_mailbox_notifications()  # Your existing function or logic
-    
+    mailbox_notifications = stock_alerts()
+    if request.args.get('format') == 'json':
+        return jsonify(mailbox_notifications)
     return render_template("admin_notifications.html", mailbox_notifications=mailbox_notifications)
 
+def _metric_line(name, labels, value):
+    if labels:
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+        name += '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+    return f'{name} {value}'
+
+# Prometheus text format
+def metrics_text():
+    with _metrics_lock:
+        values = sorted((key, list(value) if isinstance(value, list) else value)
+                        for key, value in _metric_values.items())
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for (metric, labels), value in values:
+            if metric != name:
+                continue
+            if kind == 'counter':
+                lines.append(_metric_line(name, labels, value))
+                continue
+            if kind == 'histogram':
+                for le, total in zip(LATENCY_BUCKETS + ('+Inf',), itertools.accumulate(value[2])):
+                    lines.append(_metric_line(f'{name}_bucket', labels + (('le', le),), total))
+            lines.append(_metric_line(f'{name}_sum', labels, value[0]))
+            lines.append(_metric_line(f'{name}_count', labels, value[1]))
+    for name, help_text, label, stats in (
+            ('ria_json_cache_total', 'Data file reads served from the parsed cache or not.', 'result', CACHE_STATS),
+            ('ria_file_locks_total', 'Data file locks taken, and how many had to wait.', 'result', LOCK_STATS),
+            ('ria_barcode_lookups_total', 'Barcode images by where they came from.', 'source', BARCODE_STATS)):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [_metric_line(name, ((label, key),), count) for key, count in stats.items()]
+    lines += ['# HELP ria_process_start_time_seconds Start of this worker, counters begin at zero there.',
+              '# TYPE ria_process_start_time_seconds gauge', f'ria_process_start_time_seconds {METRICS_STARTED}']
+    return '\n'.join(lines) + '\n'
+
+# Per worker process; a scraper that can't log in sends
+# Authorization: Bearer $METRICS_TOKEN
+@app.route('/admin/metrics')
+def admin_metrics():
+    # compared as bytes, compare_digest rejects non-ASCII str
+    authorization = request.headers.get('Authorization', '').encode('utf-8')
+    expected = f'Bearer {METRICS_TOKEN}'.encode('utf-8')
+    if session.get('role') != 'admin' and not (METRICS_TOKEN and hmac.compare_digest(authorization, expected)):
+        return Response('Zugriff verweigert\n', status=403, mimetype='text/plain')
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+# Profiling: a PROFILE_SAMPLE share of requests (0.05 = every 20th) runs
+# under cProfile. Sampled requests slower than PROFILE_SLOW_MS are kept in
+# data/profiles as <id>.json (route, arguments, data file sizes, time per
+# library and top functions) plus <id>.prof for pstats or snakeviz. Form
+# fields are never stored, they can hold passwords. The admin page can
+# change both values for all workers through profiles/settings.json
+PROFILE_DIR = os.path.join(DATA_PATH, 'profiles')
+PROFILE_SETTINGS_FILE = os.path.join(PROFILE_DIR, 'settings.json')
+PROFILE_SAMPLE = float(os.environ.get('PROFILE_SAMPLE', 0))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 1000))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 200))
+PROFILE_TOP = 25
+_APP_SOURCE = os.path.abspath(__file__)
+
+def profile_settings():
+    settings = {'sample': PROFILE_SAMPLE, 'slow_ms': PROFILE_SLOW_MS}
+    if os.path.exists(PROFILE_SETTINGS_FILE):
+        stored = _cached_json(PROFILE_SETTINGS_FILE)
+        if isinstance(stored, dict):
+            settings.update(stored)
+    return settings
+
+@app.before_request
+def _start_profile():
+    settings = profile_settings()
+    if settings['sample'] > 0 and request.endpoint != 'static' and random.random() < settings['sample']:
+        profiler = cProfile.Profile()
+        g.profile = (profiler, time.perf_counter(), settings['slow_ms'])
+        profiler.enable()
+
+@app.after_request
+def _finish_profile(response):
+    _stop_profile(response.status_code)
+    return response
+
+@app.teardown_request
+def _finish_failed_profile(exc):
+    _stop_profile(500)
+
+def _stop_profile(status):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    profiler, started, slow_ms = profile
+    profiler.disable()
+    elapsed = time.perf_counter() - started
+    if elapsed * 1000 >= slow_ms:
+        save_profile(profiler, elapsed, status)
+
+# Where a function's own time goes, builtins by their name
+def _profile_category(filename, function):
+    if filename == _APP_SOURCE:
+        return 'App'
+    where = (function if filename == '~' else filename).lower()
+    for category, marks in (('Jinja', ('jinja2', '.html')), ('JSON/Datenformat', ('json', 'pickle', 'msgpack')),
+                            ('Pillow', ('pil',)), ('Barcode', ('barcode',)), ('SQLite', ('sqlalchemy', 'sqlite')),
+                            ('Flask/Werkzeug', ('flask', 'werkzeug'))):
+        if any(mark in where for mark in marks):
+            return category
+    return 'Sonstiges'
+
+def _profile_function(func):
+    filename, line, function = func
+    if filename == '~':
+        return function
+    return f'{os.sep.join(filename.split(os.sep)[-2:])}:{line}({function})'
+
+def data_file_sizes():
+    sizes = {}
+    for name in sorted(os.listdir(DATA_PATH)):
+        path = os.path.join(DATA_PATH, name)
+        if path in _PARTITION_DIRS:
+            sizes[name + '/'] = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        elif os.path.isfile(path) and not name.endswith(('.lock', '.tmp')):
+            sizes[name] = os.path.getsize(path)
+    return sizes
+
+def save_profile(profiler, elapsed, status):
+    stats = pstats.Stats(profiler)
+    categories = {}
+    for func, (_, _, tottime, _, callers) in stats.stats.items():
+        category = _profile_category(func[0], func[2])
+        if category != 'Sonstiges' or not callers:
+            categories[category] = categories.get(category, 0) + tottime
+            continue
+        # builtins and helpers like list.sort count for whoever called them
+        called = sum(caller[2] for caller in callers.values()) or 1
+        for caller, (_, _, caller_time, _) in callers.items():
+            category = _profile_category(caller[0], caller[2])
+            categories[category] = categories.get(category, 0) + tottime * (caller_time or called / len(callers)) / called
+    functions = [{'function': _profile_function(func), 'calls': calls, 'own_s': tottime, 'total_s': cumtime}
+                 for func, (_, calls, tottime, cumtime, _) in stats.stats.items()]
+    capture_id = f'{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    record = {
+        'id': capture_id,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'view_args': request.view_args or {},
+        'args': request.args.to_dict(flat=False),
+        'user': session.get('username'),
+        'status': status,
+        'duration_ms': round(elapsed * 1000, 1),
+        'pid': os.getpid(),
+        'data_files': data_file_sizes(),
+        'categories': dict(sorted(categories.items(), key=lambda kv: kv[1], reverse=True)),
+        'by_own_time': sorted(functions, key=lambda f: f['own_s'], reverse=True)[:PROFILE_TOP],
+        'by_total_time': sorted(functions, key=lambda f: f['total_s'], reverse=True)[:PROFILE_TOP],
+    }
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(PROFILE_DIR, f'{capture_id}.prof'))
+    _atomic_write(os.path.join(PROFILE_DIR, f'{capture_id}.json'), record, 'json-pretty')
+    captures = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof'))
+    for name in captures[:-PROFILE_KEEP]:
+        for suffix in ('.prof', '.json'):
+            path = os.path.join(PROFILE_DIR, name[:-5] + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+def load_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith('.json') and name != 'settings.json':
+            try:
+                with open(os.path.join(PROFILE_DIR, name), 'rb') as f:
+                    profiles.append(load_data(f.read()))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda p: p['duration_ms'], reverse=True)
+
+@app.route('/admin/profiles', methods=['GET', 'POST'])
+@login_required('admin')
+def admin_profiles():
+    if request.method == 'POST':
+        if 'clear' in request.form:
+            for profile in load_profiles():
+                for suffix in ('.prof', '.json'):
+                    path = os.path.join(PROFILE_DIR, profile['id'] + suffix)
+                    if os.path.exists(path):
+                        os.remove(path)
+            flash('Profile gelöscht.', 'success')
+        else:
+            try:
+                sample = float(request.form.get('sample', 0)) / 100
+                slow_ms = float(request.form.get('slow_ms', PROFILE_SLOW_MS))
+                if not 0 <= sample <= 1 or slow_ms < 0:
+                    raise ValueError
+            except ValueError:
+                flash('Ungültige Werte.', 'danger')
+                return redirect(url_for('admin_profiles'))
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            _atomic_write(PROFILE_SETTINGS_FILE, {'sample': sample, 'slow_ms': slow_ms}, 'json-pretty')
+            flash('Einstellungen gespeichert.', 'success')
+        return redirect(url_for('admin_profiles'))
+    return render_template('admin_profiles.html', profiles=load_profiles()[:50], settings=profile_settings())
+
+@app.route('/admin/profiles/<capture_id>')
+@login_required('admin')
+def admin_profile(capture_id):
+    path = os.path.join(PROFILE_DIR, capture_id)
+    if not capture_id.replace('-', '').isalnum() or not os.path.exists(path + '.json'):
+        flash('Profil nicht gefunden.', 'warning')
+        return redirect(url_for('admin_profiles'))
+    if request.args.get('download'):
+        return send_file(os.path.abspath(path + '.prof'), as_attachment=True, download_name=f'{capture_id}.prof')
+    with open(path + '.json', 'rb') as f:
+        profile = load_data(f.read())
+    return render_template('admin_profile.html', profile=profile)
+
+# Memory diagnostics: with MEMORY_TRACE=1 tracemalloc runs while a
+# request is handled, so only what the request allocates is traced and
+# snapshots stay small. Per endpoint we keep the peak allocated during a
+# request, what of it was still allocated at its end, and the source lines
+# holding the most memory when the template is rendered (all lists the view
+# built are alive then) or, for views without a template, when the response
+# is returned. Tracing is shared by overlapping requests in threads of the
+# same worker, their allocations get mixed
+MEMORY_TRACE = os.environ.get('MEMORY_TRACE', '0') == '1'
+MEMORY_TRACE_FRAMES = int(os.environ.get('MEMORY_TRACE_FRAMES', 1))
+MEMORY_TOP_LINES = 15
+_MEMORY_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),)
+_memory_stats = {}
+_memory_lock = threading.Lock()
+_memory_tracing = 0
+
+@app.before_request
+def _start_memory_trace():
+    global _memory_tracing
+    if not MEMORY_TRACE or request.endpoint in ('static', 'admin_memory'):
+        return
+    with _memory_lock:
+        if _memory_tracing == 0:
+            if tracemalloc.is_tracing():
+                # started by someone else (PYTHONTRACEMALLOC), leave it alone
+                return
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+        _memory_tracing += 1
+    g.memory_start = tracemalloc.get_traced_memory()[0]
+
+def _stop_memory_trace():
+    global _memory_tracing
+    with _memory_lock:
+        _memory_tracing -= 1
+        if _memory_tracing == 0:
+            tracemalloc.stop()
+
+# The snapshot itself takes memory, so the peak so far is noted before it
+# and counting starts again once it is gone
+def _trace_memory_lines():
+    g.memory_peak = max(g.get('memory_peak', 0), tracemalloc.get_traced_memory()[1])
+    stats = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS).statistics('lineno')
+    g.memory_lines = [(f'{os.sep.join(s.traceback[0].filename.split(os.sep)[-2:])}:{s.traceback[0].lineno}', s.size)
+                      for s in stats[:MEMORY_TOP_LINES]]
+    del stats
+    tracemalloc.reset_peak()
+
+def _memory_at_render(sender, template, context, **extra):
+    if 'memory_start' in g and 'memory_lines' not in g:
+        _trace_memory_lines()
+
+before_render_template.connect(_memory_at_render, app)
+
+@app.after_request
+def _finish_memory_trace(response):
+    if 'memory_start' not in g:
+        return response
+    if 'memory_lines' not in g:
+        _trace_memory_lines()
+    started = g.pop('memory_start')
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(g.memory_peak, peak) - started
+    _stop_memory_trace()
+    with _memory_lock:
+        stats = _memory_stats.setdefault((request.endpoint or 'unmatched', request.method), {
+            'requests': 0, 'peak_max': 0, 'peak_sum': 0, 'retained_sum': 0, 'lines': {}})
+        stats['requests'] += 1
+        stats['peak_max'] = max(stats['peak_max'], peak)
+        stats['peak_sum'] += peak
+        stats['retained_sum'] += current - started
+        lines = stats['lines']
+        for line, size in g.memory_lines:
+            lines[line] = max(lines.get(line, 0), size)
+        stats['lines'] = dict(sorted(lines.items(), key=lambda kv: kv[1], reverse=True)[:MEMORY_TOP_LINES])
+    return response
+
+@app.teardown_request
+def _drop_memory_trace(exc):
+    if g.pop('memory_start', None) is not None:
+        _stop_memory_trace()
+
+def memory_report():
+    with _memory_lock:
+        stats = sorted(_memory_stats.items(), key=lambda kv: kv[1]['peak_max'], reverse=True)
+        return [{
+            'endpoint': endpoint,
+            'method': method,
+            'requests': s['requests'],
+            'peak_max_bytes': s['peak_max'],
+            'peak_avg_bytes': s['peak_sum'] // s['requests'],
+            'retained_avg_bytes': s['retained_sum'] // s['requests'],
+            'top_lines': [{'line': line, 'bytes': size} for line, size in s['lines'].items()],
+        } for (endpoint, method), s in stats]
+
+# GET the numbers of this worker, POST clears them
+@app.route('/admin/memory', methods=['GET', 'POST'])
+@login_required('admin')
+def admin_memory():
+    if request.method == 'POST':
+        with _memory_lock:
+            _memory_stats.clear()
+    return jsonify({'enabled': MEMORY_TRACE, 'pid': os.getpid(), 'endpoints': memory_report()})
+
 
 # Admin Daschboard
 # Admin Dashboard
@@ -177,131 +2580,28 @@ def admin_dashboard():
     now = datetime.now()
     today = now.date()
 
-    # Load data
-    sales = load_sales()
-    purchases = load_purchases()
-    items = load_items()
+    # Load data, the tables show the latest page
+    sales, _ = paginate_records(SALES_FILE)
+    purchases, _ = paginate_records(ORDERS_FILE)
 
-    # Parse sales dates and calculate profits
-    for sale in sales:
-        if isinstance(sale.get('date'), str):
-            try:
-                sale['date'] = datetime.fromisoformat(sale['date'])
-            except Exception:
-                sale['date'] = datetime.min
-
-        total_profit_per_sale = 0
-        for item in sale.get('items', []):
-            try:
-                purchase_price = float(item.get('purchase_price', 0))
-                sale_price = float(item.get('sale_price', 0))
-                quantity = int(item.get('quantity', 0))
-                profit = (sale_price - purchase_price) * quantity
-                item['profit'] = round(profit, 2)
-                total_profit_per_sale += profit
-            except Exception:
-                item['profit'] = 0
-        sale['total_profit'] = round(total_profit_per_sale, 2)
-
-    # Parse purchase dates
-    for purchase in purchases:
-        if isinstance(purchase.get('date'), str):
-            try:
-                purchase['date'] = datetime.fromisoformat(purchase['date'])
-            except Exception:
-                purchase['date'] = datetime.min
-
-    # Profit calculations
-    all_time_profit = round(sum(
-        item['profit']
-        for sale in sales
-        for item in sale.get('items', [])
-    ), 2)
-
-    daily_sales_total = sum(
-        item.get('total_price', 0)
-        for sale in sales if sale['date'].date() == today
-        for item in sale.get('items', [])
-    )
-
-    daily_purchases_total = sum(
-        p.get('total_price', 0)
-        for p in purchases if p['date'].date() == today
-    )
+    # Totals from the aggregate store
+    today_totals = aggregate_totals('day', today.isoformat())
+    month_totals = aggregate_totals('month', now.strftime('%Y-%m'))
+    all_time_profit = round(aggregate_totals()['profit'], 2)
 
+    daily_sales_total = today_totals['revenue']
+    daily_purchases_total = today_totals['purchases']
     daily_profit = round(daily_sales_total - daily_purchases_total, 2)
-
-    monthly_sales = sum(
-        item.get('total_price', 0)
-        for sale in sales if sale['date'].year == now.year and sale['date'].month == now.month
-        for item in sale.get('items', [])
-    )
-
-    monthly_purchases = sum(
-        p.get('total_price', 0)
-        for p in purchases if p['date'].year == now.year and p['date'].month == now.month
-    )
-
-    monthly_profit = round(monthly_sales - monthly_purchases, 2)
-
-    sales_sorted = sorted(sales, key=lambda x: x['date'], reverse=True)
-    purchases_sorted = sorted(purchases, key=lambda x: x['date'], reverse=True)
+    monthly_profit = round(month_totals['revenue'] - month_totals['purchases'], 2)
 
     kasse_balance = load_kasse_balance()
     total_balance = round(kasse_balance - daily_purchases_total + daily_sales_total, 2)
 
-    # 📬 Mailbox-style notifications
-    mailbox_notifications = []
-    threshold_date = now - timedelta(days=21)
-
-    for item in items:
-        # Check if date exists
-        item_date_str = item.get('added_date') or item.get('date')
-        try:
-            item_date = datetime.fromisoformat(item_date_str)
-        except:
-            continue
-
-        # Notification: Item older than 21 days
-        if item_date < threshold_date:
-            mailbox_notifications.append({
-                'date': item_date_str,
-                'message': f"📦 Produkt '{item.get('product_name', 'Unbekannt')}' ist seit { (now - item_date).days } Tagen im Lager.",
-                'barcode': item.get('barcode', '')
-            })
-
-        # Notification: Quantity ≤ 5
-        if item.get('quantity', 0) <= 5:
-            mailbox_notifications.append({
-                'date': now.isoformat(),
-                'message': f"⚠️ Niedriger Lagerbestand für '{item.get('product_name', 'Unbekannt')}' – nur noch {item.get('quantity')} Stück!",
-                'barcode': item.get('barcode', '')
-            })
-     # ========== Mailbox Notifications ==========
-    mailbox_notifications = []
-    today = datetime.today()
+    # Appends the days that ended since the last visit, the chart reads them
+    roll_up_history(today)
 
-    for item in items:
-        # Benachrichtigung, wenn Menge <= 5
-        if item.get('quantity', 0) <= 5:
-            mailbox_notifications.append({
-                'date': today.isoformat(),
-                'message': f"❗ Geringer Lagerbestand für Produkt: {item.get('product_name', 'Unbekannt')} (Menge: {item.get('quantity', 0)})",
-                'barcode': item.get('barcode', 'unknown')
-            })
-
-        # Benachrichtigung, wenn Produkt älter als 21 Tage im Lager ist
-        date_str = item.get('date_added') or item.get('date')
-        try:
-            date_added = datetime.fromisoformat(date_str)
-            if (today - date_added).days > 21:
-                mailbox_notifications.append({
-                    'date': today.isoformat(),
-                    'message': f"⏳ Produkt '{item.get('product_name', 'Unbekannt')}' ist seit über 21 Tagen im Lager.",
-                    'barcode': item.get('barcode', 'unknown')
-                })
-        except Exception as e:
-            print("Fehler beim Datum:", e)
+    # 📬 Mailbox-style notifications
+    mailbox_notifications = stock_alerts(now)
 
     return render_template(
         "admin_dashboard.html",
@@ -310,8 +2610,8 @@ def admin_dashboard():
         all_time_profit=all_time_profit,
         wallet_balance=kasse_balance,
         total_balance=total_balance,
-        sales=sales_sorted,
-        purchases=purchases_sorted,
+        sales=sales,
+        purchases=purchases,
         mailbox_notifications=mailbox_notifications
     )
 
@@ -321,58 +2621,23 @@ def admin_dashboard():
 def seller_dashboard():
     username = session['username']
 
-    sales_data = load_sales()
-    orders = load_orders()
-
-    user_orders = [order for order in sales_data if order.get('user') == username]
-    user_purchases = [p for p in orders if p.get('user') == username]
+    user_orders, _ = paginate_records(SALES_FILE, user=username)
+    user_purchases, _ = paginate_records(ORDERS_FILE, user=username)
     
-    today = datetime.now().date()
-
-    daily_sales_total = 0.0
-    daily_purchases_total = 0.0  # <-- Initialize here
-    daily_profit = 0
-    monthly_profit = 0
-    total_profit = 0
-    monthly_total_order_price = 0
-
-    # Calculate daily sales total and profits
-    for order in user_orders:
-        order_date = datetime.fromisoformat(order['date']) if order.get('date') else None
-
-        if order_date:
-            # Total daily sales (Umsatz)
-            if order_date.date() == today:
-                for item in order.get('items', []):
-                    daily_sales_total += item.get('total_price', 0)
-
-        order_profit = 0
-        for item in order.get('items', []):
-            item_profit = (item.get('sale_price', 0) - item.get('purchase_price', 0)) * item.get('quantity', 0)
-            order_profit += item_profit
-
-        if order_date:
-            # Sum monthly profit
-            if order_date.year == today.year and order_date.month == today.month:
-                monthly_profit += order_profit
-                monthly_total_order_price += order.get('total_order_price', 0)
-
-            # Sum daily profit
-            if order_date.date() == today:
-                daily_profit += order_profit
-
-        total_profit += order_profit
-
-    # Calculate daily purchases total outside the order loop
-    for purchase in user_purchases:
-        purchase_date = datetime.fromisoformat(purchase.get('date')) if purchase.get('date') else None
-        if purchase_date and purchase_date.date() == today:
-            daily_purchases_total += purchase.get('price', 0) * purchase.get('quantity', 0)
-
-    total_purchase_cost = sum(p.get('price', 0) * p.get('quantity', 0) for p in user_purchases)
+    now = datetime.now()
+    today_totals = aggregate_totals('day', now.date().isoformat(), seller=username)
+    month_totals = aggregate_totals('month', now.strftime('%Y-%m'), seller=username)
+    all_totals = aggregate_totals(seller=username)
+
+    daily_sales_total = today_totals['revenue']
+    daily_purchases_total = today_totals['purchase_cost']
+    daily_profit = today_totals['profit']
+    monthly_profit = month_totals['profit']
+    monthly_total_order_price = month_totals['order_total']
+    total_profit = all_totals['profit']
+    total_purchase_cost = all_totals['purchase_cost']
     total_balance = daily_sales_total - daily_purchases_total
-    print("user_purchases",orders)
-    
+
     return render_template(
     'seller_dashboard.html',
     sales=user_orders,
@@ -390,104 +2655,257 @@ def seller_dashboard():
 
 # Load_kasse_balance
 def load_kasse_balance():
-    kasse_file = os.path.join('data', 'kasse.json')
-    transactions = []
-    if os.path.exists(kasse_file):
-        with open(kasse_file, 'r', encoding='utf-8') as f:
-            try:
-                transactions = json.load(f)
-            except json.JSONDecodeError:
-                pass
-    return sum(t.get('amount', 0) for t in transactions)
+    return kasse_balance_at()
 
 # Format_currency_de
 def format_currency_de(amount):
     return f"€{amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-#Saving Everyday History
-def save_dashboard_snapshot(date, daily_profit, monthly_profit, wallet_balance, all_time_profit):
-    history_file = os.path.join('data', 'dashboard_history.json')
-    
-    if os.path.exists(history_file):
-        with open(history_file, 'r', encoding='utf-8') as f:
-            try:
-                history = json.load(f)
-            except json.JSONDecodeError:
-                history = []
+# Everyday history: one entry per finished day in dashboard_history.json,
+# with that day's totals, the dashboard figures as they stood in the evening
+# (month to date, cash balance, all-time profit) and the totals per seller.
+# The first read after midnight appends the missing days from the aggregate
+# store, so the first run backfills the whole history. When a day that is
+# already in the history changes, update_aggregates notes it in the store
+# (history_from) and the entries from that day on are rolled up again
+HISTORY_FIELDS = ('revenue', 'profit', 'purchases', 'purchase_cost', 'sales', 'orders', 'cash')
+SELLER_HISTORY_FIELDS = ('revenue', 'profit', 'purchase_cost', 'sales', 'orders')
+
+def _history_entry(aggregates, day, previous):
+    totals = aggregates['total']['day'].get(day, {})
+    entry = {'date': day}
+    for field in HISTORY_FIELDS:
+        entry[field] = round(totals.get(field, 0), 2)
+    entry['daily_profit'] = round(entry['revenue'] - entry['purchases'], 2)
+    same_month = previous['date'][:7] == day[:7]
+    entry['monthly_profit'] = round((previous['monthly_profit'] if same_month else 0) + entry['daily_profit'], 2)
+    entry['wallet_balance'] = round(previous['wallet_balance'] + entry['cash'], 2)
+    entry['all_time_profit'] = round(previous['all_time_profit'] + entry['profit'], 2)
+    entry['sellers'] = {seller: {field: round(tree['day'][day].get(field, 0), 2) for field in SELLER_HISTORY_FIELDS}
+                        for seller, tree in sorted(aggregates['sellers'].items()) if day in tree['day']}
+    return entry
+
+# Before the first day: kasse entries and sales without a usable date
+def _history_opening(aggregates, first_day):
+    days = aggregates['total']['day'].values()
+    everything = aggregates['total']['all']
+    return {
+        'date': first_day,
+        'monthly_profit': 0,
+        'wallet_balance': everything.get('cash', 0) - sum(day.get('cash', 0) for day in days),
+        'all_time_profit': everything.get('profit', 0) - sum(day.get('profit', 0) for day in days),
+    }
+
+# The history up to yesterday; cheap when nothing is missing
+def roll_up_history(today=None):
+    today = today or datetime.now().date()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    history = load_json(HISTORY_FILE, copy=False)
+    aggregates = load_aggregates()
+    if aggregates.get('history_from') is None:
+        if history and history[-1]['date'] >= yesterday:
+            return history
+        # no finished day yet, nothing to roll up
+        if not history and not any(day <= yesterday for day in aggregates['total']['day']):
+            return history
+
+    with _file_lock(HISTORY_FILE):
+        changed_from = None
+        with _file_lock(AGGREGATES_FILE):
+            stored = _stored_aggregates()
+            if stored is not None and stored.get('history_from') is not None:
+                changed_from = stored['history_from']
+                # cleared before reading, a change from now on marks it again
+                save_json(AGGREGATES_FILE, dict(stored, history_from=None))
+        aggregates = load_aggregates()
+        history = list(load_json(HISTORY_FILE, copy=False))
+        keep = 0
+        while (keep < len(history) and 'sellers' in history[keep]
+               and (changed_from is None or history[keep]['date'] < changed_from)):
+            keep += 1
+        rolled = history[:keep]
+
+        days = sorted(aggregates['total']['day'])
+        if rolled:
+            day = datetime.fromisoformat(rolled[-1]['date']).date() + timedelta(days=1)
+            previous = rolled[-1]
+        elif days and days[0] <= yesterday:
+            day = datetime.fromisoformat(days[0]).date()
+            previous = _history_opening(aggregates, days[0])
+        else:
+            day = today
+        while day < today:
+            previous = _history_entry(aggregates, day.isoformat(), previous)
+            rolled.append(previous)
+            day += timedelta(days=1)
+        if rolled != history:
+            save_json(HISTORY_FILE, rolled)
+        return rolled
+
+# Entries of the last `days` days, today's (from the aggregate store, not
+# final yet) included. O(days): the start is found by bisection
+def history_series(days, today=None):
+    today = today or datetime.now().date()
+    history = roll_up_history(today)
+    since = (today - timedelta(days=days - 1)).isoformat()
+    series = list(history[bisect.bisect_left(history, since, key=lambda entry: entry['date']):])
+    aggregates = load_aggregates()
+    previous = history[-1] if history else _history_opening(aggregates, today.isoformat())
+    series.append(dict(_history_entry(aggregates, today.isoformat(), previous), partial=True))
+    return series
+
+@app.cli.command('roll-up-history')
+def roll_up_history_command():
+    history = roll_up_history()
+    if history:
+        click.echo(f"{len(history)} days, {history[0]['date']} to {history[-1]['date']}")
     else:
-        history = []
-
-    # Avoid duplicate entry for the same day
-    if any(entry.get("date") == date.isoformat() for entry in history):
-        return
-
-    history.append({
-        "date": date.isoformat(),
-        "daily_profit": round(daily_profit, 2),
-        "monthly_profit": round(monthly_profit, 2),
-        "wallet_balance": round(wallet_balance, 2),
-        "all_time_profit": round(all_time_profit, 2)
-    })
-
-    with open(history_file, 'w', encoding='utf-8') as f:
-        json.dump(history, f, indent=2, ensure_ascii=False)
+        click.echo('no finished days yet')
 
 #log_wallet_change
 def log_wallet_change(amount, change_type="manual"):
-    wallet_file = os.path.join('data', 'wallet_log.json')
-
-    # Load old log
-    if os.path.exists(wallet_file):
-        with open(wallet_file, 'r', encoding='utf-8') as f:
-            try:
-                log = json.load(f)
-            except json.JSONDecodeError:
-                log = []
-    else:
-        log = []
-
     # Get the username from session
     username = session.get('username', 'unknown')
 
     # Append new entry
-    log.append({
+    append_record(WALLET_LOG_FILE, {
         "date": datetime.now().isoformat(),
         "change_type": change_type,
         "amount": round(amount, 2),
         "user": username
     })
 
-    # Save updated log
-    with open(wallet_file, 'w', encoding='utf-8') as f:
-        json.dump(log, f, indent=2, ensure_ascii=False)
-
 
 
 
- # Generate CSV
-#Log generate_csv
-def generate_csv(data, fieldnames):
-    """Generate CSV response from list of dicts."""
-    def generate():
-        yield ",".join(fieldnames) + "\n"
-        for row in data:
-            yield ",".join(str(row.get(f, "")) for f in fieldnames) + "\n"
-    return Response(generate(), mimetype='text/csv')
+# Exports
+SALE_EXPORT_FIELDS = ['date', 'order_id', 'seller', 'barcode', 'product_name', 'quantity',
+                      'sale_price', 'purchase_price', 'total_price', 'profit']
+PURCHASE_EXPORT_FIELDS = ['date', 'order_number', 'ref_number', 'user', 'product_name', 'description',
+                          'quantity', 'price', 'selling_price', 'min_selling_price', 'total_price']
+
+# Lines of a sale; old sales are a single line without an items list
+def sale_items(sale):
+    items = sale.get('items')
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else [sale]
+
+# One row per sold line
+def sale_lines(sale):
+    for item in sale_items(sale):
+        quantity = _number(item.get('quantity'))
+        sale_price = _number(item.get('sale_price'))
+        purchase_price = _number(item.get('purchase_price'))
+        yield {
+            'date': sale.get('date'),
+            'order_id': sale.get('order_id'),
+            'seller': sale.get('user'),
+            'barcode': item.get('barcode'),
+            'product_name': item.get('product_name'),
+            'quantity': item.get('quantity'),
+            'sale_price': sale_price,
+            'purchase_price': purchase_price,
+            'total_price': _number(item.get('total_price', quantity * sale_price)),
+            'profit': round((sale_price - purchase_price) * quantity, 2),
+        }
 
-# Download CSV routes
-@app.route('/download/sales.csv')
+# since/until and equality filters from ?from=YYYY-MM-DD&to=YYYY-MM-DD&seller=,
+# both days included. Raises ValueError for malformed dates
+def export_filters():
+    filters = {}
+    if request.args.get('from'):
+        filters['since'] = datetime.strptime(request.args['from'], '%Y-%m-%d').date().isoformat()
+    if request.args.get('to'):
+        day = datetime.strptime(request.args['to'], '%Y-%m-%d').date()
+        filters['until'] = (day + timedelta(days=1)).isoformat()
+    if request.args.get('date'):
+        filters['date_prefix'] = request.args['date']
+    if request.args.get('seller'):
+        filters['user'] = request.args['seller']
+    return filters
+
+# Streams rows as CSV or JSON lines, gzip-compressed when the client accepts it
+def stream_export(rows, fieldnames, fmt, filename):
+    def encode():
+        buffer = io.StringIO()
+        if fmt == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames, extrasaction='ignore')
+            writer.writeheader()
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                buffer.write(json_dumps({f: row.get(f) for f in fieldnames}).decode('utf-8') + '\n')
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    headers = {'Content-Disposition': f'attachment; filename={filename}.{fmt}', 'Vary': 'Accept-Encoding'}
+    chunks = encode()
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        chunks = _gzip_chunks(chunks)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Download routes: ?from=&to=&seller=&barcode=, CSV or JSON lines
+@app.route('/download/sales.jsonl', defaults={'fmt': 'jsonl'})
+@app.route('/download/sales.csv', defaults={'fmt': 'csv'})
 @login_required('admin')
-def download_sales_csv():
-    sales = load_sales()
-    fieldnames = ['date', 'product_name', 'quantity', 'price', 'total_price']
-    return generate_csv(sales, fieldnames)
+def download_sales_csv(fmt):
+    try:
+        filters = export_filters()
+    except ValueError:
+        return Response('Ungültiges Datum, erwartet JJJJ-MM-TT.', 400)
+    barcode_value = request.args.get('barcode')
+    rows = (line for sale in iter_records(SALES_FILE, **filters) for line in sale_lines(sale)
+            if not barcode_value or line['barcode'] == barcode_value)
+    return stream_export(rows, SALE_EXPORT_FIELDS, fmt, 'sales')
+
+@app.route('/download/purchases.jsonl', defaults={'fmt': 'jsonl'})
+@app.route('/download/purchases.csv', defaults={'fmt': 'csv'})
+@login_required('admin')
+def download_purchases_csv(fmt):
+    try:
+        filters = export_filters()
+    except ValueError:
+        return Response('Ungültiges Datum, erwartet JJJJ-MM-TT.', 400)
+    # the order number is the barcode of the ordered item
+    if request.args.get('barcode'):
+        filters['order_number'] = request.args['barcode']
+    return stream_export(iter_records(ORDERS_FILE, **filters), PURCHASE_EXPORT_FIELDS, fmt, 'purchases')
+
+# Profit by product, seller, weekday or hour: ?group=&from=&to=&seller=
+ANALYTICS_PAGE_ROWS = 100
 
-@app.route('/download/purchases.csv')
+@app.route('/admin/analytics')
 @login_required('admin')
-def download_purchases_csv():
-    purchases = load_purchases()
-    fieldnames = ['date', 'product_name', 'quantity', 'price', 'total_price']
-    return generate_csv(purchases, fieldnames)
+def admin_analytics():
+    group = request.args.get('group', 'product')
+    if group not in ANALYTICS_GROUPS:
+        group = 'product'
+    try:
+        filters = export_filters()
+    except ValueError:
+        flash('Ungültiges Datum, erwartet JJJJ-MM-TT.', 'danger')
+        filters = {}
+    began = time.perf_counter()
+    results = sales_analytics(group, filters.get('since'), filters.get('until'), filters.get('user'))
+    elapsed_ms = (time.perf_counter() - began) * 1000
+    totals = {field: round(sum(entry[field] for entry in results), 2) for field in ('revenue', 'profit', 'quantity')}
+    sellers = [user['username'] for user in load_users() if user.get('role') == 'seller']
+    return render_template('admin_analytics.html', group=group, results=results[:ANALYTICS_PAGE_ROWS],
+                           shown_all=len(results) <= ANALYTICS_PAGE_ROWS, totals=totals, sellers=sellers,
+                           elapsed_ms=elapsed_ms)
 
 
 # Admin: List Sellers
@@ -590,7 +3008,8 @@ def delete_seller(username):
 @app.route('/admin/items')
 @login_required('admin')
 def list_items():
-    items = load_json(ITEMS_FILE)[::-1]  # newest items first
+    cursor, per_page = page_args()
+    items, next_cursor = paginate_items(cursor, per_page)  # newest items first
 
     for item in items:
         # Normalize product_name
@@ -612,52 +3031,347 @@ def list_items():
         item['description'] = item.get('description', '')
         item['photo_link'] = item.get('image_url', '')
 
-    return render_template('items.html',  items=items)
+    return render_template('items.html',  items=items, next_cursor=next_cursor)
+
+# Rendered barcodes, addressed by what went into them: the same symbology,
+# value, format, writer options and library versions always give the same
+# image, so the key is also a strong ETag and entries never go stale.
+# Kept on disk under data/barcode_cache and in a per-worker LRU
+BARCODE_CACHE_DIR = os.path.join(DATA_PATH, 'barcode_cache')
+BARCODE_LRU_SIZE = int(os.environ.get('BARCODE_LRU_SIZE', 512))
+BARCODE_STATS = {'memory': 0, 'disk': 0, 'rendered': 0}
+BARCODE_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+BARCODE_SYMBOLOGIES = ('code128', 'ean13')
+BARCODE_WORKERS = int(os.environ.get('BARCODE_WORKERS', 2))
+_barcode_lru = OrderedDict()
+_barcode_lru_lock = threading.Lock()
+_barcode_pending = set()
+_barcode_slots = threading.BoundedSemaphore(64)
+_barcode_pool = {}
+
+def barcode_key(symbology, value, fmt='png', options=None):
+    spec = [symbology, str(value), fmt, sorted((options or {}).items()), barcode.version, PIL.__version__]
+    return hashlib.sha256(json.dumps(spec).encode('utf-8')).hexdigest()
+
+def _render_barcode(symbology, value, fmt, options):
+    began = time.perf_counter()
+    out = io.BytesIO()
+    writer = SVGWriter() if fmt == 'svg' else ImageWriter()
+    barcode.get_barcode_class(symbology)(str(value), writer=writer).write(out, options)
+    observe_metric('ria_barcode_render_seconds', time.perf_counter() - began, format=fmt)
+    return out.getvalue()
+
+def _barcode_path(key, fmt):
+    return os.path.join(BARCODE_CACHE_DIR, key[:2], f'{key}.{fmt}')
+
+# (key, image bytes); raises BarcodeError for values the symbology can't encode
+def render_barcode(symbology, value, fmt='png', options=None):
+    key = barcode_key(symbology, value, fmt, options)
+    with _barcode_lru_lock:
+        data = _barcode_lru.get(key)
+        if data is not None:
+            _barcode_lru.move_to_end(key)
+            BARCODE_STATS['memory'] += 1
+            return key, data
+
+    path = _barcode_path(key, fmt)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        BARCODE_STATS['disk'] += 1
+    except FileNotFoundError:
+        data = _render_barcode(symbology, value, fmt, options)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        BARCODE_STATS['rendered'] += 1
+
+    with _barcode_lru_lock:
+        _barcode_lru[key] = data
+        _barcode_lru.move_to_end(key)
+        while len(_barcode_lru) > BARCODE_LRU_SIZE:
+            _barcode_lru.popitem(last=False)
+    return key, data
+
+# Image response with a strong ETag; a matching If-None-Match gets a 304
+# without rendering or reading anything
+def barcode_response(symbology, value, fmt='png', options=None):
+    etag = barcode_key(symbology, value, fmt, options)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            etag, data = render_barcode(symbology, value, fmt, options)
+        except BarcodeError as e:
+            return Response(f'Ungültiger Barcode: {e}', 400)
+        response = Response(data, mimetype=BARCODE_MIMETYPES[fmt])
+    response.set_etag(etag)
+    # behind the login, so only the browser may keep it
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+# Render an image in the background so its first request finds it cached.
+# At most 64 are queued; beyond that they are simply rendered on first request
+def prerender_barcode(symbology, value, fmt='png'):
+    key = barcode_key(symbology, value, fmt)
+    with _barcode_lru_lock:
+        if key in _barcode_lru or key in _barcode_pending or not _barcode_slots.acquire(blocking=False):
+            return
+        _barcode_pending.add(key)
+
+    def run():
+        try:
+            render_barcode(symbology, value, fmt)
+        except BarcodeError:
+            pass
+        finally:
+            with _barcode_lru_lock:
+                _barcode_pending.discard(key)
+            _barcode_slots.release()
+    # one pool per worker process, created after the fork
+    pool = _barcode_pool.get(os.getpid())
+    if pool is None:
+        pool = _barcode_pool[os.getpid()] = ThreadPoolExecutor(BARCODE_WORKERS, thread_name_prefix='barcode')
+    pool.submit(run)
+
+# Drop the cached images of a value that is no longer used
+def forget_barcode(symbology, value):
+    for fmt in BARCODE_MIMETYPES:
+        key = barcode_key(symbology, value, fmt)
+        with _barcode_lru_lock:
+            _barcode_lru.pop(key, None)
+        if os.path.exists(_barcode_path(key, fmt)):
+            os.remove(_barcode_path(key, fmt))
+
+# Remove cached images that belong to no item or order any more (older than
+# `grace` seconds, so images rendered for a record being written survive) and
+# the PNGs the old order form wrote to static/barcodes
+def gc_barcodes(grace=3600):
+    live = set()
+    for item in load_json(ITEMS_FILE, copy=False):
+        if item.get('barcode'):
+            live.update(barcode_key('code128', item['barcode'], fmt) for fmt in BARCODE_MIMETYPES)
+    for order in iter_records(ORDERS_FILE):
+        if order.get('order_number'):
+            live.update(barcode_key('ean13', order['order_number'], fmt) for fmt in BARCODE_MIMETYPES)
+
+    removed = 0
+    cutoff = time.time() - grace
+    for directory, _, names in os.walk(BARCODE_CACHE_DIR):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.split('.')[0] not in live and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    legacy = os.path.join(app.static_folder, 'barcodes')
+    if os.path.isdir(legacy):
+        for name in os.listdir(legacy):
+            os.remove(os.path.join(legacy, name))
+            removed += 1
+        os.rmdir(legacy)
+    return removed
+
+@app.cli.command('gc-barcodes')
+def gc_barcodes_command():
+    click.echo(f'{gc_barcodes()} barcode images removed')
+
+@app.cli.command('warm-barcodes')
+def warm_barcodes_command():
+    rendered = failed = 0
+    for item in load_json(ITEMS_FILE, copy=False):
+        if not item.get('barcode'):
+            continue
+        try:
+            render_barcode('code128', item['barcode'])
+            rendered += 1
+        except BarcodeError as e:
+            failed += 1
+            click.echo(f"{item['barcode']}: {e}")
+    click.echo(f'{rendered} barcodes cached, {failed} failed ({BARCODE_STATS["rendered"]} newly rendered)')
 
 # Admin: List Items to Edit
 @app.route('/admin/items/barcode_print/<barcode_value>')
 @login_required('admin')
 def barcode_print(barcode_value):
-    CODE128 = barcode.get_barcode_class('code128')
-    img_io = io.BytesIO()
+    return barcode_response('code128', barcode_value)
 
-    code = CODE128(barcode_value, writer=ImageWriter())
-    code.write(img_io)
-    img_io.seek(0)
-    
-    return send_file(
-        img_io,
-        mimetype='image/png',
-        as_attachment=False  # open inline
-    )
+# Barcode images by value, rendered on first request and cached like
+# barcode_print. SVG is the cheaper format: /barcodes/ean13/644800170873.svg
+@app.route('/barcodes/<symbology>/<value>.<fmt>')
+@login_required(['admin', 'seller'])
+def barcode_image(symbology, value, fmt):
+    if symbology not in BARCODE_SYMBOLOGIES or fmt not in BARCODE_MIMETYPES:
+        return Response('Unbekanntes Barcode-Format.', 404)
+    return barcode_response(symbology, value, fmt)
+
+# Label sheets: A4 pages of 3 x 8 labels (70 x 37 mm) with name, price and
+# barcode. Bars are drawn as vector rectangles from python-barcode's module
+# pattern, pages are built in a process pool a few at a time and the PDF is
+# written out page by page, so neither the pages nor the document are ever
+# held in memory as a whole
+LABEL_PAGE = (595.28, 841.89)
+LABEL_GRID = (3, 8)
+LABEL_WORKERS = int(os.environ.get('LABEL_WORKERS', os.cpu_count() or 1))
+_label_pool = {}
+
+# Code128 like barcode_print, so a scanned label reads back the stored value.
+# EAN-13 only for values that already are one: python-barcode would add or
+# replace the check digit of anything else
+def _label_symbology(value):
+    value = str(value)
+    if len(value) == 13 and value.isascii() and value.isdigit():
+        check = -sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(value[:12])) % 10
+        if check == int(value[12]):
+            return 'ean13'
+    return 'code128'
+
+def _pdf_text(text):
+    data = str(text).encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def _fit_text(text, font, size, width):
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '…', font, size) > width:
+        text = text[:-1]
+    return text + '…'
+
+# Compressed content stream of one page; labels are (name, price, value)
+def _label_page(labels):
+    columns, rows = LABEL_GRID
+    width, height = LABEL_PAGE[0] / columns, LABEL_PAGE[1] / rows
+    ops = []
+    for n, (name, price, value) in enumerate(labels):
+        x0 = (n % columns) * width
+        y0 = LABEL_PAGE[1] - (n // columns + 1) * height
+        inner = width - 16
+        ops.append(b'BT /F1 9 Tf %.2f %.2f Td %s Tj ET' % (
+            x0 + 8, y0 + height - 17, _pdf_text(_fit_text(name, 'Helvetica', 9, inner))))
+        ops.append(b'BT /F2 11 Tf %.2f %.2f Td %s Tj ET' % (x0 + 8, y0 + height - 31, _pdf_text(price)))
+        try:
+            code = barcode.get_barcode_class(_label_symbology(value))(str(value))
+            pattern, text = code.build()[0], code.get_fullcode()
+        except BarcodeError:
+            pattern, text = '', f'{value} (ungültig)'
+        if pattern:
+            module = min(inner / len(pattern), 1.5)
+            x = x0 + (width - module * len(pattern)) / 2
+            bottom, top = y0 + 16, y0 + height - 38
+            for start, run in _bar_runs(pattern):
+                ops.append(b'%.3f %.2f %.3f %.2f re' % (x + start * module, bottom, run * module, top - bottom))
+            ops.append(b'f')
+        text_width = stringWidth(text, 'Helvetica', 7)
+        ops.append(b'BT /F1 7 Tf %.2f %.2f Td %s Tj ET' % (x0 + (width - text_width) / 2, y0 + 7, _pdf_text(text)))
+    return zlib.compress(b'\n'.join(ops))
+
+def _bar_runs(pattern):
+    start = None
+    for i, module in enumerate(pattern + '0'):
+        if module == '1' and start is None:
+            start = i
+        elif module != '1' and start is not None:
+            yield start, i - start
+            start = None
+
+# Content streams in page order. Up to two pages per pool process are in
+# flight at any time; small sheets are built right here
+def _label_pages(pages):
+    if LABEL_WORKERS <= 1 or len(pages) <= 2:
+        yield from map(_label_page, pages)
+        return
+    pool = _label_pool.get(os.getpid())
+    if pool is None:
+        # spawned, not forked: this worker already runs compaction and
+        # barcode threads whose locks a fork would copy in whatever state
+        pool = _label_pool[os.getpid()] = ProcessPoolExecutor(
+            LABEL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+    pending = iter(pages)
+    window = [pool.submit(_label_page, page) for page in itertools.islice(pending, LABEL_WORKERS * 2)]
+    while window:
+        content = window.pop(0).result()
+        page = next(pending, None)
+        if page is not None:
+            window.append(pool.submit(_label_page, page))
+        yield content
+
+# PDF with one page per content stream, written as the streams come in.
+# The page tree (object 2) goes last, once all its pages are known
+def _pdf_document(contents):
+    offsets = {}
+    position = 0
+
+    def emit(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header + emit(1, b'<< /Type /Catalog /Pages 2 0 R >>') + emit(
+        3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>') + emit(
+        4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+    kids = []
+    number = 5
+    for content in contents:
+        stream = b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream'
+        page = (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] ' % LABEL_PAGE
+                + b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>' % number)
+        yield emit(number, stream) + emit(number + 1, page)
+        kids.append(number + 1)
+        number += 2
+    tail = emit(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)))
+    xref = b'xref\n0 %d\n0000000000 65535 f \n' % number
+    xref += b''.join(b'%010d 00000 n \n' % offsets[n] for n in range(1, number))
+    yield tail + xref + b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (number, position)
+
+def _item_label(item):
+    name = item.get('product_name') or item.get('name') or ''
+    return (name, format_currency_de(_number(item.get('selling_price'))), item.get('barcode'))
+
+# Labels for ?barcode=... (one per item, ?copies=n), ?order=... (one per unit
+# delivered) or ?in_stock=1 (every item with quantity > 0), GET or POST
+@app.route('/admin/labels.pdf', methods=['GET', 'POST'])
+@login_required('admin')
+def label_sheet():
+    try:
+        copies = min(max(int(request.values.get('copies', 1)), 1), 100)
+    except ValueError:
+        copies = 1
+    items = load_json(ITEMS_FILE)
+    labels = []
+    for value in request.values.getlist('barcode'):
+        item = find_item(items, barcode=value)
+        if item is not None:
+            labels.extend([_item_label(item)] * copies)
+    for number in request.values.getlist('order'):
+        for order in query_records(ORDERS_FILE, order_number=number):
+            label = (order.get('product_name') or '', format_currency_de(_number(order.get('selling_price'))), number)
+            labels.extend([label] * max(int(_number(order.get('quantity'))), 1))
+    if request.values.get('in_stock'):
+        labels.extend(_item_label(item) for item in items if _number(item.get('quantity')) > 0)
+    if not labels:
+        return Response('Keine Etiketten ausgewählt.', 404)
+
+    per_page = LABEL_GRID[0] * LABEL_GRID[1]
+    pages = [labels[i:i + per_page] for i in range(0, len(labels), per_page)]
+    return Response(stream_with_context(_pdf_document(_label_pages(pages))), mimetype='application/pdf',
+                    headers={'Content-Disposition': 'inline; filename=labels.pdf'})
 
 
 # Admin: admin_sales
 @app.route('/admin/sales')
 @login_required('admin')
 def admin_sales():
-    all_orders = load_sales()
-    flattened_sales = []
-
-    for order in all_orders:
-        order_id = order.get('order_id')
-        user = order.get('user')
-        date = order.get('date')
-        items = order.get('items', [])
-        for item in items:
-            flattened_sales.append({
-                'order_id': order_id,
-                'seller': user,
-                'date': date,
-                'barcode': item.get('barcode'),
-                'product_name': item.get('product_name'),  # keep same as HTML template
-                'quantity': item.get('quantity'),
-                'sale_price': float(item.get('sale_price', 0)),
-                'total_price': float(item.get('total_price', item.get('quantity', 0) * item.get('sale_price', 0)))
-            })
-
-    all_orders = load_sales()  # Full orders with items list and total_order_price
-    return render_template('admin_sales.html', sales=all_orders[::-1])
+    cursor, per_page = page_args()
+    sales, next_cursor = paginate_records(SALES_FILE, cursor, per_page)
+    return render_template('admin_sales.html', sales=sales, next_cursor=next_cursor)
 
 @app.route('/admin/sales/edit/<order_id>/<barcode>', methods=['GET', 'POST'])
 def edit_sale(order_id, barcode):
@@ -680,7 +3394,7 @@ def edit_sale(order_id, barcode):
             item['quantity'] = int(request.form['quantity'])
             item['sale_price'] = float(request.form['sale_price'])
             # evtl. weitere Felder anpassen
-            save_sales(sales)
+            update_records(SALES_FILE, 'order_id', [order])
             flash('Verkauf erfolgreich aktualisiert', 'success')
             return redirect(url_for('admin_sales'))
         except Exception as e:
@@ -691,13 +3405,9 @@ def edit_sale(order_id, barcode):
 @app.route('/admin/sales/delete_sales_order/<order_id>', methods=['POST'])
 @login_required('admin')
 def delete_sales_order(order_id):
-    sales = load_sales()
-    updated_sales = [order for order in sales if order.get('order_id') != order_id]
-    
-    if len(updated_sales) == len(sales):
+    if not delete_records(SALES_FILE, 'order_id', order_id):
         flash("❌ Bestellung nicht gefunden.", "danger")
     else:
-        save_sales(updated_sales)
         flash("✅ Bestellung erfolgreich gelöscht.", "warning")
 
     return redirect(url_for('admin_sales'))
@@ -714,7 +3424,7 @@ def add_item():
         items = load_json(ITEMS_FILE)
 
         # ✅ Check for duplicate barcode
-        if any(item.get('barcode') == barcode for item in items):
+        if find_item(items, barcode=barcode):
             flash(f'⚠️ Ein Artikel mit dem Barcode "{barcode}" existiert bereits!', 'danger')
             return redirect(url_for('add_item'))
 
@@ -745,7 +3455,7 @@ def edit_item(barcode):
     items = load_json(ITEMS_FILE)
 
     # Find the item by barcode (or other unique id)
-    item = next((i for i in items if i.get('barcode') == barcode), None)
+    item = find_item(items, barcode=barcode)
     if not item:
         flash("Artikel nicht gefunden.", "danger")
         return redirect(url_for('list_items'))
@@ -785,9 +3495,53 @@ def delete_item(barcode):
     items = load_items()
     items = [item for item in items if item['barcode'] != barcode]
     save_items(items)
+    forget_barcode('code128', barcode)
     flash('Item deleted', 'success')
     return redirect(url_for('list_items'))
 
+class SaleError(ValueError):
+    pass
+
+# One line of a sale: checks quantity, stock and price (sale_price None means
+# the item's selling price) of a normalized item, takes the quantity off its
+# stock and returns the line for the sale record
+def sell_line(item, quantity, sale_price=None):
+    name = item.get('name', 'Produkt')
+    try:
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError()
+    except (ValueError, TypeError):
+        raise SaleError(f"❌ Ungültige Menge für Produkt {name}.")
+
+    if quantity > item.get('quantity', 0):
+        raise SaleError(f"❌ Nicht genug Bestand für Produkt {name}. Nur noch {item.get('quantity', 0)} verfügbar.")
+
+    if sale_price is not None:
+        try:
+            sale_price = float(sale_price)
+            if sale_price <= 0:
+                raise ValueError()
+        except (ValueError, TypeError):
+            raise SaleError(f"❌ Ungültiger Preis für Produkt {name}.")
+    else:
+        try:
+            sale_price = float(item.get('selling_price', 0))
+            if sale_price <= 0:
+                raise ValueError()
+        except (ValueError, TypeError):
+            raise SaleError(f"❌ Das Produkt {name} hat einen ungültigen Preis.")
+
+    item['quantity'] -= quantity
+    return {
+        'barcode': item.get('barcode'),
+        'product_name': item.get('product_name') or item.get('name') or 'Unbenannt',
+        'quantity': quantity,
+        'sale_price': sale_price,
+        'total_price': round(sale_price * quantity, 2),
+        'purchase_price': item.get('purchase_price', 0)
+    }
+
 @app.route('/sell', methods=['GET', 'POST'])
 def sell_item():
     # Access control: only admin or seller can sell
@@ -795,109 +3549,73 @@ def sell_item():
         flash("❌ Zugriff verweigert. Bitte einloggen.", 'danger')
         return redirect(url_for('login'))
 
-    items = load_items()
-
     if request.method == 'POST':
-        # Collect all indices from form
-        indices = {
-            key.split('[')[1].split(']')[0]
-            for key in request.form if key.startswith('items[')
-        }
-        indices = sorted(indices, key=int)
-
-        sales = load_sales()  # Load existing sales/orders
-
-        order_items = []
-        total_order_price = 0.0
-
-        for idx in indices:
-            barcode = request.form.get(f'items[{idx}][barcode]', '').strip()
-            quantity_raw = request.form.get(f'items[{idx}][quantity]', '').strip()
-            discount_active = request.form.get(f'items[{idx}][discount_active]')
-            price_input = request.form.get(f'items[{idx}][price]', '').strip()
-
-            # Validate barcode
-            if not barcode:
-                flash(f"❌ Bitte wählen Sie für Produkt {int(idx)+1} ein Produkt aus.", 'danger')
-                return redirect(url_for('sell_item'))
-
-            # Find the item in stock
-            item = next((i for i in items if i.get('barcode') == barcode), None)
-            if not item:
-                flash(f"❌ Produkt mit Barcode {barcode} nicht gefunden.", 'danger')
-                return redirect(url_for('sell_item'))
-
-            # Validate quantity
-            try:
-                quantity = int(quantity_raw)
-                if quantity <= 0:
-                    raise ValueError()
-            except ValueError:
-                flash(f"❌ Ungültige Menge für Produkt {item.get('name', 'Produkt')}.", 'danger')
-                return redirect(url_for('sell_item'))
-
-            if quantity > item.get('quantity', 0):
-                flash(f"❌ Nicht genug Bestand für Produkt {item.get('name', 'Produkt')}. Nur noch {item.get('quantity', 0)} verfügbar.", 'danger')
-                return redirect(url_for('sell_item'))
+        # Stock check, stock update and the new sale happen under the file
+        # locks so concurrent checkouts in other workers cannot overwrite them
+        with data_transaction(ITEMS_FILE, SALES_FILE):
+            items = load_json(ITEMS_FILE)
+
+            # Collect all indices from form
+            indices = {
+                key.split('[')[1].split(']')[0]
+                for key in request.form if key.startswith('items[')
+            }
+            indices = sorted(indices, key=int)
+
+            order_items = []
+            sold_items = {}
+            total_order_price = 0.0
+            catalog = catalog_index(items)
+
+            for idx in indices:
+                barcode = request.form.get(f'items[{idx}][barcode]', '').strip()
+                quantity_raw = request.form.get(f'items[{idx}][quantity]', '').strip()
+                discount_active = request.form.get(f'items[{idx}][discount_active]')
+                price_input = request.form.get(f'items[{idx}][price]', '').strip()
+
+                # Validate barcode
+                if not barcode:
+                    flash(f"❌ Bitte wählen Sie für Produkt {int(idx)+1} ein Produkt aus.", 'danger')
+                    return redirect(url_for('sell_item'))
 
-            # Determine sale price
-            if discount_active:
-                try:
-                    sale_price = float(price_input)
-                    if sale_price <= 0:
-                        raise ValueError()
-                except ValueError:
-                    flash(f"❌ Ungültiger Preis für Produkt {item.get('name', 'Produkt')}.", 'danger')
+                # Find the item in stock
+                item = find_item(items, barcode=barcode, index=catalog)
+                if not item:
+                    flash(f"❌ Produkt mit Barcode {barcode} nicht gefunden.", 'danger')
                     return redirect(url_for('sell_item'))
-            else:
+                normalize_items([item])
+
+                # Quantity, stock and price checks, reduces the stock
                 try:
-                    sale_price = float(item.get('selling_price', 0))
-                    if sale_price <= 0:
-                        raise ValueError()
-                except (ValueError, TypeError):
-                    flash(f"❌ Das Produkt {item.get('name', 'Produkt')} hat einen ungültigen Preis.", 'danger')
+                    line = sell_line(item, quantity_raw, price_input if discount_active else None)
+                except SaleError as e:
+                    flash(str(e), 'danger')
                     return redirect(url_for('sell_item'))
+                quantity = line['quantity']
+                total_order_price += line['total_price']
+                order_items.append(line)
+                sold_items[barcode] = item
+
+                # Flash success per item
+                product_name = item.get("product_name") or item.get("name") or "Produkt"
+                flash(f'✅ Verkauf von {quantity} × {product_name} erfolgreich.', 'success')
+
+                # Low stock warning
+                if item.get('quantity', 0) <= 5:
+                    flash(f'⚠️ Achtung: Nur noch {item.get("quantity", 0)} Stück von {product_name} auf Lager!', 'warning')
+
+            # Create a single order object with all items
+            new_order = {
+                "order_id": str(uuid.uuid4()),
+                "user": session['username'],
+                "date": datetime.now().isoformat(),
+                "items": order_items,
+                "total_order_price": round(total_order_price, 2)
+            }
 
-            # Calculate total price for this item
-            total_price = round(sale_price * quantity, 2)
-            total_order_price += total_price
-
-            # Add item to order_items list
-            order_items.append({
-                'barcode': barcode,
-                'product_name': item.get('product_name') or item.get('name') or 'Unbenannt',
-                'quantity': quantity,
-                'sale_price': sale_price,
-                'total_price': total_price,
-                'purchase_price': item.get('purchase_price', 0)
-            })
-
-            # Reduce stock quantity
-            item['quantity'] -= quantity
-
-            # Flash success per item
-            product_name = item.get("product_name") or item.get("name") or "Produkt"
-            flash(f'✅ Verkauf von {quantity} × {product_name} erfolgreich.', 'success')
-
-            # Low stock warning
-            if item.get('quantity', 0) <= 5:
-                flash(f'⚠️ Achtung: Nur noch {item.get("quantity", 0)} Stück von {product_name} auf Lager!', 'warning')
-
-        # Create a single order object with all items
-        new_order = {
-            "order_id": str(uuid.uuid4()),
-            "user": session['username'],
-            "date": datetime.now().isoformat(),
-            "items": order_items,
-            "total_order_price": round(total_order_price, 2)
-        }
-
-        # Append the new order
-        sales.append(new_order)
-
-        # Save updated sales and items
-        save_sales(sales)
-        save_items(items)
+            # Save the new order and the updated stock
+            append_record(SALES_FILE, new_order)
+            update_records(ITEMS_FILE, 'barcode', list(sold_items.values()))
 
         # Redirect based on role
         if session.get('role') == 'admin':
@@ -905,25 +3623,24 @@ def sell_item():
         else:
             return redirect(url_for('seller_dashboard'))
 
-    # GET: render the sell form
-    return render_template('sell_item.html', items=items)
+    # GET: render the sell form, products are looked up with api_item_search
+    return render_template('sell_item.html')
 
 # Seller: Seller History
 @app.route('/seller/sales')
 @login_required('seller')
 def seller_sales():
-    username = session.get('username', '').lower()
-    
-    # Load all sales (replace with your actual function)
-    sales = load_sales()  # returns a list of sale dicts
-    
-    # Filter sales by matching user/seller - using .get() to avoid KeyError
-    user_sales = [s for s in sales if s.get('user', '').lower() == username]
-    
-    # Optional: sort by date descending (if your sales have a 'date' field)
-    user_sales.sort(key=lambda s: s.get('date', ''), reverse=True)
-    
-    return render_template('seller_sales.html', sales=user_sales)
+    # Sales of the logged-in seller, newest first. The seller name matches
+    # regardless of case, so every spelling in the ledger is paged and merged
+    username = session.get('username', '')
+    names = [name for name in load_aggregates()['sellers'] if name.lower() == username.lower()] or [username]
+    cursor, per_page = page_args()
+    pages = [page_entries(SALES_FILE, cursor, per_page, user=name) for name in names]
+    entries = sorted((entry for page, _ in pages for entry in page), key=lambda entry: entry[0], reverse=True)
+    more = len(entries) > per_page or any(more for _, more in pages)
+    entries = entries[:per_page]
+    next_cursor = encode_cursor(entries[-1][0]) if more and entries else None
+    return render_template('seller_sales.html', sales=[sale for key, sale in entries], next_cursor=next_cursor)
 
 # Salary Payment
 @app.route('/admin/pay-salary', methods=['GET', 'POST'])
@@ -976,102 +3693,82 @@ def order():
         today = datetime.now().strftime('%Y-%m-%d')
         username = session.get('username', 'unbekannt')
 
-        # Load existing items
-        items = []
-        if os.path.exists(ITEMS_FILE):
-            with open(ITEMS_FILE, 'r', encoding='utf-8') as f:
-                try:
-                    items = json.load(f)
-                except json.JSONDecodeError:
-                    pass
-
-        # Function to generate a unique 12-digit barcode
-        def generate_unique_barcode():
-            while True:
-                code = ''.join(str(random.randint(0, 9)) for _ in range(12))
-                if not any(i.get('barcode') == code for i in items):
-                    return code
-
-        # Validate or generate barcode
-        if ref_number:
-            if not ref_number.isdigit() or len(ref_number) not in [12, 13]:
-                flash("❌ Der manuell eingegebene Barcode muss genau 12 Ziffern lang sein.", "danger")
-                return redirect(url_for('order'))
+        # Barcode check, new order and stock update under the file locks
+        with data_transaction(ITEMS_FILE, ORDERS_FILE):
+            # Load existing items
+            items = load_json(ITEMS_FILE)
+
+            catalog = catalog_index(items)
+
+            # Function to generate a unique 12-digit barcode
+            def generate_unique_barcode():
+                while True:
+                    code = ''.join(str(random.randint(0, 9)) for _ in range(12))
+                    if not find_item(items, barcode=code, index=catalog):
+                        return code
+
+            # Validate or generate barcode
+            if ref_number:
+                if not ref_number.isdigit() or len(ref_number) not in [12, 13]:
+                    flash("❌ Der manuell eingegebene Barcode muss genau 12 Ziffern lang sein.", "danger")
+                    return redirect(url_for('order'))
             
-            if any(i.get('barcode') == ref_number for i in items):
-                flash("❌ Der Barcode existiert bereits. Bitte wählen Sie einen anderen.", "danger")
-                return redirect(url_for('order'))
+                if find_item(items, barcode=ref_number, index=catalog):
+                    flash("❌ Der Barcode existiert bereits. Bitte wählen Sie einen anderen.", "danger")
+                    return redirect(url_for('order'))
 
-            barcode_number = ref_number
-        else:
-            barcode_number = generate_unique_barcode()
-
-        # Save barcode image
-        barcode_dir = os.path.join(app.static_folder, 'barcodes')
-        os.makedirs(barcode_dir, exist_ok=True)
-        barcode_path = os.path.join(barcode_dir, f'code_barres_{barcode_number}')
-        ean = barcode.get_barcode_class('ean13')
-        code = ean(barcode_number, writer=ImageWriter())
-        code.save(barcode_path)
-
-        total_price = round(price * quantity, 2)
-
-        new_order = {
-            "order_number": barcode_number,
-            "product_name": product_name,
-            "ref_number": ref_number if ref_number else None,
-            "description": description,
-            "price": price,
-            "selling_price": selling_price,
-            "min_selling_price": min_selling_price,
-            "quantity": quantity,
-            "total_price": total_price,
-            "date": today,
-            "user": username,
-            "barcode": f"barcodes/code_barres_{barcode_number}"
-        }
+                barcode_number = ref_number
+            else:
+                barcode_number = generate_unique_barcode()
 
-        # Save order
-        orders = []
-        if os.path.exists(ORDERS_FILE):
-            with open(ORDERS_FILE, 'r', encoding='utf-8') as f:
-                try:
-                    orders = json.load(f)
-                except json.JSONDecodeError:
-                    pass
-
-        orders.append(new_order)
-        with open(ORDERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(orders, f, indent=2, ensure_ascii=False)
-
-        # Update or add item
-        found = False
-        for item in items:
-            if item.get('product_name') == product_name:
-                item['quantity'] = item.get('quantity', 0) + quantity
-                item['purchase_price'] = price
-                item['selling_price'] = selling_price
-                item['min_selling_price'] = min_selling_price
-                item['description'] = description
-                found = True
-                break
+            total_price = round(price * quantity, 2)
 
-        if not found:
-            new_item = {
+            new_order = {
+                "order_number": barcode_number,
                 "product_name": product_name,
-                "barcode": barcode_number,
-                "purchase_price": price,
+                "ref_number": ref_number if ref_number else None,
+                "description": description,
+                "price": price,
                 "selling_price": selling_price,
                 "min_selling_price": min_selling_price,
                 "quantity": quantity,
-                "description": description,
-                "seller": username,
-                "date": today  # human-readable date format
+                "total_price": total_price,
+                "date": today,
+                "user": username
             }
-            items.append(new_item)
 
-        with open(ITEMS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(items, f, indent=2, ensure_ascii=False)
+            # Save order
+            append_record(ORDERS_FILE, new_order)
+
+            # Update or add item
+            item = find_item(items, name=product_name, index=catalog)
+            if item is not None and item.get('product_name') != product_name:
+                # same name in another spelling, orders match it exactly
+                item = next((i for i in items if i.get('product_name') == product_name), None)
+            if item is not None:
+                item['quantity'] = item.get('quantity', 0) + quantity
+                item['purchase_price'] = price
+                item['selling_price'] = selling_price
+                item['min_selling_price'] = min_selling_price
+                item['description'] = description
+            else:
+                new_item = {
+                    "product_name": product_name,
+                    "barcode": barcode_number,
+                    "purchase_price": price,
+                    "selling_price": selling_price,
+                    "min_selling_price": min_selling_price,
+                    "quantity": quantity,
+                    "description": description,
+                    "seller": username,
+                    "date": today  # human-readable date format
+                }
+                items.append(new_item)
+
+            save_items(items)
+
+        # Label image, served from /barcodes/ean13/<number>.png
+        prerender_barcode('ean13', barcode_number)
 
         flash('✅ Bestellung erfolgreich aufgegeben und Inventar aktualisiert!', 'success')
         return redirect(url_for('list_orders'))
@@ -1109,39 +3806,30 @@ def update_quantity():
         flash("Bitte Produktname oder Barcode eingeben.", "warning")
         return redirect(url_for('list_items'))
 
-    # Items laden
-    items = []
-    if os.path.exists(ITEMS_FILE):
-        with open(ITEMS_FILE, 'r', encoding='utf-8') as f:
-            try:
-                items = json.load(f)
-            except json.JSONDecodeError:
-                items = []
+    with data_transaction(ITEMS_FILE):
+        # Items laden
+        items = load_json(ITEMS_FILE)
 
-    found = False
-    for item in items:
         # Nach Barcode exakt oder Produktname (case-insensitive) suchen
-        if (barcode and item.get('barcode') == barcode) or (product_name and item.get('product_name', '').lower() == product_name.lower()):
+        item = None
+        if barcode:
+            item = find_item(items, barcode=barcode)
+        if item is None and product_name:
+            item = find_item(items, name=product_name)
+
+        if item is not None:
             old_qty = item.get('quantity', 0)
             item['quantity'] = old_qty + add_quantity
-            found = True
             flash(f"Menge von '{item.get('product_name')}' von {old_qty} auf {item['quantity']} erhöht.", "success")
-            break
-
-    if not found:
-        flash("Produkt nicht gefunden. Bitte Produktname oder Barcode prüfen.", "warning")
-        return redirect(url_for('list_items'))
+        else:
+            flash("Produkt nicht gefunden. Bitte Produktname oder Barcode prüfen.", "warning")
+            return redirect(url_for('list_items'))
 
-    # Änderungen speichern
-    with open(ITEMS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(items, f, indent=2, ensure_ascii=False)
+        # Änderungen speichern
+        save_items(items)
 
     return redirect(url_for('list_items'))
 
-def load_items_for_seller(username):
-    all_items = load_items()
-    return [item for item in all_items if item.get('seller') == username]
-
 # Load normalize_items
 def normalize_items(items):
     for item in items:
@@ -1163,69 +3851,55 @@ def load_items():
 
 # Load Items for User/Seller
 def load_items_for_seller(username):
-    all_items = load_items()
-    filtered_items = []
-    for item in all_items:
-        seller = item.get('seller', 'admin')  # Default to admin if missing
-        if seller in ('admin', username):
-            filtered_items.append(item)
-    return filtered_items
+    items = load_json(ITEMS_FILE)
+    sellers = catalog_index(items)['seller']  # items without a seller belong to admin
+    owned = heapq.merge(*(sellers.get(seller, []) for seller in dict.fromkeys(('admin', username))))
+    return normalize_items([items[pos] for pos in owned])
 
 # List all the items for the seller
 @app.route('/seller/items')
 @login_required('seller')
 def seller_items():
     username = session['username']
-    items = load_items_for_seller(username)
+    cursor, per_page = page_args()
+    items, next_cursor = paginate_items(cursor, per_page, sellers=('admin', username))
     items = normalize_items(items)  # Ensure all items have 'name'
-    items = items[::-1]
-    return render_template('seller_items.html', items=items)
+    return render_template('seller_items.html', items=items, next_cursor=next_cursor)
 
 @app.route('/orders')
 @login_required(['admin', 'seller'])
 def list_orders():
     role = session.get('role')
     username = session.get('username')
-    all_orders = load_orders()
-    users = list({o.get('user') for o in all_orders if o.get('user')})
+    users = [name for name, totals in load_aggregates()['sellers'].items() if totals['all'].get('orders')]
 
     # Optional: filters from form
     filter_user = request.args.get('user', '')
     filter_date = request.args.get('date', '')
 
-    # FILTER orders:
+    filters = {}
     if role == 'seller':
         # Show only orders created by the logged-in seller
-        orders = [o for o in all_orders if o.get('user') == username]
-    else:
-        # Admin can see all
-        orders = all_orders
-
-    # Apply additional filter by user (only admins can filter this)
-    if filter_user:
-        orders = [o for o in orders if o.get('user') == filter_user]
-
+        filters['user'] = username
+    elif filter_user:
+        # Apply additional filter by user (only admins can filter this)
+        filters['user'] = filter_user
     if filter_date:
-        try:
-            orders = [o for o in orders if o.get('date', '').startswith(filter_date)]
-        except Exception:
-            pass
+        filters['date_prefix'] = filter_date
+
+    cursor, per_page = page_args()
+    orders, next_cursor = paginate_records(ORDERS_FILE, cursor, per_page, **filters)
 
-    return render_template("list_orders.html", orders=orders, users=users)
+    return render_template("list_orders.html", orders=orders, users=users, next_cursor=next_cursor)
 
 
 
 def load_orders():
-    try:
-        with open(ORDERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    return load_json(ORDERS_FILE)
 
 
 def save_orders(orders):
-    with open(ORDERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(orders, f, indent=4, ensure_ascii=False)
+    save_json(ORDERS_FILE, orders)
 
 # Orders CRUD
 # Edit Route
@@ -1252,7 +3926,7 @@ def edit_order(order_number):
             order['date'] = request.form['date']
             order['user'] = session.get('username', order.get('user', 'anonymous'))
 
-            save_orders(orders)
+            update_records(ORDERS_FILE, 'order_number', [order])
             flash('Bestellung erfolgreich aktualisiert!', 'success')
             return redirect(url_for('list_orders'))
         except Exception as e:
@@ -1265,12 +3939,8 @@ def edit_order(order_number):
 @app.route('/orders/delete/<order_number>', methods=['POST'])
 @login_required('admin')
 def delete_order(order_number):
-    orders = load_orders()
-    # Find order with matching order_number
-    order_to_delete = next((o for o in orders if o['order_number'] == order_number), None)
-    if order_to_delete:
-        orders.remove(order_to_delete)
-        save_orders(orders)
+    if delete_records(ORDERS_FILE, 'order_number', order_number):
+        forget_barcode('ean13', order_number)
         flash("Bestellung gelöscht.", "success")
     else:
         flash("Bestellung nicht gefunden.", "danger")
@@ -1278,19 +3948,7 @@ def delete_order(order_number):
 
 # save_salary_payment
 def save_salary_payment(payment_record):
-    # Load existing payments
-    try:
-        with open('data/salary_payments.json', 'r', encoding='utf-8') as f:
-            payments = json.load(f)
-    except FileNotFoundError:
-        payments = []
-
-    # Append new payment
-    payments.append(payment_record)
-
-    # Save back
-    with open('data/salary_payments.json', 'w', encoding='utf-8') as f:
-        json.dump(payments, f, ensure_ascii=False, indent=2)
+    append_record(PAYMENTS_FILE, payment_record)
 
 # save_salary_payment
 @app.route('/pay_salary', methods=['POST'], endpoint='pay_salary_post')
@@ -1309,43 +3967,19 @@ def pay_salary():
 # List of Payments
 @app.route('/list_salary_payments')
 def list_salary_payments():
-    try:
-        with open('data/salary_payments.json', 'r', encoding='utf-8') as f:
-            payments = json.load(f)
-    except FileNotFoundError:
-        payments = []
-    payments = payments[::-1]
-    return render_template('list_salary_payments.html', payments=payments)
+    cursor, per_page = page_args()
+    payments, next_cursor = paginate_records(PAYMENTS_FILE, cursor, per_page)
+    return render_template('list_salary_payments.html', payments=payments, next_cursor=next_cursor)
 
 # Kasse
 @app.route('/kasse', methods=['GET', 'POST'])
 @login_required(['admin', 'seller'])
 def kasse():
-    kasse_file = os.path.join('data', 'kasse.json')
-    sales_file = os.path.join('data', 'sales.json')
-    purchases_file = os.path.join('data', 'orders.json')
-
-    # Safely load all data
-    def load_json(path):
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return []
-        return []
-
-    transactions = load_json(kasse_file)
-    sales = load_json(sales_file)
-    purchases = load_json(purchases_file)
-
     # Handle POST: Add or delete entry
     if request.method == 'POST':
         if 'delete_date' in request.form and session.get('role') == 'admin':
-            delete_date = request.form['delete_date']
-            transactions = [t for t in transactions if t['date'] != delete_date]
-            with open(kasse_file, 'w', encoding='utf-8') as f:
-                json.dump(transactions, f, indent=2, ensure_ascii=False)
+            with data_transaction(KASSE_FILE):
+                delete_records(KASSE_FILE, 'date', request.form['delete_date'])
             flash("Eintrag gelöscht.", "success")
             return redirect(url_for('kasse'))
 
@@ -1353,13 +3987,13 @@ def kasse():
             amount = float(request.form['betrag'])
             description = request.form.get('beschreibung', '').strip()
             ktype = request.form.get('typ', '').strip().lower()
-            print("typ:", ktype, "amount before processing:", amount)
+            app.logger.debug('kasse: typ %s, Betrag vor Verarbeitung %s', ktype, amount)
             if ktype not in ['einzahlung', 'auszahlung']:
                 raise ValueError("Ungültiger Typ")
 
             # Auszahlung = negative amount
             amount = -abs(amount) if ktype == 'auszahlung' else abs(amount)
-            print("amount after processing:", amount)
+            app.logger.debug('kasse: Betrag nach Verarbeitung %s', amount)
             
             transaction = {
                 "date": datetime.now().isoformat(),
@@ -1369,10 +4003,8 @@ def kasse():
                 "user": session.get('username', 'unbekannt')
             }
 
-            transactions.append(transaction)
-
-            with open(kasse_file, 'w', encoding='utf-8') as f:
-                json.dump(transactions, f, indent=2, ensure_ascii=False)
+            with data_transaction(KASSE_FILE):
+                append_record(KASSE_FILE, transaction)
 
             flash(f"{ktype.capitalize()} gespeichert.", "success")
             return redirect(url_for('kasse'))
@@ -1381,38 +4013,27 @@ def kasse():
             flash(f"Fehler: {e}", "danger")
 
     # Balance calculations
-    today = datetime.now().date()
-
-    # Verkäufe heute
-    total_sold_today = 0.0
-    for sale in sales:
-        try:
-            sale_date = sale.get('date')
-            if sale_date and datetime.fromisoformat(sale_date).date() == today:
-                if isinstance(sale.get('items'), list):
-                    total_sold_today += sum(item.get('total_price', 0) for item in sale['items'])
-                else:
-                    total_sold_today += sale.get('total_price', 0)
-        except:
-            continue
-
-    # Bestellungen heute
-    total_orders_today = 0.0
-    for order in purchases:
-        try:
-            order_date = order.get('date')
-            if order_date and datetime.fromisoformat(order_date).date() == today:
-                total_orders_today += order.get('total_price', 0)
-        except:
-            continue
+    cursor, per_page = page_args()
+    page, next_cursor = paginate_records(KASSE_FILE, cursor, per_page)
+    # running balance after each entry, newest first
+    transactions, balance = [], kasse_balance_at(cursor)
+    for t in page:
+        transactions.append(dict(t, balance=balance))
+        balance = round(balance - _number(t.get('amount')), 2)
+    today_totals = aggregate_totals('day', datetime.now().date().isoformat())
+
+    # Verkäufe heute, Bestellungen heute
+    total_sold_today = today_totals['revenue']
+    total_orders_today = today_totals['purchases']
 
     # Gesamtsaldo
-    current_balance = sum(t.get('amount', 0) for t in transactions)
+    current_balance = load_kasse_balance()
     total_balance = current_balance + total_sold_today - total_orders_today
 
     return render_template(
         "kasse.html",
-        transactions=reversed(transactions),  # newest first
+        transactions=transactions,
+        next_cursor=next_cursor,
         role=session.get('role'),
         current_balance=current_balance,
         total_sold_today=total_sold_today,
@@ -1421,6 +4042,460 @@ def kasse():
     )
 
 
+# JSON API (/api/v1). Every response carries an ETag made from the version
+# of the data it was read from, so polling clients get a 304 for the cost of
+# a few stat() calls, before anything is loaded or serialized
+def _stat_version(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+# Changes whenever the content of the data file may have changed: the stat of
+# the snapshot, its journal and, for month partitions, of the manifest and the
+# open months (sealed months are named after their content). For SQLite the
+# header's change counter is read as well, in-place writes can keep size and
+# mtime. None when there is no cheap version (other databases)
+def data_version(file_path):
+    if use_db(file_path):
+        if db.engine.url.get_backend_name() != 'sqlite':
+            return None
+        path = db.engine.url.database
+        try:
+            with open(path, 'rb') as f:
+                counter = f.read(28)[24:]
+        except FileNotFoundError:
+            counter = None
+        return (counter, _stat_version(path), _stat_version(path + '-wal'))
+    if file_path in PARTITIONED:
+        entries = _load_manifest(file_path)['partitions'].values()
+        open_files = [_partition_file(file_path, entry['file']) for entry in entries if not entry['sealed']]
+        return (_stat_version(_manifest_path(file_path)),) + tuple(
+            (_stat_version(path), _stat_version(_journal_path(path))) for path in open_files)
+    if file_path in JOURNALED:
+        return (_stat_version(file_path), _stat_version(_journal_path(file_path)))
+    return (_stat_version(file_path),)
+
+def api_login_required(roles=None):
+    if not isinstance(roles, (list, tuple)):
+        roles = [roles] if roles else []
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'username' not in session:
+                return jsonify({'error': 'Nicht angemeldet.'}), 401
+            if roles and session.get('role') not in roles:
+                return jsonify({'error': 'Keine Berechtigung.'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# JSON of build() for the data in file_paths. The ETag covers the data
+# versions, the user (results depend on the role) and the full query string;
+# without a data version it falls back to a hash of the body. build() may
+# return (body, status) for errors, those go out without an ETag
+def api_response(file_paths, build):
+    versions = [data_version(path) for path in file_paths]
+    etag = None
+    if None not in versions:
+        key = repr((versions, session.get('username'), session.get('role'), request.full_path))
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+    body = build()
+    if isinstance(body, tuple):
+        return jsonify(body[0]), body[1]
+    response = jsonify(body)
+    if etag is None:
+        etag = hashlib.sha1(response.get_data()).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _api_filters():
+    filters = export_filters()
+    if session.get('role') != 'admin':
+        # sellers only see their own sales and orders
+        filters['user'] = session['username']
+    return filters
+
+def _api_page(file_path, filters):
+    cursor, per_page = page_args()
+    page, next_cursor = paginate_records(file_path, cursor, per_page, **filters)
+    return {'data': page, 'next_cursor': next_cursor}
+
+# ?cursor, ?per_page, ?seller (admin); sellers see admin's and their own items
+@app.route('/api/v1/items')
+@api_login_required(['admin', 'seller'])
+def api_items():
+    if session.get('role') == 'admin':
+        sellers = (request.args['seller'],) if request.args.get('seller') else None
+    else:
+        sellers = ('admin', session['username'])
+
+    def build():
+        cursor, per_page = page_args()
+        page, next_cursor = paginate_items(cursor, per_page, sellers=sellers)
+        return {'data': page, 'next_cursor': next_cursor}
+    return api_response([ITEMS_FILE], build)
+
+# Product search for the sell page: casefolded barcodes and names sorted for
+# prefix lookups, and barcode, name and description of every item joined into
+# one string for substring matches with str.find. Sales only change stock and
+# prices, so the index survives them; it is extended for new items and
+# rebuilt when an indexed text changes. With SQLite it is kept per data version
+_search_index = {'data': None, 'version': None}
+SEARCH_SEPARATOR = '\x00'
+
+def _search_texts(item):
+    return (str(item.get('barcode') or '').casefold(),
+            str(item.get('product_name') or item.get('name') or '').casefold(),
+            str(item.get('description') or '').casefold())
+
+def _build_search_index(items):
+    texts = [_search_texts(item) for item in (list.__iter__(items) if type(items) is CowList else items)]
+    index = {'data': items, 'version': None, 'texts': texts,
+             'barcodes': sorted((t[0], pos) for pos, t in enumerate(texts)),
+             'names': sorted((t[1], pos) for pos, t in enumerate(texts)),
+             'starts': [], 'blob': ''}
+    _extend_search_blob(index, 0)
+    return index
+
+def _extend_search_blob(index, first):
+    parts, offset = [], len(index['blob'])
+    for texts in index['texts'][first:]:
+        index['starts'].append(offset)
+        part = SEARCH_SEPARATOR.join(texts) + SEARCH_SEPARATOR
+        parts.append(part)
+        offset += len(part)
+    index['blob'] += ''.join(parts)
+
+def _carry_search_index(old, new):
+    global _search_index
+    index = _search_index
+    if index['data'] is not old:
+        return
+    if len(new) < len(old):
+        _search_index = {'data': None, 'version': None}
+        return
+    for pos in range(len(old)):
+        if new[pos] is not old[pos] and _search_texts(new[pos]) != index['texts'][pos]:
+            _search_index = {'data': None, 'version': None}
+            return
+    if len(new) > len(old):
+        index = dict(index, texts=list(index['texts']), barcodes=list(index['barcodes']),
+                     names=list(index['names']), starts=list(index['starts']))
+        for pos in range(len(old), len(new)):
+            texts = _search_texts(new[pos])
+            index['texts'].append(texts)
+            bisect.insort(index['barcodes'], (texts[0], pos))
+            bisect.insort(index['names'], (texts[1], pos))
+        _extend_search_blob(index, len(old))
+    _search_index = dict(index, data=new)
+
+def _current_search_index():
+    global _search_index
+    index = _search_index
+    if use_db(ITEMS_FILE):
+        version = data_version(ITEMS_FILE)
+        if version is None or index['version'] != version:
+            index = _build_search_index(load_json(ITEMS_FILE, copy=False))
+            index['version'] = version
+            _search_index = index
+        return index
+    items = load_json(ITEMS_FILE, copy=False)
+    if index['data'] is not items:
+        index = _search_index = _build_search_index(items)
+    return index
+
+def _prefixed(sorted_texts, prefix):
+    for i in range(bisect.bisect_left(sorted_texts, (prefix,)), len(sorted_texts)):
+        text, pos = sorted_texts[i]
+        if not text.startswith(prefix):
+            return
+        yield pos
+
+# Up to `limit` item positions for the query: exact barcode, barcode prefix,
+# name prefix, then substring of barcode, name or description
+def search_items(query, limit=20):
+    query = query.strip().casefold()
+    index = _current_search_index()
+    if not query or SEARCH_SEPARATOR in query:
+        return index, []
+    # exact barcodes sort first among those with the query as prefix
+    found = dict.fromkeys(itertools.takewhile(lambda pos: index['texts'][pos][0] == query,
+                                              _prefixed(index['barcodes'], query)))
+    for source in (_prefixed(index['barcodes'], query), _prefixed(index['names'], query)):
+        for pos in source:
+            if len(found) >= limit:
+                return index, list(found)
+            found[pos] = None
+    blob, starts = index['blob'], index['starts']
+    at = blob.find(query)
+    while at != -1 and len(found) < limit:
+        pos = bisect.bisect_right(starts, at) - 1
+        found[pos] = None
+        # continue after this item
+        at = blob.find(query, starts[pos + 1] if pos + 1 < len(starts) else len(blob))
+    return index, list(found)[:limit]
+
+# ?q= and ?limit= (1..100), for the cart rows of the sell page
+@app.route('/api/v1/items/search')
+@api_login_required(['admin', 'seller'])
+def api_item_search():
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+
+    def build():
+        index, positions = search_items(request.args.get('q', ''), limit)
+        items = [index['data'][pos] for pos in positions]
+        return {'data': [{
+            'barcode': item.get('barcode'),
+            'name': item.get('product_name') or item.get('name') or 'Unbenannt',
+            'price': _number(item.get('selling_price')),
+            'quantity': int(_number(item.get('quantity'))),
+            'img': item.get('photo_link') or item.get('image_url') or '',
+        } for item in items]}
+    return api_response([ITEMS_FILE], build)
+
+@app.route('/api/v1/items/<barcode>')
+@api_login_required(['admin', 'seller'])
+def api_item(barcode):
+    def build():
+        item = find_item(load_json(ITEMS_FILE), barcode=barcode)
+        if item is None:
+            return {'error': 'Artikel nicht gefunden.'}, 404
+        return {'data': item}
+    return api_response([ITEMS_FILE], build)
+
+# Sales, orders and kasse: ?cursor, ?per_page, ?from, ?to (JJJJ-MM-TT), ?date
+# (prefix) and ?seller (admin only)
+@app.route('/api/v1/sales')
+@api_login_required(['admin', 'seller'])
+def api_sales():
+    try:
+        filters = _api_filters()
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet JJJJ-MM-TT.'}), 400
+    return api_response([SALES_FILE], lambda: _api_page(SALES_FILE, filters))
+
+@app.route('/api/v1/orders')
+@api_login_required(['admin', 'seller'])
+def api_orders():
+    try:
+        filters = _api_filters()
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet JJJJ-MM-TT.'}), 400
+    return api_response([ORDERS_FILE], lambda: _api_page(ORDERS_FILE, filters))
+
+# Like the kasse page, sellers see every transaction
+@app.route('/api/v1/kasse')
+@api_login_required(['admin', 'seller'])
+def api_kasse():
+    try:
+        filters = export_filters()
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet JJJJ-MM-TT.'}), 400
+
+    def build():
+        return dict(_api_page(KASSE_FILE, filters), balance=load_kasse_balance())
+    return api_response([KASSE_FILE], build)
+
+TREND_FIELDS = ('revenue', 'profit', 'purchases', 'daily_profit', 'wallet_balance', 'sales', 'orders')
+
+# ?days=30 (up to 366) of daily history plus today. Admins get the shop's
+# figures or ?seller=; sellers always get their own, without the cash
+@app.route('/api/v1/trend')
+@api_login_required(['admin', 'seller'])
+def api_trend():
+    days = request.args.get('days', 30, type=int)
+    if not days or not 1 <= days <= 366:
+        return jsonify({'error': 'days muss zwischen 1 und 366 liegen.'}), 400
+    seller = request.args.get('seller') if session.get('role') == 'admin' else session['username']
+    # the first request of a day writes yesterday into the history, which
+    # changes the ETag
+    roll_up_history()
+
+    def build():
+        series = history_series(days)
+        if seller:
+            points = [dict({field: entry['sellers'].get(seller, {}).get(field, 0) for field in SELLER_HISTORY_FIELDS},
+                           date=entry['date']) for entry in series]
+        else:
+            points = [{field: entry[field] for field in ('date',) + TREND_FIELDS} for entry in series]
+        return {'days': days, 'seller': seller, 'series': points}
+    return api_response([HISTORY_FILE, AGGREGATES_FILE], build)
+
+# ?group=product|seller|weekday|hour, ?from, ?to, ?seller (admin), ?limit
+@app.route('/api/v1/analytics')
+@api_login_required(['admin', 'seller'])
+def api_analytics():
+    group = request.args.get('group', 'product')
+    if group not in ANALYTICS_GROUPS:
+        return jsonify({'error': f"group muss eines von {', '.join(ANALYTICS_GROUPS)} sein."}), 400
+    try:
+        filters = _api_filters()
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum, erwartet JJJJ-MM-TT.'}), 400
+    limit = request.args.get('limit', type=int)
+
+    def build():
+        results = sales_analytics(group, filters.get('since'), filters.get('until'), filters.get('user'))
+        return {'group': group, 'seller': filters.get('user'), 'data': results[:limit] if limit else results}
+    return api_response([SALES_FILE], build)
+
+SALE_BATCH_LIMIT = 500
+SALE_KEY_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'sale-idempotency-key')
+
+# Every order id ever stored in the JSON sales, as a journaled list next to
+# the ledger, so a batch key is found whatever date it is sent with again.
+# Ids stay listed after a sale is deleted: the key was used. The file name
+# sorts after sales.json, its lock is taken with the sales lock held
+_sale_ids_cache = {}
+
+# Called with the sales lock held. Without the list the next lookup builds it
+def update_sale_ids(records):
+    if not use_db(SALES_FILE) and os.path.exists(SALE_IDS_FILE):
+        _journal_write(SALE_IDS_FILE, [{'op': 'add', 'record': record.get('order_id')} for record in records])
+
+# The stored order ids as a set, extended by what the journal appended since
+# the last call. Called with the sales lock held
+def _sale_id_set():
+    if not os.path.exists(SALE_IDS_FILE):
+        save_json(SALE_IDS_FILE, [record.get('order_id') for record in iter_records(SALES_FILE)])
+    ids = load_json(SALE_IDS_FILE, copy=False)
+    cached = _sale_ids_cache.get('ids')
+    if cached and cached[0] is ids:
+        return cached[1]
+    journal = _journal_cache.get(SALE_IDS_FILE)
+    if cached and journal and journal['data'] is ids and journal['extends'] is cached[0]:
+        found = cached[1]
+        found.update(ids[len(cached[0]):])
+    else:
+        found = set(ids)
+    _sale_ids_cache['ids'] = (ids, found)
+    return found
+
+# Order ids among `order_ids` that are already stored
+def _stored_order_ids(order_ids):
+    if not order_ids:
+        return set()
+    if use_db(SALES_FILE):
+        return {row.order_id for row in SaleRecord.query.filter(SaleRecord.order_id.in_(list(order_ids)))}
+    return order_ids & _sale_id_set()
+
+def _batch_date(value):
+    date = datetime.fromisoformat(str(value))
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return date.isoformat()
+
+# Sales queued by an offline till: {"orders": [{"key": ..., "date": ...,
+# "items": [{"barcode": ..., "quantity": ..., "price": optional}]}]}.
+# The orders are checked in turn against one catalog snapshot, the accepted
+# ones are stored with one write of the sales and one of the items. The order
+# id is derived from the seller and the client's key, so an order sent again
+# (with any date) is reported as duplicate instead of sold twice
+@app.route('/api/v1/sales/batch', methods=['POST'])
+@api_login_required(['admin', 'seller'])
+def api_sales_batch():
+    payload = request.get_json(silent=True)
+    orders = payload.get('orders') if isinstance(payload, dict) else None
+    if not isinstance(orders, list) or len(orders) > SALE_BATCH_LIMIT:
+        return jsonify({'error': f'Erwartet {{"orders": [...]}} mit höchstens {SALE_BATCH_LIMIT} Bestellungen.'}), 400
+
+    username = session['username']
+    results = []
+    parsed = []
+    for order in orders:
+        order = order if isinstance(order, dict) else {}
+        key = order.get('key')
+        result = {'key': key}
+        results.append(result)
+        try:
+            if not isinstance(key, str) or not key or len(key) > 200:
+                raise SaleError('❌ Fehlender oder ungültiger Schlüssel (key).')
+            try:
+                date = _batch_date(order.get('date'))
+            except ValueError:
+                raise SaleError('❌ Ungültiges Datum, erwartet ISO 8601.')
+            lines = order.get('items')
+            if not isinstance(lines, list) or not lines or not all(isinstance(line, dict) for line in lines):
+                raise SaleError('❌ Die Bestellung enthält keine Produkte.')
+        except SaleError as e:
+            result.update(status='rejected', error=str(e))
+            continue
+        result['order_id'] = str(uuid.uuid5(SALE_KEY_NAMESPACE, f'{username}\x00{key}'))
+        parsed.append((result, date, lines))
+
+    created, sold_items = [], {}
+    with data_transaction(ITEMS_FILE, SALES_FILE):
+        stored = _stored_order_ids({result['order_id'] for result, _, _ in parsed})
+        items = load_json(ITEMS_FILE)
+        catalog = catalog_index(items)
+        for result, date, lines in parsed:
+            if result['order_id'] in stored:
+                result['status'] = 'duplicate'
+                continue
+            order_items, taken = [], []
+            try:
+                for line in lines:
+                    item = find_item(items, barcode=str(line.get('barcode') or ''), index=catalog)
+                    if not item:
+                        raise SaleError(f"❌ Produkt mit Barcode {line.get('barcode')} nicht gefunden.")
+                    normalize_items([item])
+                    before = item['quantity']
+                    order_items.append(sell_line(item, line.get('quantity'), line.get('price')))
+                    taken.append((item, before))
+            except SaleError as e:
+                # give back what the earlier lines of this order took
+                for item, before in reversed(taken):
+                    item['quantity'] = before
+                result.update(status='rejected', error=str(e))
+                continue
+            for item, _ in taken:
+                sold_items[item.get('barcode')] = item
+            created.append({
+                "order_id": result['order_id'],
+                "user": username,
+                "date": date,
+                "items": order_items,
+                "total_order_price": round(sum(line['total_price'] for line in order_items), 2)
+            })
+            stored.add(result['order_id'])
+            result['status'] = 'created'
+
+        append_records(SALES_FILE, created)
+        if sold_items:
+            update_records(ITEMS_FILE, 'barcode', list(sold_items.values()))
+
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'duplicate', 'rejected')}
+    return jsonify(dict(counts, results=results))
+
+
+# Data file cache counters of this worker
+@app.route('/admin/cache_stats')
+@login_required('admin')
+def cache_stats():
+    return jsonify({
+        'hits': CACHE_STATS['hits'],
+        'misses': CACHE_STATS['misses'],
+        'files': sorted(os.path.basename(path) for path in _json_cache),
+        'barcodes': dict(BARCODE_STATS, lru=len(_barcode_lru)),
+    })
+
 # Dimiss Alerts
 @app.route('/dismiss_alert', methods=['POST'])
 @login_required('admin')
@@ -1430,22 +4505,23 @@ def dismiss_alert():
         flash("⚠️ Ungültiger Barcode für Erinnerung.", "error")
         return redirect(url_for('seller_dashboard'))
 
-    dismissed_alerts = load_json(ALERTS_DISMISS_FILE)
-
     now = datetime.now()
     remind_in_3_days = now + timedelta(days=3)
 
-    existing = next((d for d in dismissed_alerts if d.get('barcode') == barcode), None)
+    existing = query_records(ALERTS_DISMISS_FILE, barcode=barcode)
     if existing:
-        existing['remind_date'] = remind_in_3_days.isoformat()
+        existing[0]['remind_date'] = remind_in_3_days.isoformat()
+        update_records(ALERTS_DISMISS_FILE, 'barcode', existing[:1])
     else:
-        dismissed_alerts.append({
+        append_record(ALERTS_DISMISS_FILE, {
             "barcode": barcode,
             "remind_date": remind_in_3_days.isoformat()
         })
 
-    save_json(ALERTS_DISMISS_FILE, dismissed_alerts)
-    
+    # back to the notifications page when dismissed there, local paths only
+    next_url = request.form.get('next', '')
+    if next_url.startswith('/') and not next_url.startswith('//'):
+        return redirect(next_url)
     return redirect(url_for('admin_dashboard'))
 
 if __name__ == '__main__':
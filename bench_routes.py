@@ -0,0 +1,251 @@
+"""Latency, peak memory and I/O of the main pages on generated data.
+
+For every --sales size a data directory is filled by gen_data.py and a fresh
+process with its own Flask app logs in an admin and a seller and requests
+each route --requests times. Per route it reports p50/p95/p99 latency, the
+peak RSS while the route ran and the bytes read and written per request
+(rchar/wchar from /proc/self/io, so page cache hits count too).
+
+--memory runs the app with MEMORY_TRACE=1 and adds the peak allocated
+per request and the source lines allocating most, as /admin/memory reports
+them; latencies are then much higher than without it.
+
+--save writes the results as JSON, --baseline compares against such a file
+and exits with 1 when a route's p95, or with --memory its allocation peak,
+grew by more than --threshold.
+
+    python bench_routes.py --sales 1000 100000 --save baseline.json
+    python bench_routes.py --sales 1000 100000 --baseline baseline.json
+    python bench_routes.py --sales 100000 --memory
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import gen_data
+
+PASSWORD = 'bench'
+
+# (name, role, method, path, endpoint); POST bodies come from form_data
+ROUTES = [
+    ('GET /admin', 'admin', 'get', '/admin', 'admin_dashboard'),
+    ('GET /admin/sales', 'admin', 'get', '/admin/sales', 'admin_sales'),
+    ('GET /orders', 'admin', 'get', '/orders', 'list_orders'),
+    ('GET /analytics', 'admin', 'get', '/admin/analytics?group=product', 'admin_analytics'),
+    ('GET /kasse', 'admin', 'get', '/kasse', 'kasse'),
+    ('POST /kasse', 'admin', 'post', '/kasse', 'kasse'),
+    ('GET /sell', 'seller', 'get', '/sell', 'sell_item'),
+    ('POST /sell', 'seller', 'post', '/sell', 'sell_item'),
+]
+
+
+def load_app(data_dir, backend, memory=False):
+    os.environ['DATA_PATH'] = data_dir
+    os.environ['STORAGE_BACKEND'] = backend
+    os.environ['MEMORY_TRACE'] = '1' if memory else '0'
+    os.environ.setdefault('Zeuus', 'bench')
+    sys.stdout = open(os.devnull, 'w')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as store
+    return store
+
+
+def read_io():
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except OSError:
+        return None
+
+
+def reset_peak_rss():
+    # writing 5 to clear_refs resets VmHWM, so the peak belongs to one route
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def form_data(path, n, barcodes):
+    if path == '/kasse':
+        return {'betrag': '1', 'typ': 'einzahlung', 'beschreibung': f'bench {n}'}
+    return {'items[0][barcode]': barcodes[n % len(barcodes)], 'items[0][quantity]': '1'}
+
+
+def measure(client, method, path, requests, data=None):
+    reset_peak_rss()
+    io_before = read_io()
+    latencies = []
+    for n in range(requests):
+        began = time.perf_counter()
+        response = getattr(client, method)(path, data=data(n) if data else None)
+        latencies.append(time.perf_counter() - began)
+        if response.status_code not in (200, 302):
+            raise RuntimeError(f'{method.upper()} {path}: {response.status_code}')
+    io_after = read_io()
+    result = {
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': peak_rss() / 1e6,
+    }
+    if io_before and io_after:
+        result['read_kb'] = (io_after[0] - io_before[0]) / requests / 1024
+        result['written_kb'] = (io_after[1] - io_before[1]) / requests / 1024
+    return result
+
+
+def run_scale(data_dir, backend, requests, memory, results):
+    store = load_app(data_dir, backend, memory)
+    store.app.testing = True
+    began = time.perf_counter()
+    if backend == 'sqlite':
+        with store.app.app_context():
+            store.db.create_all()
+        store.app.test_cli_runner().invoke(args=['migrate-json'])
+    with store.app.app_context():
+        users = store.load_json(store.USERS_FILE)
+        barcodes = [item['barcode'] for item in store.load_json(store.ITEMS_FILE) if item['quantity'] >= 20]
+    clients = {}
+    for role in ('admin', 'seller'):
+        clients[role] = store.app.test_client()
+        username = next(user['username'] for user in users if user['role'] == role)
+        clients[role].post('/login', data={'username': username, 'password': PASSWORD})
+
+    # the first request of every route splits legacy files, builds caches
+    # and indexes; that is reported as setup, not as route latency
+    for name, role, method, path, endpoint in ROUTES:
+        data = (lambda n, path=path: form_data(path, n, barcodes)) if method == 'post' else None
+        measure(clients[role], method, path, 1, data)
+    setup = time.perf_counter() - began
+
+    if memory:
+        clients['admin'].post('/admin/memory')
+    measured = {}
+    for name, role, method, path, endpoint in ROUTES:
+        data = (lambda n, path=path: form_data(path, n, barcodes)) if method == 'post' else None
+        measured[name] = measure(clients[role], method, path, requests, data)
+    if memory:
+        report = clients['admin'].get('/admin/memory').get_json()['endpoints']
+        by_endpoint = {(entry['endpoint'], entry['method']): entry for entry in report}
+        for name, role, method, path, endpoint in ROUTES:
+            entry = by_endpoint[(endpoint, method.upper())]
+            measured[name]['alloc_peak_mb'] = entry['peak_max_bytes'] / 1e6
+            measured[name]['top_lines'] = entry['top_lines'][:5]
+    results.put({'setup_s': setup, 'routes': measured})
+
+
+def bench_scale(sales, args):
+    data_dir = tempfile.mkdtemp(prefix='bench_routes_')
+    try:
+        gen_data.generate(data_dir, sales, args.seed, args.end, password=PASSWORD)
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        process = ctx.Process(target=run_scale, args=(data_dir, args.backend, args.requests, args.memory, results))
+        process.start()
+        try:
+            result = results.get(timeout=args.timeout)
+        finally:
+            process.join()
+        return result
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def compare(route, base, threshold):
+    if not base:
+        return '', False
+    change = (route['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0.0
+    # sub-millisecond differences are noise, not regressions
+    slower = change > threshold and route['p95_ms'] - base['p95_ms'] > 1.0
+    note = f"p95 {change:+.0%}{'  SLOWER' if slower else ''}"
+    if 'alloc_peak_mb' in route and base.get('alloc_peak_mb'):
+        grown = (route['alloc_peak_mb'] - base['alloc_peak_mb']) / base['alloc_peak_mb']
+        bigger = grown > threshold and route['alloc_peak_mb'] - base['alloc_peak_mb'] > 0.1
+        note += f"  alloc {grown:+.0%}{'  BIGGER' if bigger else ''}"
+        slower = slower or bigger
+    return note, slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sales', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--end', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(), default=None,
+                        help='last day of generated data (default: from --baseline, else today)')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown, 0.2 = 20%%')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--memory', action='store_true', help='trace allocations per route (slow)')
+    parser.add_argument('--timeout', type=int, default=3600)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if args.end is None and baseline['meta'].get('end'):
+            args.end = date.fromisoformat(baseline['meta']['end'])
+    args.end = args.end or date.today()
+    meta = {'backend': args.backend, 'requests': args.requests, 'seed': args.seed, 'end': args.end.isoformat(),
+            'memory': args.memory, 'python': platform.python_version(),
+            'created': datetime.now().isoformat(timespec='seconds')}
+    for key in ('backend', 'requests', 'seed', 'memory'):
+        if baseline and baseline['meta'].get(key) != meta[key]:
+            print(f"warning: baseline was run with {key}={baseline['meta'].get(key)}, now {meta[key]}")
+
+    results = {}
+    regressions = 0
+    for sales in args.sales:
+        result = results[str(sales)] = bench_scale(sales, args)
+        base_routes = baseline.get('results', {}).get(str(sales), {}).get('routes', {})
+        print(f"\n{sales} sales ({args.backend}), setup {result['setup_s']:.2f} s")
+        print(f"{'route':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'read KB':>9} {'write KB':>9}")
+        for name, route in result['routes'].items():
+            note, slower = compare(route, base_routes.get(name), args.threshold)
+            regressions += slower
+            print(f"{name:<18} {route['p50_ms']:>8.2f} {route['p95_ms']:>8.2f} {route['p99_ms']:>8.2f} "
+                  f"{route['peak_rss_mb']:>8.1f} {route.get('read_kb', 0):>9.1f} {route.get('written_kb', 0):>9.1f}  {note}")
+            if 'alloc_peak_mb' in route:
+                lines = ', '.join(f"{line['line']} {line['bytes'] / 1e6:.1f}" for line in route['top_lines'][:3])
+                print(f"{'':<18} allocated up to {route['alloc_peak_mb']:.1f} MB; {lines}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+    if regressions:
+        print(f'\n{regressions} route(s) slower than the baseline')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
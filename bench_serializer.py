@@ -0,0 +1,95 @@
+"""Dump time, parse time and file size of the data file formats.
+
+Runs app.dump_data/app.load_data on generated sales records for every
+format that can be used here: indented and compact JSON with the json
+module, compact JSON with orjson and MessagePack when installed, and
+pickle protocol 5.
+
+    python bench_serializer.py --records 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def load_app():
+    os.environ.setdefault('DATA_PATH', tempfile.mkdtemp(prefix='bench_serializer_'))
+    os.environ.setdefault('Zeuus', 'bench')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as store
+    return store
+
+
+def make_sales(count):
+    rng = random.Random(count)
+    sales = []
+    for n in range(count):
+        lines = [{
+            'barcode': f'{rng.randrange(10 ** 12):012d}',
+            'product_name': f'Produkt {rng.randrange(5000)} – Größe {rng.choice("SML")}',
+            'quantity': rng.randint(1, 5),
+            'sale_price': round(rng.uniform(1, 1500), 2),
+            'total_price': round(rng.uniform(1, 5000), 2),
+            'purchase_price': round(rng.uniform(1, 1200), 2),
+        } for _ in range(rng.randint(1, 3))]
+        sales.append({
+            'order_id': f'{rng.getrandbits(128):032x}',
+            'user': f'verkäufer{rng.randrange(20)}',
+            'date': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(8, 19):02d}:15:00',
+            'items': lines,
+            'total_order_price': round(sum(line['total_price'] for line in lines), 2),
+        })
+    return sales
+
+
+def codecs(store):
+    found = [('json-pretty (json)', 'json-pretty', False), ('json (json)', 'json', False)]
+    if store.orjson is not None:
+        found.append(('json (orjson)', 'json', True))
+    if store.msgpack is not None:
+        found.append(('msgpack', 'msgpack', True))
+    found.append(('pickle 5', 'pickle', True))
+    return found
+
+
+def measure(store, sales, fmt, use_orjson):
+    orjson = store.orjson
+    if not use_orjson:
+        store.orjson = None
+    # collections triggered by earlier runs would be billed to this one
+    gc.collect()
+    gc.disable()
+    try:
+        began = time.perf_counter()
+        raw = store.dump_data(sales, fmt)
+        dumped = time.perf_counter() - began
+        began = time.perf_counter()
+        store.load_data(raw)
+        parsed = time.perf_counter() - began
+    finally:
+        gc.enable()
+        store.orjson = orjson
+    return dumped, parsed, len(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    store = load_app()
+    print(f"{'records':>8} {'format':<20} {'dump s':>8} {'parse s':>8} {'MB':>8}")
+    for count in args.records:
+        sales = make_sales(count)
+        for name, fmt, use_orjson in codecs(store):
+            dumped, parsed, size = measure(store, sales, fmt, use_orjson)
+            print(f'{count:>8} {name:<20} {dumped:>8.3f} {parsed:>8.3f} {size / 1e6:>8.2f}')
+        del sales
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Write throughput with several worker processes hitting the same data files.
+
+Every worker is a separate process with its own Flask app (like a gunicorn
+worker) and runs checkouts through /sell plus kasse entries. At the end the
+stock and the number of recorded sales are checked for lost updates.
+
+This is not a scaling benchmark. Every checkout writes the same files.
+It holds the items and sales locks while it rewrites and fsyncs
+items.json for the stock, about 2 ms per checkout. So writes/s cannot
+grow beyond one such critical section at a time, and it stays roughly
+flat as workers are added. With more workers than cores it drops,
+because a process that holds a lock gets descheduled while the others
+wait. Use it to check that throughput stays in that range and that no
+update is lost.
+
+    python bench_writes.py --workers 1 2 4 8 --requests 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from werkzeug.security import generate_password_hash
+
+START_QUANTITY = 1000000
+
+
+def make_data_dir(items_count):
+    data_dir = tempfile.mkdtemp(prefix='bench_writes_')
+    users = [{
+        'username': 'bench',
+        'password': generate_password_hash('bench', method='pbkdf2:sha256:1000'),
+        'role': 'seller',
+        'activated': True,
+    }]
+    items = [{
+        'product_name': f'Produkt {i}',
+        'barcode': f'{i:012d}',
+        'purchase_price': 1.0,
+        'selling_price': 2.0,
+        'min_selling_price': 1.5,
+        'quantity': START_QUANTITY,
+        'seller': 'admin',
+    } for i in range(items_count)]
+    for name, data in (('users.json', users), ('items.json', items), ('sales.json', []),
+                       ('orders.json', []), ('kasse.json', [])):
+        with open(os.path.join(data_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    return data_dir
+
+
+def load_app(data_dir):
+    os.environ['DATA_PATH'] = data_dir
+    os.environ.setdefault('Zeuus', 'bench')
+    sys.stdout = open(os.devnull, 'w')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as store
+    return store
+
+
+def worker(data_dir, worker_id, requests, items_count, start, results):
+    store = load_app(data_dir)
+    store.app.testing = True
+    client = store.app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    start.wait()
+    sold = 0
+    began = time.perf_counter()
+    for n in range(requests):
+        if n % 4 == 3:
+            client.post('/kasse', data={'betrag': '1', 'typ': 'einzahlung'})
+            continue
+        barcode = f'{(worker_id * 7 + n) % items_count:012d}'
+        r = client.post('/sell', data={'items[0][barcode]': barcode, 'items[0][quantity]': '1'})
+        if r.status_code == 302:
+            sold += 1
+    results.put((worker_id, sold, time.perf_counter() - began))
+
+
+def count_records(data_dir, results):
+    store = load_app(data_dir)
+    with store.app.app_context():
+        items = store.load_json(store.ITEMS_FILE, copy=False)
+        results.put((
+            sum(START_QUANTITY - i['quantity'] for i in items),
+            len(store.load_json(store.SALES_FILE, copy=False)),
+            len(store.load_json(store.KASSE_FILE, copy=False)),
+        ))
+
+
+def run(workers, requests, items_count):
+    data_dir = make_data_dir(items_count)
+    ctx = multiprocessing.get_context('spawn')
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(data_dir, i, requests, items_count, start, results))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    # let every worker finish importing the app before the clock starts
+    time.sleep(2 + workers * 0.5)
+    began = time.perf_counter()
+    start.set()
+    done = [results.get(timeout=600) for _ in procs]
+    elapsed = time.perf_counter() - began
+    for p in procs:
+        p.join()
+
+    check = ctx.Process(target=count_records, args=(data_dir, results))
+    check.start()
+    stock_sold, sales, kasse = results.get(timeout=60)
+    check.join()
+    shutil.rmtree(data_dir)
+    sold = sum(d[1] for d in done)
+    return {
+        'workers': workers,
+        'requests': workers * requests,
+        'seconds': round(elapsed, 3),
+        'writes_per_s': round(workers * requests / elapsed, 1),
+        'sold': sold,
+        'lost_stock_updates': sold - stock_sold,
+        'lost_sales': sold - sales,
+        'kasse_entries': kasse,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=200, help='requests per worker')
+    parser.add_argument('--items', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} CPUs')
+    print(f"{'workers':>7} {'requests':>8} {'seconds':>8} {'writes/s':>9} {'lost stock':>10} {'lost sales':>10}")
+    for workers in args.workers:
+        r = run(workers, args.requests, args.items)
+        print(f"{r['workers']:>7} {r['requests']:>8} {r['seconds']:>8} {r['writes_per_s']:>9} "
+              f"{r['lost_stock_updates']:>10} {r['lost_sales']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# app reads DATA_PATH on import, so the tests get their own data directory
+DATA_PATH = tempfile.mkdtemp()
+os.environ['DATA_PATH'] = DATA_PATH
+os.environ['STORAGE_BACKEND'] = 'json'
+os.environ.setdefault('Zeuus', 'test')
+
+import app  # noqa: E402
+
+PASSWORD = 'test'
+
+
+@pytest.fixture(autouse=True)
+def empty_data():
+    for name in os.listdir(DATA_PATH):
+        path = os.path.join(DATA_PATH, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    forget_caches()
+    yield
+
+
+# What a freshly started worker would see
+def forget_caches():
+    for cache in (app._json_cache, app._journal_cache, app._sealed_cache, app._page_order_cache):
+        cache.clear()
+
+
+def _client(username, role):
+    users = app.load_json(app.USERS_FILE) if os.path.exists(app.USERS_FILE) else []
+    users.append({'username': username, 'password': generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000'),
+                  'role': role, 'profile_img': '', 'activated': True})
+    app.save_json(app.USERS_FILE, users)
+    client = app.app.test_client()
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+    return client
+
+
+@pytest.fixture
+def admin():
+    return _client('admin', 'admin')
+
+
+@pytest.fixture
+def seller():
+    return _client('verkaeufer', 'seller')
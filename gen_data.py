@@ -0,0 +1,192 @@
+"""Generate a data directory with realistic synthetic shop data.
+
+The same arguments always give the same files: users (admin and sellers),
+items, sales with one to four lines, purchase orders, kasse transactions and
+salary payments, spread over the months before --end. Other counts scale
+with --sales. Files are written as plain JSON in the single-file layout, the
+app splits sales and orders into months on first start. Every user's
+password is --password.
+
+    python gen_data.py /tmp/shop --sales 100000 --seed 1 --end 2025-06-30
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+PRODUCTS = ['iPhone', 'Galaxy', 'Pixel', 'Redmi', 'Hülle', 'Panzerglas', 'Ladekabel', 'Netzteil',
+            'Powerbank', 'Kopfhörer', 'Smartwatch', 'Tablet', 'Speicherkarte', 'Autohalterung']
+VARIANTS = ['Pro', 'Max', 'Mini', 'Lite', 'Plus', 'Ultra', 'Schwarz', 'Weiß', 'Blau', 'USB-C', '128GB', '256GB']
+KASSE_NOTES = ['Wechselgeld', 'Einkauf Büro', 'Tageseinnahmen', 'Reinigung', 'Porto', '']
+
+
+def scale(sales):
+    return {
+        'sellers': max(2, min(20, sales // 5000 + 2)),
+        'items': max(50, min(50000, sales // 20)),
+        'orders': max(20, sales // 5),
+        'kasse': max(10, sales // 10),
+    }
+
+
+def _dates(rng, count, start, end):
+    # ascending, like records appended over time
+    span = (end - start).total_seconds()
+    return [start + timedelta(seconds=span * (i + rng.random()) / count) for i in range(count)]
+
+
+def _write_array(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for n, record in enumerate(records):
+            f.write(',\n' if n else '\n')
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n]\n')
+
+
+def make_users(rng, sellers, password):
+    # what generate_password_hash(method='pbkdf2:sha256:1000') stores, with a seeded salt
+    salt = '%016x' % rng.getrandbits(64)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 1000).hex()
+    hashed = f'pbkdf2:sha256:1000${salt}${digest}'
+    users = [{'username': 'admin', 'password': hashed, 'role': 'admin', 'profile_img': '', 'activated': True}]
+    for n in range(sellers):
+        users.append({'username': f'verkaeufer{n:02d}', 'password': hashed, 'role': 'seller', 'profile_img': '',
+                      'activated': True, 'salary': float(rng.randrange(1600, 3200, 50))})
+    return users
+
+
+def make_items(rng, count, users, start):
+    items = []
+    for n in range(count):
+        name = f'{rng.choice(PRODUCTS)} {rng.choice(VARIANTS)} {n}'
+        purchase = round(rng.uniform(2, 900), 2)
+        selling = round(purchase * rng.uniform(1.15, 1.8), 2)
+        items.append({
+            'product_name': name,
+            'name': name,
+            'barcode': f'{4000000000000 + n * 7919:013d}' if n % 3 else f'{200000000000 + n:012d}',
+            'purchase_price': purchase,
+            'selling_price': selling,
+            'min_selling_price': round(selling * 0.9, 2),
+            'price': selling,
+            # a few items run low so the stock alerts have something to show
+            'quantity': rng.randint(0, 5) if rng.random() < 0.05 else rng.randint(20, 500),
+            'description': rng.choice(['', 'Originalverpackt', 'Aussteller', 'B-Ware']),
+            'photo_link': '',
+            'seller': rng.choice(users)['username'],
+            'added_date': (start + timedelta(days=rng.randrange(60))).strftime('%Y-%m-%d'),
+        })
+    return items
+
+
+def make_sales(rng, count, items, users, start, end):
+    for date in _dates(rng, count, start, end):
+        lines = []
+        for item in rng.sample(items, rng.choice((1, 1, 1, 2, 2, 3, 4))):
+            quantity = rng.choice((1, 1, 1, 2, 3))
+            sale_price = item['selling_price'] if rng.random() < 0.8 else item['min_selling_price']
+            lines.append({
+                'barcode': item['barcode'],
+                'product_name': item['product_name'],
+                'quantity': quantity,
+                'sale_price': sale_price,
+                'total_price': round(sale_price * quantity, 2),
+                'purchase_price': item['purchase_price'],
+            })
+        yield {
+            'order_id': '%08x-%04x-4%03x-%04x-%012x' % (rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(12),
+                                                       rng.getrandbits(16), rng.getrandbits(48)),
+            'user': rng.choice(users)['username'],
+            'date': date.isoformat(),
+            'items': lines,
+            'total_order_price': round(sum(line['total_price'] for line in lines), 2),
+        }
+
+
+def make_orders(rng, count, items, users, start, end):
+    for n, date in enumerate(_dates(rng, count, start, end)):
+        item = rng.choice(items)
+        quantity = rng.randint(1, 50)
+        yield {
+            'order_number': f'{300000000000 + n:012d}',
+            'product_name': item['product_name'],
+            'ref_number': None,
+            'description': item['description'],
+            'price': item['purchase_price'],
+            'selling_price': item['selling_price'],
+            'min_selling_price': item['min_selling_price'],
+            'quantity': quantity,
+            'total_price': round(item['purchase_price'] * quantity, 2),
+            'date': date.strftime('%Y-%m-%d'),
+            'user': rng.choice(users)['username'],
+        }
+
+
+def make_kasse(rng, count, users, start, end):
+    for date in _dates(rng, count, start, end):
+        deposit = rng.random() < 0.6
+        amount = round(rng.uniform(5, 800), 2)
+        yield {
+            'date': date.isoformat(),
+            'amount': amount if deposit else -amount,
+            'type': 'einzahlung' if deposit else 'auszahlung',
+            'description': rng.choice(KASSE_NOTES),
+            'user': rng.choice(users)['username'],
+        }
+
+
+def make_payments(rng, users, start, end):
+    payments = []
+    month = start.replace(day=28)
+    while month <= end:
+        for user in users[1:]:
+            payments.append({
+                'employee': user['username'],
+                'amount': user['salary'],
+                'source': rng.choice(['kasse', 'bank']),
+                'note': '',
+                'date': month.strftime('%Y-%m-%d 18:00'),
+            })
+        month = (month + timedelta(days=7)).replace(day=28)
+    return payments
+
+
+def generate(data_dir, sales=1000, seed=1, end=None, months=24, password='bench'):
+    rng = random.Random(seed)
+    end = datetime.combine(end or datetime.now().date(), datetime.min.time()) + timedelta(hours=20)
+    start = end - timedelta(days=30 * months)
+    counts = scale(sales)
+    os.makedirs(data_dir, exist_ok=True)
+
+    users = make_users(rng, counts['sellers'], password)
+    items = make_items(rng, counts['items'], users, start)
+    _write_array(os.path.join(data_dir, 'users.json'), users)
+    _write_array(os.path.join(data_dir, 'items.json'), items)
+    _write_array(os.path.join(data_dir, 'sales.json'), make_sales(rng, sales, items, users, start, end))
+    _write_array(os.path.join(data_dir, 'orders.json'), make_orders(rng, counts['orders'], items, users, start, end))
+    _write_array(os.path.join(data_dir, 'kasse.json'), make_kasse(rng, counts['kasse'], users, start, end))
+    payments = make_payments(rng, users, start, end)
+    _write_array(os.path.join(data_dir, 'salary_payments.json'), payments)
+    _write_array(os.path.join(data_dir, 'dismissed_alerts.json'), [])
+    return dict(counts, sales=sales, users=len(users), payments=len(payments))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data_dir')
+    parser.add_argument('--sales', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--end', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(), default=None,
+                        help='last day with data (default today)')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--password', default='bench')
+    args = parser.parse_args()
+    counts = generate(args.data_dir, args.sales, args.seed, args.end, args.months, args.password)
+    print(', '.join(f'{name}: {count}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import app
+
+
+def line(barcode, quantity, sale_price, total_price, purchase_price):
+    return {'barcode': barcode, 'product_name': f'Artikel {barcode}', 'quantity': quantity,
+            'sale_price': sale_price, 'total_price': total_price, 'purchase_price': purchase_price}
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(app, 'numpy', None)
+    app._columns_cache.clear()
+    return request.param
+
+
+def test_revenue_sums_line_totals(engine):
+    app.append_records(app.SALES_FILE, [
+        # a rounded line total differs from sale_price * quantity
+        {'order_id': 'a', 'user': 'verkaeufer', 'date': '2025-03-03T10:00:00',
+         'items': [line('1', 3, 3.333, 10.0, 2), line('2', 1, 5, 5, 1)]},
+        {'order_id': 'b', 'user': 'admin', 'date': '2025-03-04T15:30:00', 'items': [line('1', 1, 4, 4, 2)]},
+        # single line sale written before sales had items
+        {'order_id': 'c', 'user': 'admin', 'date': '2025-03-04T16:00:00', 'barcode': '3', 'quantity': 2,
+         'sale_price': 6, 'total_price': 12, 'purchase_price': 5},
+    ])
+    products = {entry['key']: entry for entry in app.sales_analytics('product')}
+    assert products['1']['revenue'] == 14 and products['1']['quantity'] == 4 and products['1']['lines'] == 2
+    assert products['3']['revenue'] == 12
+    assert round(sum(entry['revenue'] for entry in products.values()), 2) == app.load_aggregates()['total']['all']['revenue']
+
+    sellers = {entry['key']: entry['revenue'] for entry in app.sales_analytics('seller', since='2025-03-04')}
+    assert sellers == {'admin': 16}
+    hours = app.sales_analytics('hour', seller='verkaeufer')
+    assert [(entry['key'], entry['revenue']) for entry in hours if entry['lines']] == [(10, 15)]
+
+
+def test_new_sales_wait_for_the_next_query(engine):
+    app.append_record(app.SALES_FILE, {'order_id': 'a', 'user': 'admin', 'date': '2025-03-03T10:00:00',
+                                       'items': [line('1', 1, 4, 4, 2)]})
+    app.sales_analytics('product')
+    meta = app._stored_column_meta()
+
+    app.append_record(app.SALES_FILE, {'order_id': 'b', 'user': 'admin', 'date': '2025-03-04T10:00:00',
+                                       'items': [line('2', 2, 5, 10, 1)]})
+    assert app._stored_column_meta()['rows'] == meta['rows'] == 1
+    assert os.path.exists(app._pending_path(meta))
+
+    products = {entry['key']: entry['revenue'] for entry in app.sales_analytics('product')}
+    assert products == {'1': 4, '2': 10}
+    assert app._stored_column_meta()['generation'] == meta['generation']
+    assert not os.path.exists(app._pending_path(meta))
+
+    # edits drop the columns, the next query rebuilds them
+    app.delete_records(app.SALES_FILE, 'order_id', 'a')
+    assert app._stored_column_meta() is None
+    assert [entry['key'] for entry in app.sales_analytics('product')] == ['2']
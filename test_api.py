@@ -0,0 +1,86 @@
+import re
+
+import app
+from conftest import forget_caches
+
+
+def items():
+    app.save_json(app.ITEMS_FILE, [
+        {'product_name': 'Ladekabel USB-C', 'barcode': '400000000001', 'selling_price': 9, 'purchase_price': 4,
+         'min_selling_price': 8, 'quantity': 20, 'description': 'weiß, 1 m'},
+        {'product_name': 'Kopfhörer', 'barcode': '400000000012', 'selling_price': 30, 'purchase_price': 20,
+         'min_selling_price': 25, 'quantity': 5, 'description': 'mit Kabel'},
+        {'product_name': 'Hülle', 'barcode': '4000000000', 'selling_price': 12, 'purchase_price': 5,
+         'min_selling_price': 10, 'quantity': 8, 'description': ''},
+    ])
+
+
+def test_etag_not_modified(admin):
+    items()
+    response = admin.get('/api/v1/items')
+    etag = response.headers['ETag'].strip('"')
+    assert admin.get('/api/v1/items', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    # another query string is another response
+    assert admin.get('/api/v1/items?per_page=1', headers={'If-None-Match': f'"{etag}"'}).status_code == 200
+
+    app.append_record(app.SALES_FILE, {'order_id': 'a', 'user': 'admin', 'date': '2025-01-01T10:00:00', 'items': []})
+    response = admin.get('/api/v1/sales')
+    etag = response.headers['ETag']
+    assert admin.get('/api/v1/sales', headers={'If-None-Match': etag}).status_code == 304
+    app.append_record(app.SALES_FILE, {'order_id': 'b', 'user': 'admin', 'date': '2025-01-02T10:00:00', 'items': []})
+    assert admin.get('/api/v1/sales', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_sellers_only_get_their_own_sales(admin, seller):
+    app.append_records(app.SALES_FILE, [
+        {'order_id': 'a', 'user': 'verkaeufer', 'date': '2025-01-01T10:00:00', 'items': [], 'total_order_price': 11},
+        {'order_id': 'b', 'user': 'Verkaeufer', 'date': '2025-01-02T10:00:00', 'items': [], 'total_order_price': 22},
+        {'order_id': 'c', 'user': 'admin', 'date': '2025-01-03T10:00:00', 'items': [], 'total_order_price': 33},
+    ])
+    data = seller.get('/api/v1/sales?seller=admin').get_json()['data']
+    assert [sale['order_id'] for sale in data] == ['a']
+    assert len(admin.get('/api/v1/sales').get_json()['data']) == 3
+
+    # the seller pages match the name regardless of case
+    first = seller.get('/seller/sales?per_page=1').get_data(as_text=True)
+    assert '€22.00' in first and '€11.00' not in first
+    cursor = re.search(r'cursor=([^&"]+)', first).group(1)
+    second = seller.get(f'/seller/sales?per_page=1&cursor={cursor}').get_data(as_text=True)
+    assert '€11.00' in second and '€33.00' not in second and 'cursor=' not in second
+
+
+def test_search_order(seller):
+    items()
+    search = lambda q: [item['barcode'] for item in seller.get(f'/api/v1/items/search?q={q}').get_json()['data']]
+    # exact barcode first, then barcode prefix, then names and descriptions
+    assert search('4000000000') == ['4000000000', '400000000001', '400000000012']
+    assert search('kopf') == ['400000000012']
+    assert search('kabel') == ['400000000001', '400000000012']
+    assert search('') == []
+    assert seller.get('/api/v1/items/search?q=x&limit=0').status_code == 200
+
+
+def batch(client, key, date, quantity=1):
+    order = {'key': key, 'date': date, 'items': [{'barcode': '400000000001', 'quantity': quantity}]}
+    return client.post('/api/v1/sales/batch', json={'orders': [order]}).get_json()
+
+
+def test_batch_replay_is_a_duplicate(seller):
+    items()
+    assert batch(seller, 'k1', '2025-01-05T10:00:00')['created'] == 1
+    assert batch(seller, 'k1', '2025-01-05T10:00:00')['duplicate'] == 1
+    # sent again with another date, also after a restart
+    assert batch(seller, 'k1', '2024-06-01T10:00:00')['duplicate'] == 1
+    forget_caches()
+    assert batch(seller, 'k1', '2025-03-01T10:00:00')['duplicate'] == 1
+
+    assert batch(seller, 'k2', '2025-03-01T10:00:00', quantity=2)['created'] == 1
+    assert [item['quantity'] for item in app.load_json(app.ITEMS_FILE)][0] == 17
+    assert len(app.load_json(app.SALES_FILE)) == 2
+
+
+def test_batch_keys_survive_a_rewritten_ledger(seller):
+    items()
+    batch(seller, 'k1', '2025-01-05T10:00:00')
+    app.save_json(app.SALES_FILE, app.load_json(app.SALES_FILE))
+    assert batch(seller, 'k1', '2025-02-05T10:00:00')['duplicate'] == 1
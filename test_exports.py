@@ -0,0 +1,43 @@
+import csv
+import gzip
+import io
+import json
+
+import app
+
+
+def sales():
+    app.append_records(app.SALES_FILE, [
+        {'order_id': 'a', 'user': 'verkaeufer', 'date': '2025-01-31T18:00:00', 'items': [
+            {'barcode': '1', 'product_name': 'Kabel', 'quantity': 2, 'sale_price': 5, 'total_price': 10,
+             'purchase_price': 3},
+            {'barcode': '2', 'product_name': 'Hülle', 'quantity': 1, 'sale_price': 8, 'total_price': 8,
+             'purchase_price': 4}]},
+        {'order_id': 'b', 'user': 'admin', 'date': '2025-02-01T09:00:00', 'items': [
+            {'barcode': '1', 'product_name': 'Kabel', 'quantity': 1, 'sale_price': 5, 'total_price': 5,
+             'purchase_price': 3}]},
+        # single line sale written before sales had items
+        {'order_id': 'c', 'user': 'admin', 'date': '2025-02-02T09:00:00', 'barcode': '3', 'product_name': 'Akku',
+         'quantity': 1, 'sale_price': 20, 'purchase_price': 12}])
+
+
+def test_csv_lines_with_filters(admin):
+    sales()
+    rows = list(csv.DictReader(io.StringIO(admin.get('/download/sales.csv').get_data(as_text=True))))
+    assert [(row['order_id'], row['barcode']) for row in rows] == [('a', '1'), ('a', '2'), ('b', '1'), ('c', '3')]
+    assert rows[-1]['total_price'] == '20.0' and rows[-1]['profit'] == '8.0'
+
+    rows = list(csv.DictReader(io.StringIO(
+        admin.get('/download/sales.csv?from=2025-02-01&to=2025-02-01&barcode=1').get_data(as_text=True))))
+    assert [row['order_id'] for row in rows] == ['b']
+    rows = list(csv.DictReader(io.StringIO(admin.get('/download/sales.csv?seller=verkaeufer').get_data(as_text=True))))
+    assert {row['order_id'] for row in rows} == {'a'}
+    assert admin.get('/download/sales.csv?from=2025-13-01').status_code == 400
+
+
+def test_jsonl_gzip(admin):
+    sales()
+    response = admin.get('/download/sales.jsonl?from=2025-02-01', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    rows = [json.loads(row) for row in gzip.decompress(response.data).decode('utf-8').splitlines()]
+    assert [row['order_id'] for row in rows] == ['b', 'c']
@@ -0,0 +1,62 @@
+import os
+from datetime import date, timedelta
+
+import app
+
+
+def sale(order_id, day, revenue, cost, user='verkaeufer'):
+    line = {'barcode': '1', 'product_name': 'Kabel', 'quantity': 1, 'sale_price': revenue, 'total_price': revenue,
+            'purchase_price': cost}
+    return {'order_id': order_id, 'user': user, 'date': f'{day}T10:00:00', 'items': [line],
+            'total_order_price': revenue}
+
+
+def days_ago(n):
+    return (date.today() - timedelta(days=n)).isoformat()
+
+
+def test_rollup_fills_every_finished_day():
+    app.append_records(app.SALES_FILE, [sale('a', days_ago(3), 10, 4), sale('b', days_ago(1), 20, 5),
+                                        sale('c', days_ago(0), 99, 1)])
+    app.append_record(app.KASSE_FILE, {'date': f'{days_ago(2)}T09:00:00', 'amount': 50, 'user': 'admin'})
+
+    history = app.roll_up_history()
+    assert [entry['date'] for entry in history] == [days_ago(3), days_ago(2), days_ago(1)]
+    assert [entry['revenue'] for entry in history] == [10, 0, 20]
+    assert [entry['all_time_profit'] for entry in history] == [6, 6, 21]
+    assert [entry['wallet_balance'] for entry in history] == [0, 50, 50]
+    assert history[-1]['sellers'] == {'verkaeufer': {'revenue': 20, 'profit': 15, 'purchase_cost': 0, 'sales': 1,
+                                                     'orders': 0}}
+    # nothing new: the stored history comes back as it is
+    assert app.roll_up_history() is app.load_json(app.HISTORY_FILE, copy=False)
+
+
+def test_editing_a_past_day_rolls_it_up_again():
+    app.append_records(app.SALES_FILE, [sale('a', days_ago(3), 10, 4), sale('b', days_ago(1), 20, 5)])
+    app.roll_up_history()
+    app.update_records(app.SALES_FILE, 'order_id', [sale('a', days_ago(3), 30, 4)])
+
+    history = app.roll_up_history()
+    assert history[0]['revenue'] == 30 and history[-1]['all_time_profit'] == 41
+    app.rebuild_aggregates()
+    assert [dict(entry) for entry in app.roll_up_history()] == [dict(entry) for entry in history]
+
+
+def test_no_finished_day():
+    app.append_record(app.SALES_FILE, sale('a', days_ago(0), 10, 4))
+    assert list(app.roll_up_history()) == []
+    written = os.stat(app.HISTORY_FILE).st_mtime_ns
+    assert list(app.roll_up_history()) == []
+    assert os.stat(app.HISTORY_FILE).st_mtime_ns == written
+
+
+def test_trend(admin, seller):
+    app.append_records(app.SALES_FILE, [sale('a', days_ago(2), 10, 4), sale('b', days_ago(0), 7, 2, user='admin')])
+    series = admin.get('/api/v1/trend?days=3').get_json()['series']
+    assert [point['date'] for point in series] == [days_ago(2), days_ago(1), days_ago(0)]
+    assert [point['revenue'] for point in series] == [10, 0, 7]
+
+    series = seller.get('/api/v1/trend?days=3&seller=admin').get_json()['series']
+    assert [point['revenue'] for point in series] == [10, 0, 0]
+    assert 'wallet_balance' not in series[0]
+    assert admin.get('/api/v1/trend?days=0').status_code == 400
@@ -0,0 +1,55 @@
+import app
+from conftest import forget_caches
+
+
+def entry(date, amount, user='admin'):
+    return {'date': date, 'amount': amount, 'type': 'einzahlung' if amount > 0 else 'auszahlung', 'user': user}
+
+
+def assert_checkpoints_match_ledger():
+    assert [list(day) for day in app.kasse_checkpoints()] == app._kasse_checkpoint_days()
+    total = round(sum(r['amount'] for r in app.iter_records(app.KASSE_FILE)), 2)
+    assert app.kasse_balance_at() == total
+
+
+def test_checkpoints_follow_writes():
+    app.append_records(app.KASSE_FILE, [entry('2025-01-01T10:00:00', 100), entry('2025-01-02T10:00:00', -30),
+                                        entry('2025-01-03T10:00:00', 12.5)])
+    assert_checkpoints_match_ledger()
+
+    app.append_record(app.KASSE_FILE, entry('2025-01-04T09:00:00', 7))
+    assert_checkpoints_match_ledger()
+    # backdated: every later day shifts
+    app.append_record(app.KASSE_FILE, entry('2025-01-01T12:00:00', -50))
+    assert_checkpoints_match_ledger()
+    app.update_records(app.KASSE_FILE, 'date', [entry('2025-01-02T10:00:00', -40)])
+    assert_checkpoints_match_ledger()
+    app.delete_records(app.KASSE_FILE, 'date', '2025-01-03T10:00:00')
+    assert_checkpoints_match_ledger()
+    assert app.kasse_checkpoints()[-1] == ['2025-01-04', 17.0, 1]
+
+
+def test_day_without_entries_drops_its_checkpoint():
+    app.append_records(app.KASSE_FILE, [entry('2025-01-01T10:00:00', 10), entry('2025-01-02T10:00:00', 5)])
+    app.kasse_checkpoints()
+    app.delete_records(app.KASSE_FILE, 'date', '2025-01-01T10:00:00')
+    assert [day[0] for day in app.kasse_checkpoints()] == ['2025-01-02']
+    assert_checkpoints_match_ledger()
+
+
+def test_page_balances(admin):
+    app.append_records(app.KASSE_FILE, [entry('2025-01-01T10:00:00', n) for n in (1, 2, 3, 4, 5)])
+    balances, cursor = [], None
+    while True:
+        page, cursor = app.paginate_records(app.KASSE_FILE, app.decode_cursor(cursor), 2)
+        balances.append(app.kasse_balance_at(app.decode_cursor(cursor)) if cursor else None)
+        if cursor is None:
+            break
+    # balance at the top of the following page
+    assert balances == [6, 1, None]
+
+    response = admin.post('/kasse', data={'betrag': '2.5', 'typ': 'auszahlung', 'beschreibung': 'x'})
+    assert response.status_code == 302
+    forget_caches()
+    assert app.kasse_balance_at() == 12.5
+    assert_checkpoints_match_ledger()
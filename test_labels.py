@@ -0,0 +1,62 @@
+import re
+import zlib
+
+from barcode.charsets import code128
+
+import app
+
+
+# Module pattern of the first label's bars, from the rectangles on the page
+def printed_pattern(content):
+    rects = [(float(x), float(width)) for x, width in re.findall(rb'([\d.]+) [\d.]+ ([\d.]+) [\d.]+ re', content)]
+    module = min(width for x, width in rects)
+    pattern = ''
+    for x, width in rects:
+        start = round((x - rects[0][0]) / module)
+        pattern += '0' * (start - len(pattern)) + '1' * round(width / module)
+    return pattern
+
+
+# Text of a Code128 pattern in code sets B and C, with the check symbol verified
+def decode_code128(pattern):
+    # stop symbol and termination bar
+    assert pattern.endswith(code128.STOP + '11')
+    body = pattern[:-len(code128.STOP) - 2]
+    values = [code128.CODES.index(body[i:i + 11]) for i in range(0, len(body), 11)]
+    assert values[-1] == (values[0] + sum(i * v for i, v in enumerate(values[1:-1], 1))) % 103
+    code_set, text = {104: 'B', 105: 'C'}[values[0]], ''
+    for value in values[1:-1]:
+        if value in (99, 100):
+            code_set = 'C' if value == 99 else 'B'
+        elif code_set == 'C':
+            text += f'{value:02d}'
+        else:
+            text += chr(value + 32)
+    return text
+
+
+def label(value):
+    return zlib.decompress(app._label_page([('Artikel', '€1,00', value)]))
+
+
+def test_item_barcodes_read_back_unchanged():
+    for value in ('123456789012', '1234567890123', '0012345', 'ABC-123'):
+        assert app._label_symbology(value) == 'code128'
+        content = label(value)
+        assert decode_code128(printed_pattern(content)) == value
+        assert b'(%s)' % value.encode() in content
+
+
+def test_valid_ean13_stays_ean13():
+    assert app._label_symbology('4006381333931') == 'ean13'
+    assert b'(4006381333931)' in label('4006381333931')
+
+
+def test_label_sheet_prints_stored_barcode(admin):
+    app.save_json(app.ITEMS_FILE, [{'product_name': 'Kabel', 'barcode': '123456789012', 'selling_price': 5,
+                                    'quantity': 3}])
+    response = admin.get('/admin/labels.pdf?barcode=123456789012')
+    assert response.status_code == 200
+    streams = re.findall(rb'stream\n(.*?)\nendstream', response.data, re.S)
+    content = zlib.decompress(streams[0])
+    assert decode_code128(printed_pattern(content)) == '123456789012'
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import app
+from conftest import forget_caches
+
+
+def walk(file_path, per_page, **equals):
+    records, cursor = [], None
+    while True:
+        page, cursor = app.paginate_records(file_path, app.decode_cursor(cursor), per_page, **equals)
+        records.extend(page)
+        if cursor is None:
+            return records
+
+
+def test_tied_keys_are_not_skipped():
+    app.append_records(app.PAYMENTS_FILE, [{'date': '2025-01-01 10:00', 'employee': 'x', 'n': n} for n in range(5)])
+    # /pay_salary records carry neither date nor employee
+    app.append_records(app.PAYMENTS_FILE, [{'amount': 1, 'n': n} for n in range(5, 12)])
+
+    assert [r['n'] for r in walk(app.PAYMENTS_FILE, 2)] == [4, 3, 2, 1, 0, 11, 10, 9, 8, 7, 6, 5]
+
+
+def test_old_cursor_starts_over():
+    app.append_records(app.PAYMENTS_FILE, [{'date': '2025-01-01', 'employee': 'x', 'n': n} for n in range(3)])
+    page, _ = app.paginate_records(app.PAYMENTS_FILE, ['2025-01-01', 'x'], 2)
+    assert [r['n'] for r in page] == [2, 1]
+
+
+def test_appended_records_extend_the_kept_order():
+    # all in the current month, which is journaled
+    noon = datetime.now().replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+
+    def sales(numbers):
+        return [{'order_id': str(n), 'date': noon.replace(second=n).isoformat(), 'user': f'u{n % 3}', 'items': []}
+                for n in numbers]
+    app.append_records(app.SALES_FILE, sales(range(10)))
+    walk(app.SALES_FILE, 3, user='u1')
+    app.append_records(app.SALES_FILE, sales(range(10, 20)))
+    # backdated, inserted before the others
+    app.append_record(app.SALES_FILE, dict(sales([20])[0], date=noon.replace(hour=1).isoformat(), user='u1'))
+
+    kept = [r['order_id'] for r in walk(app.SALES_FILE, 3, user='u1')]
+    forget_caches()
+    assert kept == [r['order_id'] for r in walk(app.SALES_FILE, 3, user='u1')]
+    assert kept == ['19', '16', '13', '10', '7', '4', '1', '20']
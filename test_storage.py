@@ -0,0 +1,89 @@
+import os
+from datetime import datetime
+
+import app
+from conftest import forget_caches
+
+
+def test_journal_replay():
+    app.append_records(app.PAYMENTS_FILE, [{'id': 1, 'amount': 10}, {'id': 2, 'amount': 20}])
+    app.update_records(app.PAYMENTS_FILE, 'id', [{'id': 1, 'amount': 15}])
+    app.delete_records(app.PAYMENTS_FILE, 'id', 2)
+    app.append_record(app.PAYMENTS_FILE, {'id': 3, 'amount': 30})
+    assert os.path.exists(app._journal_path(app.PAYMENTS_FILE))
+
+    forget_caches()
+    assert app.load_json(app.PAYMENTS_FILE) == [{'id': 1, 'amount': 15}, {'id': 3, 'amount': 30}]
+
+
+def test_journal_skips_half_written_line():
+    app.append_record(app.PAYMENTS_FILE, {'id': 1})
+    with open(app._journal_path(app.PAYMENTS_FILE), 'ab') as f:
+        f.write(b'{"op": "add", "record": {"id"')
+
+    forget_caches()
+    assert app.load_json(app.PAYMENTS_FILE) == [{'id': 1}]
+
+
+def test_compaction_folds_journal_into_snapshot():
+    app.append_records(app.PAYMENTS_FILE, [{'id': 1}, {'id': 2}])
+    app.delete_records(app.PAYMENTS_FILE, 'id', 1)
+    journal = app._journal_path(app.PAYMENTS_FILE)
+    with open(journal, 'rb') as f:
+        stale = f.read()
+
+    assert app.compact_journal(app.PAYMENTS_FILE)
+    assert not os.path.exists(journal)
+    with open(app.PAYMENTS_FILE, 'rb') as f:
+        assert app.load_data(f.read()) == [{'id': 2}]
+
+    # a journal left over from before the compaction is not replayed again
+    with open(journal, 'wb') as f:
+        f.write(stale)
+    forget_caches()
+    assert app.load_json(app.PAYMENTS_FILE) == [{'id': 2}]
+
+    app.append_record(app.PAYMENTS_FILE, {'id': 3})
+    forget_caches()
+    assert app.load_json(app.PAYMENTS_FILE) == [{'id': 2}, {'id': 3}]
+
+
+def test_date_edit_moves_sale_between_partitions():
+    current = datetime.now().strftime('%Y-%m')
+    sale = {'order_id': 'a', 'date': '2020-03-05T10:00:00', 'user': 'verkaeufer', 'items': []}
+    app.append_records(app.SALES_FILE, [sale, {'order_id': 'b', 'date': '2020-03-06T10:00:00', 'items': []}])
+    sealed = app._load_manifest(app.SALES_FILE)['partitions']['2020-03']
+    assert sealed['sealed']
+
+    app.update_records(app.SALES_FILE, 'order_id', [dict(sale, date=f'{current}-01T09:00:00')])
+    forget_caches()
+    partitions = app._load_manifest(app.SALES_FILE)['partitions']
+    assert partitions['2020-03']['file'] != sealed['file']
+    assert not os.path.exists(app._partition_file(app.SALES_FILE, sealed['file']))
+    assert [r['order_id'] for r in app.iter_records(app.SALES_FILE, date_prefix='2020-03')] == ['b']
+    assert [r['order_id'] for r in app.iter_records(app.SALES_FILE, date_prefix=current)] == ['a']
+    assert sorted(r['order_id'] for r in app.load_json(app.SALES_FILE)) == ['a', 'b']
+
+
+def test_views_copy_on_write():
+    app.save_json(app.ITEMS_FILE, [{'barcode': '1', 'tags': ['a']}, {'barcode': '2', 'tags': []}])
+    items = app.load_json(app.ITEMS_FILE)
+    items[0]['tags'].append('b')
+    items[1]['barcode'] = '3'
+    items.append({'barcode': '4'})
+
+    assert app.load_json(app.ITEMS_FILE, copy=False) == [{'barcode': '1', 'tags': ['a']},
+                                                          {'barcode': '2', 'tags': []}]
+    assert items == [{'barcode': '1', 'tags': ['a', 'b']}, {'barcode': '3', 'tags': []}, {'barcode': '4'}]
+
+
+def test_freeze_reuses_untouched_records():
+    app.save_json(app.ITEMS_FILE, [{'barcode': '1'}, {'barcode': '2'}])
+    cached = app.load_json(app.ITEMS_FILE, copy=False)
+    items = app.load_json(app.ITEMS_FILE)
+    assert app._freeze(items) is cached
+
+    items[1]['barcode'] = '3'
+    frozen = app._freeze(items)
+    assert frozen[0] is cached[0] and frozen[1] is not cached[1]
+    assert cached[1] == {'barcode': '2'}